@@ -0,0 +1,340 @@
+import os
+import io
+import gzip
+import json
+import sys
+import shutil
+import asyncio
+import argparse
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from config import logger
+from database import Database, DatabaseException, BACKUP_EXTENSIONS, open_backup_file, zstandard
+
+# Файл со списком резервных копий в каталоге копий
+MANIFEST_FILE = 'manifest.json'
+
+# Виды резервных копий
+BACKUP_FULL = 'full'
+BACKUP_DIFF = 'diff'
+
+def open_backup_reader(backup_file: str) -> io.BufferedIOBase:
+    """
+    Открытие файла резервной копии для чтения с распаковкой по расширению
+
+    Args:
+        backup_file: Путь к файлу резервной копии
+
+    Returns:
+        Двоичный файл для чтения
+    """
+    if backup_file.endswith(BACKUP_EXTENSIONS['gzip']):
+        return gzip.open(backup_file, 'rb')
+    if backup_file.endswith(BACKUP_EXTENSIONS['zstd']):
+        if zstandard is None:
+            raise DatabaseException("Для чтения копии zstd требуется пакет zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(open(backup_file, 'rb'), closefd=True)
+    return open(backup_file, 'rb')
+
+class BackupEngine:
+    """
+    Резервное копирование по расписанию: полные копии и инкрементные изменения
+
+    Между полными копиями сохраняются только вопросы, измененные после предыдущей копии.
+    Если у базы есть лента изменений, измененные вопросы берутся из нее: каждая копия
+    запоминает в списке копий номер последнего учтенного события ('feed_seq'), и после
+    перезапуска инкрементные копии продолжаются с него. Без ленты используются отметки
+    базы (take_changed_ids), которые не переживают перезапуск.
+    Полная копия вместе с ее изменениями образует цепочку; политика хранения
+    удаляет цепочки целиком, оставляя последние копии по часам, дням и неделям.
+    """
+    def __init__(self, db: Database, backup_dir: str = 'backups', compression: Optional[str] = 'gzip',
+                 full_every: int = 24, keep_hourly: int = 24, keep_daily: int = 7, keep_weekly: int = 4):
+        """
+        Инициализация резервного копирования
+
+        Args:
+            db: База данных
+            backup_dir: Каталог резервных копий
+            compression: Сжатие копий (None, 'gzip' или 'zstd')
+            full_every: Через сколько копий делается полная копия
+            keep_hourly: Сколько последних часов хранить по одной цепочке
+            keep_daily: Сколько последних дней хранить по одной цепочке
+            keep_weekly: Сколько последних недель хранить по одной цепочке
+        """
+        self.db = db
+        self.backup_dir = backup_dir
+        self.compression = compression
+        self.full_every = full_every
+        self.keep_hourly = keep_hourly
+        self.keep_daily = keep_daily
+        self.keep_weekly = keep_weekly
+        self.feed = db.change_feed
+        # После запуска и после ошибки изменения неизвестны, нужна полная копия
+        self._force_full = True
+        self._lock = threading.Lock()  # Одновременно выполняется только одно копирование
+
+    async def job(self, context) -> None:
+        """Задача очереди заданий бота: копирование вне цикла событий"""
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.run)
+        except Exception as e:
+            logger.error(f"Ошибка при резервном копировании по расписанию: {e}")
+
+    def run(self) -> dict:
+        """
+        Создание очередной резервной копии и применение политики хранения
+
+        Returns:
+            Запись о созданной копии из списка копий
+        """
+        with self._lock:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            manifest = self.load_manifest(self.backup_dir)
+            base = self._latest_full(manifest)
+            diffs = sum(1 for entry in manifest if entry['kind'] == BACKUP_DIFF and entry['base'] == base)
+            offset = self._feed_offset(manifest, base)
+            # С лентой изменения после предыдущей копии известны и после перезапуска или ошибки
+            unknown = self._force_full if self.feed is None else offset is None
+
+            try:
+                if unknown or base is None or diffs + 1 >= self.full_every:
+                    entry = self._backup_full()
+                else:
+                    entry = self._backup_diff(base, offset)
+            except Exception:
+                self._force_full = True
+                raise
+            self._force_full = False
+
+            manifest.append(entry)
+            manifest = self._apply_retention(manifest)
+            self._save_manifest(manifest)
+            return entry
+
+    def _backup_full(self) -> dict:
+        """Полная копия базы данных"""
+        # Изменения до этого момента войдут в полную копию
+        self.db.take_changed_ids()
+        feed_seq = self.feed.last_seq if self.feed is not None else None
+        backup_file = self.db.backup(self.backup_dir, self.compression)
+        name = os.path.basename(backup_file)
+        return {'file': name, 'kind': BACKUP_FULL, 'base': name,
+                'db_type': self.db.db_type, 'time': datetime.now().isoformat(),
+                **({'feed_seq': feed_seq} if feed_seq is not None else {})}
+
+    def _backup_diff(self, base: str, offset: Optional[int] = None) -> dict:
+        """
+        Инкрементная копия вопросов, измененных после предыдущей копии
+
+        Args:
+            base: Полная копия, к которой относятся изменения
+            offset: Номер последнего события ленты, учтенного предыдущей копией цепочки
+
+        Returns:
+            Запись о копии
+        """
+        changed = self.db.take_changed_ids()
+        feed_seq = offset
+        if self.feed is not None:
+            # Измененные вопросы берутся из ленты; событие, записанное во время копии,
+            # попадет и в следующую копию, а повторное добавление вопроса ничего не меняет
+            changed = {}
+            while True:
+                events = self.feed.read(feed_seq)
+                if not events:
+                    break
+                for event in events:
+                    feed_seq = event['seq']
+                    if event.get('source') == self.db.feed_source:
+                        changed[event['id']] = None
+
+        questions = {}
+        deleted = []
+        for question_id in changed:
+            question = self.db.get_question(question_id)
+            if question:
+                questions[question_id] = question.to_dict()
+            else:
+                # Вопрос удален политикой хранения
+                deleted.append(question_id)
+
+        timestamp = datetime.now()
+        source = self.db.filename if self.db.db_type == 'json' else self.db.sqlite_file
+        name = (f"diff_{timestamp.strftime('%Y%m%d_%H%M%S_%f')}_{os.path.basename(source)}.json"
+                f"{BACKUP_EXTENSIONS[self.compression]}")
+        with open_backup_file(os.path.join(self.backup_dir, name), self.compression) as f:
+            f.write(json.dumps({'base': base, 'questions': questions, 'deleted': deleted},
+                               ensure_ascii=False).encode('utf-8'))
+
+        logger.info(f"Создана инкрементная резервная копия {name}, вопросов: {len(questions)}, "
+                    f"удалено: {len(deleted)}")
+        return {'file': name, 'kind': BACKUP_DIFF, 'base': base,
+                'db_type': self.db.db_type, 'time': timestamp.isoformat(),
+                **({'feed_seq': feed_seq} if feed_seq is not None else {})}
+
+    def _feed_offset(self, manifest: List[dict], base: Optional[str]) -> Optional[int]:
+        """
+        Номер последнего события ленты, учтенного последней копией цепочки
+
+        Args:
+            manifest: Список копий
+            base: Последняя полная копия
+
+        Returns:
+            Номер события; None, если ленты нет, копия сделана без нее или лента заменена
+        """
+        if self.feed is None or base is None:
+            return None
+        for entry in reversed(manifest):
+            if entry['base'] == base:
+                offset = entry.get('feed_seq')
+                return offset if offset is not None and offset <= self.feed.last_seq else None
+        return None
+
+    def _latest_full(self, manifest: List[dict]) -> Optional[str]:
+        """Последняя полная копия, файл которой существует"""
+        for entry in reversed(manifest):
+            if entry['kind'] == BACKUP_FULL and os.path.exists(os.path.join(self.backup_dir, entry['file'])):
+                return entry['file']
+        return None
+
+    def _apply_retention(self, manifest: List[dict]) -> List[dict]:
+        """
+        Удаление цепочек копий, не попадающих в политику хранения
+
+        Из каждого часа, дня и недели остается самая новая цепочка,
+        последняя цепочка хранится всегда.
+
+        Args:
+            manifest: Список копий
+
+        Returns:
+            Список оставшихся копий
+        """
+        fulls = sorted((entry for entry in manifest if entry['kind'] == BACKUP_FULL),
+                       key=lambda entry: entry['time'], reverse=True)
+        if not fulls:
+            return manifest
+
+        keep = {fulls[0]['file']}
+        for time_format, count in (('%Y%m%d%H', self.keep_hourly), ('%Y%m%d', self.keep_daily),
+                                   ('%G%V', self.keep_weekly)):
+            buckets = set()
+            for entry in fulls:
+                bucket = datetime.fromisoformat(entry['time']).strftime(time_format)
+                if bucket in buckets:
+                    continue
+                if len(buckets) >= count:
+                    break
+                buckets.add(bucket)
+                keep.add(entry['file'])
+
+        kept = []
+        for entry in manifest:
+            if entry['base'] in keep:
+                kept.append(entry)
+                continue
+            path = os.path.join(self.backup_dir, entry['file'])
+            if os.path.exists(path):
+                os.remove(path)
+            shutil.rmtree(f"{path}.cold", ignore_errors=True)
+            logger.info(f"Резервная копия {entry['file']} удалена по политике хранения")
+        return kept
+
+    @staticmethod
+    def load_manifest(backup_dir: str) -> List[dict]:
+        """
+        Загрузка списка резервных копий
+
+        Args:
+            backup_dir: Каталог резервных копий
+
+        Returns:
+            Список копий в порядке создания
+        """
+        path = os.path.join(backup_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest: List[dict]) -> None:
+        """Атомарная запись списка резервных копий"""
+        path = os.path.join(self.backup_dir, MANIFEST_FILE)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+
+def restore(backup_dir: str, target: str, at: Optional[str] = None) -> int:
+    """
+    Восстановление базы данных из полной копии и ее инкрементных изменений
+
+    Args:
+        backup_dir: Каталог резервных копий
+        target: Путь к восстанавливаемой базе (не должен существовать)
+        at: Момент восстановления в ISO формате (None - последняя копия)
+
+    Returns:
+        Количество примененных инкрементных копий
+    """
+    if os.path.exists(target):
+        raise DatabaseException(f"Файл {target} уже существует")
+
+    manifest = [entry for entry in BackupEngine.load_manifest(backup_dir) if at is None or entry['time'] <= at]
+    fulls = [entry for entry in manifest if entry['kind'] == BACKUP_FULL]
+    if not fulls:
+        raise DatabaseException("Нет полной резервной копии для восстановления")
+    full = fulls[-1]
+    diffs = [entry for entry in manifest if entry['kind'] == BACKUP_DIFF and entry['base'] == full['file']]
+
+    # Полная копия распаковывается в файл базы данных вместе с архивом
+    full_file = os.path.join(backup_dir, full['file'])
+    with open_backup_reader(full_file) as src, open(target, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    if os.path.isdir(f"{full_file}.cold"):
+        shutil.copytree(f"{full_file}.cold", f"{target}.cold")
+
+    if full['db_type'] == 'json':
+        # Изменения копятся в журнале, снимок записывается один раз при закрытии
+        db = Database(db_type='json', filename=target, journal=True, compact_threshold=sys.maxsize)
+    else:
+        db = Database(db_type='sqlite', sqlite_file=target)
+    try:
+        # Добавление заменяет вопрос целиком и пересчитывает счетчики
+        for entry in diffs:
+            with open_backup_reader(os.path.join(backup_dir, entry['file'])) as f:
+                data = json.loads(f.read().decode('utf-8'))
+            for question_id, question in data['questions'].items():
+                db.add_question(question_id, question)
+            for question_id in data.get('deleted', []):
+                db.delete_question(question_id)
+    finally:
+        db.close()
+    if db.journal and os.path.exists(db.journal_file) and not os.path.getsize(db.journal_file):
+        # Журнал сжат в снимок при закрытии; база может открываться и без журнала
+        os.remove(db.journal_file)
+
+    logger.info(f"База данных восстановлена в {target} из {full['file']} и инкрементных копий: {len(diffs)}")
+    return len(diffs)
+
+def main() -> None:
+    """Командная строка: python backups.py restore <каталог копий> <файл базы> [--at ВРЕМЯ]"""
+    parser = argparse.ArgumentParser(description='Резервные копии базы данных бота')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    restore_parser = subparsers.add_parser('restore', help='Восстановить базу данных из резервных копий')
+    restore_parser.add_argument('backup_dir', help='Каталог резервных копий')
+    restore_parser.add_argument('target', help='Путь к восстанавливаемой базе данных')
+    restore_parser.add_argument('--at', help='Момент восстановления в ISO формате, например 2025-05-27T10:00:00')
+    args = parser.parse_args()
+
+    if args.command == 'restore':
+        applied = restore(args.backup_dir, args.target, args.at)
+        print(f"✅ Базу даних відновлено в {args.target}, застосовано інкрементних копій: {applied}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import os
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from typing import List
+
+from config import CATEGORIES, logger
+from database import Database
+from models import Question, TIME_UNIT
+
+def make_questions(count: int) -> dict:
+    """
+    Синтетические вопросы для замера
+
+    Args:
+        count: Количество вопросов
+
+    Returns:
+        Вопросы по ID
+    """
+    categories = list(CATEGORIES)
+    questions = {}
+    for i in range(count):
+        question_id = f"q{i + 1}"
+        answered = i % 4 != 0
+        questions[question_id] = Question(
+            id=question_id,
+            category=categories[i % len(categories)],
+            text=f"Питання номер {i}: як знайти спокій у складний час?",
+            status='answered' if answered else 'pending',
+            time=(1748340000 + i * 60) * TIME_UNIT,
+            important=i % 10 == 0,
+            user_id=100000 + i % 5000,
+            answer="Дякуємо за питання, відповідь опубліковано в каналі." if answered else None,
+            answer_time=(1748343600 + i * 60) * TIME_UNIT if answered else None,
+            answer_message_id=i if answered else None
+        )
+    return questions
+
+def measure_load(filename: str, snapshot_format: str, repeat: int) -> float:
+    """Лучшее время загрузки базы данных в секундах"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        db = Database(db_type='json', filename=filename, snapshot_format=snapshot_format)
+        elapsed = time.perf_counter() - started
+        db.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run(sizes: List[int], repeat: int) -> None:
+    """
+    Сравнение загрузки JSON и двоичного снимка
+
+    Args:
+        sizes: Количества вопросов
+        repeat: Количество повторов загрузки (берется лучшее время)
+    """
+    print(f"{'вопросов':>10} {'формат':>8} {'размер, МБ':>11} {'загрузка, с':>12}")
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix='snapshot-bench-')
+        try:
+            questions = make_questions(size)
+            for snapshot_format in ('json', 'binary'):
+                filename = os.path.join(workdir, f"{snapshot_format}.json")
+                db = Database(db_type='json', filename=filename, snapshot_format=snapshot_format)
+                db._write_snapshot(questions, {}, size + 1)
+                file_size = os.path.getsize(db._snapshot_target()) / 2 ** 20
+                db.close()
+                elapsed = measure_load(filename, snapshot_format, repeat)
+                print(f"{size:>10} {snapshot_format:>8} {file_size:>11.1f} {elapsed:>12.3f}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def main() -> None:
+    """Командная строка: python benchmark_snapshot.py [--sizes 10000 100000 1000000] [--repeat 3]"""
+    parser = argparse.ArgumentParser(description='Замер загрузки снимка JSON и двоичного снимка')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='Количества вопросов')
+    parser.add_argument('--repeat', type=int, default=3, help='Повторов загрузки для каждого размера')
+    args = parser.parse_args()
+
+    # Сообщения базы данных о загрузке и сохранении мешают таблице
+    logger.setLevel(logging.WARNING)
+    run(args.sizes, args.repeat)
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,26 @@
 import os
 import logging
-import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler, ConversationHandler
 from dotenv import load_dotenv
 from typing import Dict, List
 
+from config import (
+    DB_TYPE, DB_FILE, SQLITE_FILE, DB_SHARDS, DB_JOURNAL, DB_COMPACT_THRESHOLD,
+    DB_FLUSH_INTERVAL_MS, DB_FLUSH_MAX_BATCH, DB_ARCHIVE_AFTER_DAYS, DB_SNAPSHOT_FORMAT,
+    DB_CHANGE_FEED_FILE, DB_DEDUP_WINDOW,
+    SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE, SQLITE_LAZY, SQLITE_CACHE_ROWS,
+    BACKUP_DIR, BACKUP_INTERVAL, BACKUP_FULL_EVERY, BACKUP_COMPRESSION,
+    BACKUP_KEEP_HOURLY, BACKUP_KEEP_DAILY, BACKUP_KEEP_WEEKLY, SEARCH_MAX_RESULTS,
+    DB_RETENTION_RULES, DB_RETENTION_INTERVAL, DB_RETENTION_BATCH
+)
+from database import Database, AsyncDatabase
+from sharding import ShardedDatabase
+from backups import BackupEngine
+from retention import RetentionPolicy, parse_retention_rules
+from changefeed import ChangeFeed
+
 # Загрузка переменных окружения
 load_dotenv()
 
@@ -34,66 +48,81 @@ CATEGORIES: Dict[str, str] = {
     'urgent': '⚡️ Термінові'
 }
 
-class Database:
-    def __init__(self, filename='db.json'):
-        self.filename = filename
-        self.questions = {}
-        self.stats = {
-            'total_questions': 0,
-            'answered_questions': 0,
-            'categories': {}
-        }
-        self.load()
-
-    def load(self):
-        """Загрузка базы данных из файла"""
-        try:
-            if os.path.exists(self.filename):
-                with open(self.filename, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.questions = data.get('questions', {})
-                    self.stats = data.get('stats', {
-                        'total_questions': 0,
-                        'answered_questions': 0,
-                        'categories': {}
-                    })
-        except Exception as e:
-            logger.error(f"Помилка при завантаженні бази даних: {e}")
-
-    def save(self):
-        """Сохранение базы данных в файл"""
-        try:
-            with open(self.filename, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'questions': self.questions,
-                    'stats': self.stats
-                }, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Помилка при збереженні бази даних: {e}")
-
-    def add_question(self, question_id: str, question_data: dict):
-        """Добавление нового вопроса"""
-        self.questions[question_id] = question_data
-        self.stats['total_questions'] += 1
-        category = question_data.get('category')
-        if category:
-            self.stats['categories'][category] = self.stats['categories'].get(category, 0) + 1
-        self.save()
-
-    def update_question(self, question_id: str, update_data: dict):
-        """Обновление данных вопроса"""
-        if question_id in self.questions:
-            self.questions[question_id].update(update_data)
-            if update_data.get('status') == 'answered':
-                self.stats['answered_questions'] += 1
-            self.save()
-
-    def get_question(self, question_id: str) -> dict:
-        """Получение данных вопроса"""
-        return self.questions.get(question_id, {})
-
-# Инициализация базы данных
-db = Database()
+# Лента изменений вопросов, общая для всех частей хранилища
+change_feed = ChangeFeed(DB_CHANGE_FEED_FILE) if DB_CHANGE_FEED_FILE else None
+
+# Вопросов на одной странице списка
+QUESTIONS_PER_PAGE = 5
+
+# Инициализация базы данных (запись выполняется вне цикла событий)
+if DB_TYPE == 'sharded':
+    db = AsyncDatabase(ShardedDatabase(
+        shard_count=DB_SHARDS,
+        sqlite_file=SQLITE_FILE,
+        sqlite_synchronous=SQLITE_SYNCHRONOUS,
+        sqlite_cache_size=SQLITE_CACHE_SIZE,
+        sqlite_mmap_size=SQLITE_MMAP_SIZE,
+        flush_interval_ms=DB_FLUSH_INTERVAL_MS,
+        flush_max_batch=DB_FLUSH_MAX_BATCH,
+        sqlite_lazy=SQLITE_LAZY,
+        sqlite_cache_rows=SQLITE_CACHE_ROWS,
+        change_feed=change_feed,
+        dedup_window=DB_DEDUP_WINDOW
+    ))
+else:
+    db = AsyncDatabase(Database(
+        db_type=DB_TYPE,
+        filename=DB_FILE,
+        sqlite_file=SQLITE_FILE,
+        journal=DB_JOURNAL,
+        compact_threshold=DB_COMPACT_THRESHOLD,
+        sqlite_synchronous=SQLITE_SYNCHRONOUS,
+        sqlite_cache_size=SQLITE_CACHE_SIZE,
+        sqlite_mmap_size=SQLITE_MMAP_SIZE,
+        flush_interval_ms=DB_FLUSH_INTERVAL_MS,
+        flush_max_batch=DB_FLUSH_MAX_BATCH,
+        sqlite_lazy=SQLITE_LAZY,
+        sqlite_cache_rows=SQLITE_CACHE_ROWS,
+        archive_after_days=DB_ARCHIVE_AFTER_DAYS,
+        snapshot_format=DB_SNAPSHOT_FORMAT,
+        change_feed=change_feed,
+        dedup_window=DB_DEDUP_WINDOW
+    ))
+
+# Резервное копирование по расписанию: у разделенного хранилища каждая часть в своем каталоге
+backup_engines = [
+    BackupEngine(
+        storage,
+        backup_dir=os.path.join(BACKUP_DIR, f"shard{index}") if DB_TYPE == 'sharded' else BACKUP_DIR,
+        compression=BACKUP_COMPRESSION,
+        full_every=BACKUP_FULL_EVERY,
+        keep_hourly=BACKUP_KEEP_HOURLY,
+        keep_daily=BACKUP_KEEP_DAILY,
+        keep_weekly=BACKUP_KEEP_WEEKLY
+    )
+    for index, storage in enumerate(db.db.shards if DB_TYPE == 'sharded' else [db.db])
+]
+
+# Политика хранения закрытых вопросов по расписанию
+retention_policy = RetentionPolicy(db.db, parse_retention_rules(DB_RETENTION_RULES), DB_RETENTION_BATCH)
+
+async def schedule_backups(application: Application):
+    """Запуск резервного копирования и политики хранения в очереди заданий бота"""
+    if application.job_queue is None:
+        logger.warning("Очередь заданий недоступна, резервное копирование и политика хранения по расписанию отключены")
+        return
+    if BACKUP_INTERVAL > 0:
+        for backup_engine in backup_engines:
+            application.job_queue.run_repeating(backup_engine.job, interval=BACKUP_INTERVAL, first=BACKUP_INTERVAL)
+    if retention_policy.rules and DB_RETENTION_INTERVAL > 0:
+        application.job_queue.run_repeating(retention_policy.job, interval=DB_RETENTION_INTERVAL,
+                                            first=DB_RETENTION_INTERVAL)
+
+async def close_database(application: Application):
+    """Сохранение всех изменений базы данных при остановке бота"""
+    await db.close()
+    if change_feed is not None:
+        change_feed.close()
 
 def get_main_keyboard():
     """Создание основной клавиатуры"""
@@ -141,10 +170,12 @@ def get_admin_menu_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
-def get_questions_list_keyboard(questions: List[dict], page: int = 0, items_per_page: int = 5):
+def get_questions_list_keyboard(questions: List[dict], page: int = 0, items_per_page: int = QUESTIONS_PER_PAGE,
+                                first_index: int = 0):
     """Создание клавиатуры со списком вопросов"""
     keyboard = []
-    start_idx = page * items_per_page
+    # questions - весь список или его часть, начиная с вопроса номер first_index
+    start_idx = page * items_per_page - first_index
     end_idx = start_idx + items_per_page
     
     # Добавляем кнопки с вопросами
@@ -184,6 +215,11 @@ def get_questions_list_keyboard(questions: List[dict], page: int = 0, items_per_
     
     return InlineKeyboardMarkup(keyboard)
 
+async def load_status_page(status: str, page: int) -> List[dict]:
+    """Страница списка вопросов по статусу и один вопрос сверх нее (для кнопки "Вперед")"""
+    return await db.get_questions_by_status(status, limit=QUESTIONS_PER_PAGE + 1,
+                                            offset=page * QUESTIONS_PER_PAGE)
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /start"""
     try:
@@ -257,16 +293,17 @@ async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
+    stats = db.get_stats()
     stats_text = (
         "📊 Статистика бота:\n\n"
-        f"📝 Всего вопросов: {db.stats['total_questions']}\n"
-        f"✅ Отвечено: {db.stats['answered_questions']}\n"
-        f"⏳ Ожидают ответа: {db.stats['total_questions'] - db.stats['answered_questions']}\n\n"
+        f"📝 Всего вопросов: {stats['total_questions']}\n"
+        f"✅ Отвечено: {stats['answered_questions']}\n"
+        f"⏳ Ожидают ответа: {stats['statuses']['pending']}\n\n"
         "📊 По категориям:\n"
     )
 
     for cat_id, cat_name in CATEGORIES.items():
-        count = db.stats['categories'].get(cat_id, 0)
+        count = stats['categories'].get(cat_id, 0)
         stats_text += f"{cat_name}: {count}\n"
 
     await query.message.edit_text(
@@ -279,7 +316,7 @@ async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_admin_question(update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str):
     """Отправка вопроса администраторам"""
     try:
-        question = db.questions[question_id]
+        question = await db.get_question(question_id)
         message_text = (
             f"📨 Нове анонімне питання\n\n"
             f"Категорія: {CATEGORIES[question['category']]}\n"
@@ -350,22 +387,29 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         elif data.startswith("page_"):
             page = int(data.replace("page_", ""))
-            questions = context.user_data.get('current_questions', [])
             context.user_data['current_page'] = page
+            status = context.user_data.get('current_status')
+            if status is not None:
+                # Длинные списки закрытых вопросов читаются по странице
+                questions = await load_status_page(status, page)
+                first_index = page * QUESTIONS_PER_PAGE
+            else:
+                questions = context.user_data.get('current_questions', [])
+                first_index = 0
             
             await query.message.edit_text(
                 "Оберіть питання:",
-                reply_markup=get_questions_list_keyboard(questions, page)
+                reply_markup=get_questions_list_keyboard(questions, page, first_index=first_index)
             )
             return CHOOSING
 
         elif data.startswith("view_q_"):
             question_id = data.replace("view_q_", "")
-            if question_id not in db.questions:
+            question = await db.get_question(question_id)
+            if not question:
                 await query.message.edit_text("❌ Питання не знайдено")
                 return CHOOSING
 
-            question = db.questions[question_id]
             status_emoji = {
                 'pending': '⏳',
                 'answered': '✅',
@@ -412,12 +456,12 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         elif data.startswith("answer_"):
             question_id = data.replace("answer_", "")
-            if question_id not in db.questions:
+            question = await db.get_question(question_id)
+            if not question:
                 await query.message.edit_text("❌ Питання не знайдено")
                 return CHOOSING
 
             context.user_data['answering'] = question_id
-            question = db.questions[question_id]
 
             await query.message.edit_text(
                 f"✍️ Відповідь на питання:\n\n"
@@ -432,12 +476,12 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         elif data.startswith("edit_"):
             question_id = data.replace("edit_", "")
-            if question_id not in db.questions:
+            question = await db.get_question(question_id)
+            if not question:
                 await query.message.edit_text("❌ Питання не знайдено")
                 return CHOOSING
 
             context.user_data['editing'] = question_id
-            question = db.questions[question_id]
 
             await query.message.edit_text(
                 f"🔄 Зміна відповіді:\n\n"
@@ -453,12 +497,13 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         elif data.startswith("reject_"):
             question_id = data.replace("reject_", "")
-            if question_id not in db.questions:
+            question = await db.get_question(question_id)
+            if not question:
                 await query.message.edit_text("❌ Питання не знайдено")
                 return CHOOSING
 
-            db.update_question(question_id, {'status': 'rejected'})
-            question = db.questions[question_id]
+            await db.update_question(question_id, {'status': 'rejected'})
+            question = await db.get_question(question_id)
 
             keyboard = [[
                 InlineKeyboardButton("↩️ Відновити", callback_data=f"restore_{question_id}"),
@@ -476,12 +521,13 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         elif data.startswith("restore_"):
             question_id = data.replace("restore_", "")
-            if question_id not in db.questions:
+            question = await db.get_question(question_id)
+            if not question:
                 await query.message.edit_text("❌ Питання не знайдено")
                 return CHOOSING
 
-            db.update_question(question_id, {'status': 'pending'})
-            question = db.questions[question_id]
+            await db.update_question(question_id, {'status': 'pending'})
+            question = await db.get_question(question_id)
 
             await query.message.edit_text(
                 f"📨 Питання\n\n"
@@ -494,13 +540,13 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         elif data.startswith("important_"):
             question_id = data.replace("important_", "")
-            if question_id not in db.questions:
+            question = await db.get_question(question_id)
+            if not question:
                 await query.message.edit_text("❌ Питання не знайдено")
                 return CHOOSING
 
-            question = db.questions[question_id]
             is_important = not question.get('important', False)
-            db.update_question(question_id, {'important': is_important})
+            await db.update_question(question_id, {'important': is_important})
 
             # Обновляем сообщение с новыми кнопками
             keyboard = []
@@ -531,7 +577,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         elif data.startswith("pin_"):
             question_id = data.replace("pin_", "")
-            if question_id not in db.questions:
+            if not await db.get_question(question_id):
                 await query.message.edit_text("❌ Питання не знайдено")
                 return CHOOSING
 
@@ -549,16 +595,17 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return CHOOSING
 
         elif data == "stats":
+            stats = db.get_stats()
             stats_text = (
                 "📊 Статистика боту:\n\n"
-                f"📝 Всього питань: {db.stats['total_questions']}\n"
-                f"✅ Відповіді надано: {db.stats['answered_questions']}\n"
-                f"⏳ Очікують відповіді: {db.stats['total_questions'] - db.stats['answered_questions']}\n\n"
+                f"📝 Всього питань: {stats['total_questions']}\n"
+                f"✅ Відповіді надано: {stats['answered_questions']}\n"
+                f"⏳ Очікують відповіді: {stats['statuses']['pending']}\n\n"
                 "📊 По категоріях:\n"
             )
 
             for cat_id, cat_name in CATEGORIES.items():
-                count = db.stats['categories'].get(cat_id, 0)
+                count = stats['categories'].get(cat_id, 0)
                 stats_text += f"{cat_name}: {count}\n"
 
             await query.message.edit_text(
@@ -592,20 +639,19 @@ async def show_my_questions(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_questions = []
 
         # Собираем все вопросы пользователя
-        for q_id, question in db.questions.items():
-            if question.get('user_id') == user_id:
-                status = {
-                    'pending': '⏳ Очікує відповіді',
-                    'answered': '✅ Відповідь отримано',
-                    'rejected': '❌ Відхилено'
-                }.get(question['status'], '⏳ Очікує відповіді')
-
-                user_questions.append({
-                    'id': q_id,
-                    'text': question['text'],
-                    'status': status,
-                    'category': CATEGORIES[question['category']]
-                })
+        for question in await db.get_questions_by_user(user_id):
+            status = {
+                'pending': '⏳ Очікує відповіді',
+                'answered': '✅ Відповідь отримано',
+                'rejected': '❌ Відхилено'
+            }.get(question['status'], '⏳ Очікує відповіді')
+
+            user_questions.append({
+                'id': question['id'],
+                'text': question['text'],
+                'status': status,
+                'category': CATEGORIES[question['category']]
+            })
 
         if not user_questions:
             await update.message.reply_text(
@@ -648,14 +694,13 @@ async def show_my_answers(update: Update, context: ContextTypes.DEFAULT_TYPE):
         answered_questions = []
 
         # Собираем все отвеченные вопросы пользователя
-        for q_id, question in db.questions.items():
-            if question.get('user_id') == user_id and question.get('status') == 'answered':
-                answered_questions.append({
-                    'id': q_id,
-                    'text': question['text'],
-                    'answer': question.get('answer', ''),
-                    'category': CATEGORIES[question['category']]
-                })
+        for question in await db.get_questions_by_user(user_id, status='answered'):
+            answered_questions.append({
+                'id': question['id'],
+                'text': question['text'],
+                'answer': question.get('answer', ''),
+                'category': CATEGORIES[question['category']]
+            })
 
         if not answered_questions:
             await update.message.reply_text(
@@ -799,7 +844,7 @@ async def handle_regular_message(update: Update, context: ContextTypes.DEFAULT_T
             try:
                 question_id = context.user_data.get('answering') or context.user_data.get('editing')
                 answer_text = message_text
-                question = db.questions[question_id]
+                question = await db.get_question(question_id)
                 is_editing = context.user_data.get('editing')
 
                 # Публикуем ответ в канал
@@ -843,7 +888,7 @@ async def handle_regular_message(update: Update, context: ContextTypes.DEFAULT_T
                 if not is_editing:
                     update_data['answer_message_id'] = message.message_id
                 
-                db.update_question(question_id, update_data)
+                await db.update_question(question_id, update_data)
 
                 # Очищаем состояние
                 context.user_data.clear()
@@ -872,10 +917,10 @@ async def handle_regular_message(update: Update, context: ContextTypes.DEFAULT_T
                 category = context.user_data['category']
 
                 # Генерируем уникальный ID для вопроса
-                question_id = f"q{len(db.questions) + 1}"
+                question_id = db.next_question_id()
 
-                # Сохраняем вопрос в базе данных
-                db.add_question(question_id, {
+                # Сохраняем вопрос в базе данных; повторная отправка того же вопроса не добавляется
+                stored_id = await db.submit_question(question_id, {
                     'id': question_id,
                     'category': category,
                     'text': message_text,
@@ -885,6 +930,15 @@ async def handle_regular_message(update: Update, context: ContextTypes.DEFAULT_T
                     'user_id': user_id
                 })
 
+                if stored_id != question_id:
+                    context.user_data.clear()
+                    await update.message.reply_text(
+                        "ℹ️ Це питання вже надіслано і очікує на відповідь.",
+                        reply_markup=get_main_keyboard(),
+                        disable_notification=True
+                    )
+                    return CHOOSING
+
                 logger.info(f"Питання збережено з ID {question_id}")
 
                 # Отправляем вопрос в группу администраторов
@@ -958,18 +1012,12 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text = update.message.text
         
         if text == "📊 Статистика":
-            # Подсчитываем статистику по статусам
-            status_counts = {'pending': 0, 'answered': 0, 'rejected': 0}
-            category_counts = {cat_id: 0 for cat_id in CATEGORIES.keys()}
-            important_count = 0
-            total_questions = len(db.questions)
-            
-            for q in db.questions.values():
-                status = q.get('status', 'pending')
-                status_counts[status] = status_counts.get(status, 0) + 1
-                category_counts[q['category']] = category_counts.get(q['category'], 0) + 1
-                if q.get('important', False):
-                    important_count += 1
+            # Берем готовые счетчики вместо просмотра всех вопросов
+            stats = db.get_stats()
+            status_counts = stats['statuses']
+            category_counts = stats['categories']
+            important_count = stats['important_questions']
+            total_questions = stats['total_questions']
 
             stats_text = (
                 "📊 Детальна статистика бота:\n\n"
@@ -994,6 +1042,17 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 answered_percentage = (status_counts['answered'] / total_questions * 100)
                 stats_text += f"\n📈 Ефективність роботи: {answered_percentage:.1f}%"
 
+            # Активность за последние 7 дней - из дневных агрегатов, без просмотра вопросов
+            week_start = (datetime.now() - timedelta(days=6)).date().isoformat()
+            activity = db.get_rollups('day', start=week_start)
+            if activity:
+                stats_text += "\n\n📅 Активність за 7 днів:\n"
+                for day in activity:
+                    stats_text += f"{day['bucket'][:10]}: питань {day['asked']}, відповідей {day['answered']}"
+                    if day['avg_latency'] is not None:
+                        stats_text += f", середній час відповіді {day['avg_latency'] / 3600:.1f} год"
+                    stats_text += "\n"
+
             await update.message.reply_text(
                 stats_text,
                 reply_markup=get_admin_menu_keyboard(),
@@ -1003,7 +1062,7 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
         elif text == "📥 Нові питання":
             # Получаем список новых вопросов
-            new_questions = [q for q in db.questions.values() if q['status'] == 'pending']
+            new_questions = await db.get_questions_by_status('pending')
             if not new_questions:
                 await update.message.reply_text(
                     "📭 Нових питань немає",
@@ -1014,6 +1073,7 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             # Сохраняем список вопросов в контексте
             context.user_data['current_questions'] = new_questions
+            context.user_data.pop('current_status', None)
             context.user_data['current_page'] = 0
             
             await update.message.reply_text(
@@ -1025,7 +1085,7 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
         elif text == "⭐️ Важливі питання":
             # Получаем список важных вопросов
-            important_questions = [q for q in db.questions.values() if q.get('important', False)]
+            important_questions = db.get_important_questions()
             if not important_questions:
                 await update.message.reply_text(
                     "⭐️ Важливих питань немає",
@@ -1035,6 +1095,7 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 return CHOOSING
             
             context.user_data['current_questions'] = important_questions
+            context.user_data.pop('current_status', None)
             context.user_data['current_page'] = 0
             
             await update.message.reply_text(
@@ -1046,7 +1107,7 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
         elif text == "✅ Опрацьовані":
             # Получаем список отвеченных вопросов
-            answered_questions = [q for q in db.questions.values() if q['status'] == 'answered']
+            answered_questions = await load_status_page('answered', 0)
             if not answered_questions:
                 await update.message.reply_text(
                     "✅ Опрацьованих питань немає",
@@ -1055,7 +1116,8 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 return CHOOSING
             
-            context.user_data['current_questions'] = answered_questions
+            context.user_data['current_status'] = 'answered'
+            context.user_data.pop('current_questions', None)
             context.user_data['current_page'] = 0
             
             await update.message.reply_text(
@@ -1067,7 +1129,7 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
         elif text == "❌ Відхилені":
             # Получаем список отклоненных вопросов
-            rejected_questions = [q for q in db.questions.values() if q['status'] == 'rejected']
+            rejected_questions = await load_status_page('rejected', 0)
             if not rejected_questions:
                 await update.message.reply_text(
                     "❌ Відхилених питань немає",
@@ -1076,7 +1138,8 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 return CHOOSING
             
-            context.user_data['current_questions'] = rejected_questions
+            context.user_data['current_status'] = 'rejected'
+            context.user_data.pop('current_questions', None)
             context.user_data['current_page'] = 0
             
             await update.message.reply_text(
@@ -1088,7 +1151,7 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
         elif text == "🔄 Змінити відповідь":
             # Получаем список отвеченных вопросов для изменения
-            answered_questions = [q for q in db.questions.values() if q['status'] == 'answered']
+            answered_questions = await load_status_page('answered', 0)
             if not answered_questions:
                 await update.message.reply_text(
                     "✅ Немає питань з відповідями для зміни",
@@ -1097,7 +1160,8 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 return CHOOSING
             
-            context.user_data['current_questions'] = answered_questions
+            context.user_data['current_status'] = 'answered'
+            context.user_data.pop('current_questions', None)
             context.user_data['current_page'] = 0
             context.user_data['editing_answer'] = True
             
@@ -1125,6 +1189,55 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return CHOOSING
 
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /search: полнотекстовый поиск вопросов для админов"""
+    try:
+        if update.effective_user.id not in ADMIN_IDS:
+            await update.message.reply_text(
+                "❌ У вас немає прав адміністратора.",
+                disable_notification=True
+            )
+            return CHOOSING
+
+        query = ' '.join(context.args or [])
+        if not query:
+            await update.message.reply_text(
+                "🔎 Використання: /search <слова для пошуку>",
+                reply_markup=get_admin_menu_keyboard(),
+                disable_notification=True
+            )
+            return CHOOSING
+
+        questions = await db.search(query, limit=SEARCH_MAX_RESULTS)
+        if not questions:
+            await update.message.reply_text(
+                "🔎 Нічого не знайдено",
+                reply_markup=get_admin_menu_keyboard(),
+                disable_notification=True
+            )
+            return CHOOSING
+
+        # Результаты листаются так же, как списки меню админа
+        context.user_data['current_questions'] = questions
+        context.user_data.pop('current_status', None)
+        context.user_data['current_page'] = 0
+
+        await update.message.reply_text(
+            f"🔎 Знайдено питань: {len(questions)}",
+            reply_markup=get_questions_list_keyboard(questions),
+            disable_notification=True
+        )
+        return CHOOSING
+
+    except Exception as e:
+        logger.error(f"Ошибка при поиске вопросов: {e}")
+        await update.message.reply_text(
+            "❌ Виникла помилка. Спробуйте пізніше.",
+            reply_markup=get_admin_menu_keyboard(),
+            disable_notification=True
+        )
+        return CHOOSING
+
 def main():
     """Запуск бота"""
     try:
@@ -1153,7 +1266,7 @@ def main():
             return
 
         # Инициализация бота
-        application = Application.builder().token(os.getenv('TELEGRAM_TOKEN')).build()
+        application = Application.builder().token(os.getenv('TELEGRAM_TOKEN')).post_init(schedule_backups).post_shutdown(close_database).build()
 
         # Сначала добавляем обработчики для админского меню
         admin_menu_handlers = [
@@ -1179,6 +1292,9 @@ def main():
         for handler in admin_menu_handlers + main_menu_handlers:
             application.add_handler(handler)
 
+        # Поиск вопросов для админов
+        application.add_handler(CommandHandler('search', search_command))
+
         # Затем добавляем ConversationHandler
         conv_handler = ConversationHandler(
             entry_points=[
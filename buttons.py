@@ -9,9 +9,9 @@ from keyboards import (
     get_questions_list_keyboard, get_question_view_keyboard, get_back_button
 )
 from utils import is_admin, format_question_for_admin, handle_admin_question, notify_user_about_answer, format_stats
-from database import Database
+from database import AsyncDatabase
 
-async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE, db: Database):
+async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE, db: AsyncDatabase):
     """
     Обработчик нажатий на кнопки
     
@@ -82,7 +82,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE, db:
 
         elif data.startswith("view_q_"):
             question_id = data.replace("view_q_", "")
-            question = db.get_question(question_id)
+            question = await db.get_question(question_id)
             
             if not question:
                 await query.message.edit_text("❌ Питання не знайдено")
@@ -106,7 +106,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE, db:
 
         elif data.startswith("answer_"):
             question_id = data.replace("answer_", "")
-            question = db.get_question(question_id)
+            question = await db.get_question(question_id)
             
             if not question:
                 await query.message.edit_text("❌ Питання не знайдено")
@@ -125,7 +125,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE, db:
 
         elif data.startswith("edit_"):
             question_id = data.replace("edit_", "")
-            question = db.get_question(question_id)
+            question = await db.get_question(question_id)
             
             if not question:
                 await query.message.edit_text("❌ Питання не знайдено")
@@ -145,14 +145,14 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE, db:
 
         elif data.startswith("reject_"):
             question_id = data.replace("reject_", "")
-            question = db.get_question(question_id)
+            question = await db.get_question(question_id)
             
             if not question:
                 await query.message.edit_text("❌ Питання не знайдено")
                 return CHOOSING
 
-            db.update_question(question_id, {'status': 'rejected'})
-            question = db.get_question(question_id)
+            await db.update_question(question_id, {'status': 'rejected'})
+            question = await db.get_question(question_id)
 
             keyboard = [[
                 InlineKeyboardButton("↩️ Відновити", callback_data=f"restore_{question_id}"),
@@ -170,14 +170,14 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE, db:
 
         elif data.startswith("restore_"):
             question_id = data.replace("restore_", "")
-            question = db.get_question(question_id)
+            question = await db.get_question(question_id)
             
             if not question:
                 await query.message.edit_text("❌ Питання не знайдено")
                 return CHOOSING
 
-            db.update_question(question_id, {'status': 'pending'})
-            question = db.get_question(question_id)
+            await db.update_question(question_id, {'status': 'pending'})
+            question = await db.get_question(question_id)
 
             # Импортируем здесь, чтобы избежать циклических импортов
             from keyboards import get_admin_keyboard
@@ -193,15 +193,15 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE, db:
 
         elif data.startswith("important_"):
             question_id = data.replace("important_", "")
-            question = db.get_question(question_id)
+            question = await db.get_question(question_id)
             
             if not question:
                 await query.message.edit_text("❌ Питання не знайдено")
                 return CHOOSING
 
             is_important = not question.get('important', False)
-            db.update_question(question_id, {'important': is_important})
-            question = db.get_question(question_id)
+            await db.update_question(question_id, {'important': is_important})
+            question = await db.get_question(question_id)
 
             # Обновляем сообщение с новыми кнопками
             keyboard = []
@@ -232,7 +232,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE, db:
 
         elif data.startswith("pin_"):
             question_id = data.replace("pin_", "")
-            question = db.get_question(question_id)
+            question = await db.get_question(question_id)
             
             if not question:
                 await query.message.edit_text("❌ Питання не знайдено")
@@ -0,0 +1,376 @@
+import os
+import json
+import time
+import bisect
+import asyncio
+import argparse
+import threading
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Tuple
+
+from config import logger
+
+# Виды событий ленты изменений
+CHANGE_ADDED = 'added'
+CHANGE_ANSWERED = 'answered'
+CHANGE_REJECTED = 'rejected'
+CHANGE_RESTORED = 'restored'  # Закрытый вопрос снова ожидает ответа
+CHANGE_UPDATED = 'updated'
+CHANGE_DELETED = 'deleted'  # Вопрос удален политикой хранения
+CHANGE_REDACTED = 'redacted'  # Данные вопроса удалены из прежних событий ленты
+
+# Поля вопроса, которые не попадают в события: лента хранится без срока
+PRIVATE_FIELDS = ('user_id',)
+
+# Последних событий в памяти: подписчики, которые не отстали, читают их без диска
+CHANGE_FEED_BUFFER = 10000
+# Через сколько событий запоминается позиция в файле для быстрого чтения с номера
+CHANGE_FEED_INDEX_STEP = 1000
+# Событий за одно чтение
+CHANGE_FEED_BATCH = 1000
+
+def change_type(op: str, status: Optional[str], previous_status: Optional[str]) -> str:
+    """
+    Вид события по операции и переходу статуса
+
+    Args:
+        op: Операция записи ('add', 'update' или 'delete')
+        status: Статус вопроса после изменения (None - вопрос удален)
+        previous_status: Статус вопроса до изменения (None - вопроса не было)
+
+    Returns:
+        Вид события
+    """
+    if op == 'delete':
+        return CHANGE_DELETED
+    if op == 'add' or previous_status is None:
+        return CHANGE_ADDED
+    if status != previous_status:
+        if status == 'answered':
+            return CHANGE_ANSWERED
+        if status == 'rejected':
+            return CHANGE_REJECTED
+        if status == 'pending':
+            return CHANGE_RESTORED
+    return CHANGE_UPDATED
+
+def public_fields(data: Optional[dict], fields: Iterable[str] = PRIVATE_FIELDS) -> Optional[dict]:
+    """
+    Данные вопроса для события ленты без указанных полей
+
+    Args:
+        data: Данные вопроса или изменения (None - вопрос удален)
+        fields: Поля, которые не попадают в событие
+
+    Returns:
+        Копия данных без полей fields; None, если данных нет
+    """
+    if data is None:
+        return None
+    return {key: value for key, value in data.items() if key not in fields}
+
+def read_changes(changes_file: str, offset: int = 0, limit: Optional[int] = None,
+                 position: int = 0) -> List[dict]:
+    """
+    Чтение событий из файла ленты без его изменения (можно из другого процесса)
+
+    Args:
+        changes_file: Путь к файлу ленты
+        offset: Номер последнего полученного события (0 - с начала)
+        limit: Максимальное количество событий (None - все)
+        position: Позиция в файле, с которой начинать поиск
+
+    Returns:
+        События с номерами больше offset по порядку
+    """
+    events = []
+    if not os.path.exists(changes_file):
+        return events
+    with open(changes_file, 'rb') as f:
+        f.seek(position)
+        for line in f:
+            if not line.endswith(b'\n'):
+                # Событие еще записывается
+                break
+            event = json.loads(line.decode('utf-8'))
+            if event['seq'] <= offset:
+                continue
+            events.append(event)
+            if limit is not None and len(events) >= limit:
+                break
+    return events
+
+class ChangeFeed:
+    """
+    Упорядоченная лента изменений вопросов с номерами событий
+
+    События записываются в файл JSON Lines после сохранения изменений базой
+    и рассылаются подписчикам. Потребитель запоминает номер последнего события
+    и продолжает с него после перезапуска: так инкрементные резервные копии
+    (backups.BackupEngine) и выгрузка (export) берут изменения, не перечитывая базу.
+    Поисковый индекс и агрегаты активности по ленте не обновляются: они меняются
+    вместе с данными в памяти и сохраняются той же записью, что и вопросы.
+    Одну ленту могут использовать несколько баз (части ShardedDatabase):
+    номера выдаются общие, по порядку записи. События базы несут ее имя ('source')
+    и собственный номер ('source_seq'): по ним база после сбоя дописывает в ленту
+    сохраненные, но не записанные события (см. published).
+    Лента хранится без срока, поэтому ID пользователя (PRIVATE_FIELDS) в события
+    не записывается, а данные вопросов, к которым применена политика хранения,
+    удаляются и из прежних событий (см. redact).
+    """
+    def __init__(self, changes_file: str = 'changes.jsonl', buffer_size: int = CHANGE_FEED_BUFFER):
+        """
+        Открытие ленты: восстанавливается последний номер, недописанное событие отбрасывается
+
+        Args:
+            changes_file: Путь к файлу ленты
+            buffer_size: Количество последних событий в памяти
+        """
+        self.changes_file = changes_file
+        self._lock = threading.Lock()  # Запись в файл и выдача номеров
+        self._buffer: Deque[dict] = deque(maxlen=buffer_size)
+        self._positions: List[Tuple[int, int]] = []  # (номер события, позиция в файле) через CHANGE_FEED_INDEX_STEP
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._closed = False
+        self.last_seq = 0
+        self._published: Dict[str, int] = {}  # Имя базы -> последний записанный номер ее события
+
+        valid_size = 0
+        if os.path.exists(changes_file):
+            with open(changes_file, 'rb') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line.decode('utf-8'))
+                    except (UnicodeDecodeError, json.JSONDecodeError):
+                        logger.warning(f"Повреждённое событие в ленте {changes_file}, чтение остановлено")
+                        break
+                    if event['seq'] % CHANGE_FEED_INDEX_STEP == 1:
+                        self._positions.append((event['seq'], valid_size))
+                    self._buffer.append(event)
+                    self.last_seq = event['seq']
+                    self._track(event)
+                    valid_size += len(line)
+            if valid_size < os.path.getsize(changes_file):
+                with open(changes_file, 'r+b') as f:
+                    f.truncate(valid_size)
+        self._file = open(changes_file, 'ab')
+        self._size = valid_size
+        logger.info(f"Открыта лента изменений {changes_file}, последнее событие: {self.last_seq}")
+
+    def append(self, changes: List[dict]) -> List[dict]:
+        """
+        Запись событий в ленту и уведомление подписчиков
+
+        Номера выдаются только записанным событиям: при ошибке записи
+        лента остается непрерывной.
+
+        Args:
+            changes: События без номера ('type', 'id', 'data', 'question'; у удаленного вопроса None)
+
+        Returns:
+            События с номерами и временем записи
+        """
+        if not changes:
+            return []
+        with self._lock:
+            events = self._write(changes)
+            waiters = list(self._waiters)
+        self._notify(waiters)
+        return events
+
+    def _write(self, changes: List[dict]) -> List[dict]:
+        """Нумерация и запись событий в файл (вызывается под self._lock)"""
+        now = int(time.time())
+        events = [{'seq': self.last_seq + index, 'time': now, **change}
+                  for index, change in enumerate(changes, 1)]
+        lines = [(json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8') for event in events]
+        position = self._size
+        try:
+            self._file.write(b''.join(lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except Exception:
+            # Недописанные события отбрасываются, чтобы следующие записи шли с новой строки
+            self._file.truncate(position)
+            raise
+        for event, line in zip(events, lines):
+            if event['seq'] % CHANGE_FEED_INDEX_STEP == 1:
+                self._positions.append((event['seq'], position))
+            position += len(line)
+        self._size = position
+        self._buffer.extend(events)
+        self.last_seq = events[-1]['seq']
+        for event in events:
+            self._track(event)
+        return events
+
+    def _track(self, event: dict) -> None:
+        """Учет последнего записанного номера события базы-источника"""
+        source = event.get('source')
+        if source is not None:
+            self._published[source] = max(self._published.get(source, 0), event['source_seq'])
+
+    def published(self, source: str) -> int:
+        """
+        Последний записанный в ленту номер события базы
+
+        Args:
+            source: Имя базы ('source' в событиях)
+
+        Returns:
+            Наибольший 'source_seq' событий базы в ленте (0 - событий нет)
+        """
+        with self._lock:
+            return self._published.get(source, 0)
+
+    def redact(self, question_ids: Iterable[str], fields: Optional[Iterable[str]] = None) -> List[dict]:
+        """
+        Удаление данных вопросов из прежних событий (политика хранения)
+
+        Файл ленты переписывается во временный файл, который заменяет прежний; номера
+        событий не меняются. Для каждого вопроса записывается событие CHANGE_REDACTED,
+        по которому подписчики удаляют данные вопроса из своих копий.
+
+        Args:
+            question_ids: ID вопросов
+            fields: Удаляемые поля вопроса (None - все данные вопроса)
+
+        Returns:
+            Записанные события CHANGE_REDACTED
+        """
+        question_ids = list(dict.fromkeys(question_ids))
+        if not question_ids:
+            return []
+        targets = set(question_ids)
+        fields = None if fields is None else tuple(fields)
+
+        def redact_event(event: dict) -> dict:
+            if event['id'] not in targets:
+                return event
+            if fields is None:
+                return {**event, 'data': {}, 'question': None}
+            return {**event, 'data': public_fields(event['data'], fields),
+                    'question': public_fields(event['question'], fields)}
+
+        with self._lock:
+            temp_file = f"{self.changes_file}.tmp"
+            positions = []
+            size = 0
+            redacted = 0
+            with open(self.changes_file, 'rb') as source, open(temp_file, 'wb') as target:
+                for line in source:
+                    event = json.loads(line.decode('utf-8'))
+                    if event['id'] in targets:
+                        line = (json.dumps(redact_event(event), ensure_ascii=False) + '\n').encode('utf-8')
+                        redacted += 1
+                    if event['seq'] % CHANGE_FEED_INDEX_STEP == 1:
+                        positions.append((event['seq'], size))
+                    target.write(line)
+                    size += len(line)
+                target.flush()
+                os.fsync(target.fileno())
+            self._file.close()
+            os.replace(temp_file, self.changes_file)
+            self._file = open(self.changes_file, 'ab')
+            self._size = size
+            self._positions = positions
+            self._buffer = deque((redact_event(event) for event in self._buffer), maxlen=self._buffer.maxlen)
+
+            data = {} if fields is None else {'fields': list(fields)}
+            events = self._write([{'type': CHANGE_REDACTED, 'id': question_id, 'data': data, 'question': None}
+                                  for question_id in question_ids])
+            waiters = list(self._waiters)
+        self._notify(waiters)
+        logger.info(f"Данные вопросов удалены из ленты изменений: вопросов {len(question_ids)}, "
+                    f"событий {redacted}")
+        return events
+
+    def _notify(self, waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]) -> None:
+        """Пробуждение подписчиков в их циклах событий"""
+        for loop, wakeup in waiters:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # Цикл событий подписчика уже закрыт
+                pass
+
+    def read(self, offset: int = 0, limit: int = CHANGE_FEED_BATCH) -> List[dict]:
+        """
+        События после номера offset: из памяти, если подписчик не отстал, иначе из файла
+
+        Args:
+            offset: Номер последнего полученного события (0 - с начала)
+            limit: Максимальное количество событий
+
+        Returns:
+            События по порядку номеров
+        """
+        with self._lock:
+            if self._buffer and self._buffer[0]['seq'] <= offset + 1:
+                start = offset + 1 - self._buffer[0]['seq']
+                return [self._buffer[index] for index in range(start, min(start + limit, len(self._buffer)))]
+            if offset >= self.last_seq:
+                return []
+            index = bisect.bisect_right(self._positions, (offset + 1, float('inf'))) - 1
+            position = self._positions[index][1] if index >= 0 else 0
+        return read_changes(self.changes_file, offset, limit, position)
+
+    async def subscribe(self, offset: int = 0, batch: int = CHANGE_FEED_BATCH) -> AsyncIterator[dict]:
+        """
+        Асинхронная подписка на ленту: сначала пропущенные события, затем новые по мере записи
+
+        Args:
+            offset: Номер последнего полученного события (0 - с начала)
+            batch: Событий за одно чтение
+
+        Yields:
+            События по порядку номеров; подписка завершается при закрытии ленты
+        """
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self._lock:
+            self._waiters.append(waiter)
+        try:
+            while True:
+                waiter[1].clear()
+                # Отставший подписчик читает файл, не блокируя цикл событий
+                events = await loop.run_in_executor(None, self.read, offset, batch)
+                if not events:
+                    if self._closed:
+                        return
+                    await waiter[1].wait()
+                    continue
+                for event in events:
+                    offset = event['seq']
+                    yield event
+        finally:
+            with self._lock:
+                self._waiters.remove(waiter)
+
+    def close(self) -> None:
+        """Закрытие файла ленты и завершение подписок"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._file.close()
+            waiters = list(self._waiters)
+        self._notify(waiters)
+        logger.info(f"Лента изменений {self.changes_file} закрыта, последнее событие: {self.last_seq}")
+
+def main() -> None:
+    """Командная строка: python changefeed.py export <файл ленты> [--offset N] [--limit N]"""
+    parser = argparse.ArgumentParser(description='Лента изменений вопросов')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='Вывести события после номера в формате JSON Lines')
+    export_parser.add_argument('changes_file', help='Файл ленты, например changes.jsonl')
+    export_parser.add_argument('--offset', type=int, default=0, help='Номер последнего полученного события')
+    export_parser.add_argument('--limit', type=int, help='Максимальное количество событий')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        for event in read_changes(args.changes_file, args.offset, args.limit):
+            print(json.dumps(event, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
@@ -27,6 +27,44 @@ BOT_MODE = os.getenv('BOT_MODE', 'polling')  # По умолчанию испо
 WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # URL для webhook
 PORT = int(os.getenv('PORT', '8080'))  # Порт для webhook сервера
 
+# Настройки хранилища
+DB_TYPE = os.getenv('DB_TYPE', 'json')  # Тип базы данных ('json', 'sqlite' или 'sharded')
+DB_FILE = os.getenv('DB_FILE', 'db.json')  # Файл JSON базы данных
+SQLITE_FILE = os.getenv('SQLITE_FILE', 'bot.db')  # Файл SQLite базы данных
+DB_SHARDS = int(os.getenv('DB_SHARDS', '4'))  # Количество файлов SQLite для DB_TYPE=sharded
+DB_JOURNAL = os.getenv('DB_JOURNAL', '1') == '1'  # Журнал изменений для JSON базы
+DB_COMPACT_THRESHOLD = int(os.getenv('DB_COMPACT_THRESHOLD', '1000'))  # Записей в журнале до сжатия
+DB_FLUSH_INTERVAL_MS = int(os.getenv('DB_FLUSH_INTERVAL_MS', '0'))  # Окно группового сохранения (0 - сразу)
+DB_FLUSH_MAX_BATCH = int(os.getenv('DB_FLUSH_MAX_BATCH', '100'))  # Изменений до досрочного сохранения
+DB_ARCHIVE_AFTER_DAYS = int(os.getenv('DB_ARCHIVE_AFTER_DAYS', '0'))  # Дней до переноса закрытых вопросов в архив (0 - не переносить)
+DB_SNAPSHOT_FORMAT = os.getenv('DB_SNAPSHOT_FORMAT', 'json')  # Формат снимка JSON базы ('json' или 'binary')
+DB_CHANGE_FEED_FILE = os.getenv('DB_CHANGE_FEED_FILE', '')  # Файл ленты изменений вопросов ('' - не вести)
+DB_DEDUP_WINDOW = int(os.getenv('DB_DEDUP_WINDOW', '600'))  # Секунд, в течение которых такой же вопрос пользователя не добавляется повторно (0 - не проверять)
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # PRAGMA synchronous
+SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', '-16000'))  # PRAGMA cache_size (<0 - в КиБ)
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', '0'))  # PRAGMA mmap_size в байтах
+SQLITE_LAZY = os.getenv('SQLITE_LAZY', '0') == '1'  # Держать в памяти только горячие вопросы
+SQLITE_CACHE_ROWS = int(os.getenv('SQLITE_CACHE_ROWS', '1000'))  # Размер LRU остальных вопросов
+
+# Резервное копирование по расписанию
+BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')  # Каталог резервных копий
+BACKUP_INTERVAL = int(os.getenv('BACKUP_INTERVAL', '3600'))  # Секунд между копиями (0 - не копировать)
+BACKUP_FULL_EVERY = int(os.getenv('BACKUP_FULL_EVERY', '24'))  # Каждая N-я копия полная, остальные инкрементные
+BACKUP_COMPRESSION = os.getenv('BACKUP_COMPRESSION', 'gzip') or None  # Сжатие копий ('gzip', 'zstd' или пусто)
+BACKUP_KEEP_HOURLY = int(os.getenv('BACKUP_KEEP_HOURLY', '24'))  # Хранить цепочек копий по часам
+BACKUP_KEEP_DAILY = int(os.getenv('BACKUP_KEEP_DAILY', '7'))  # Хранить цепочек копий по дням
+BACKUP_KEEP_WEEKLY = int(os.getenv('BACKUP_KEEP_WEEKLY', '4'))  # Хранить цепочек копий по неделям
+
+# Политика хранения закрытых вопросов
+# Правила 'статус:дни:действие' через запятую, действие 'delete' или 'anonymize' (удалить ID пользователя),
+# например 'rejected:90:delete,answered:365:anonymize' ('' - ничего не удалять)
+DB_RETENTION_RULES = os.getenv('DB_RETENTION_RULES', '')
+DB_RETENTION_INTERVAL = int(os.getenv('DB_RETENTION_INTERVAL', '86400'))  # Секунд между запусками
+DB_RETENTION_BATCH = int(os.getenv('DB_RETENTION_BATCH', '500'))  # Вопросов, сохраняемых одной записью
+
+# Настройки поиска
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', '50'))  # Результатов поиска для админа
+
 # Категории вопросов
 CATEGORIES: Dict[str, str] = {
     'general': '🌟 Загальні',
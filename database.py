@@ -1,12 +1,520 @@
+import io
 import os
+import re
+import gzip
 import json
+import zlib
+import pickle
+import struct
+import shutil
 import sqlite3
+import unicodedata
+import asyncio
 import logging
+import functools
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager, ExitStack
+from types import MappingProxyType
+from typing import Dict, List, Any, Optional, Tuple, Callable, Union, Iterator, Mapping, NamedTuple
+from concurrent.futures import ThreadPoolExecutor
 import threading
+import time
+
+try:
+    import zstandard
+except ImportError:  # Сжатие zstd резервных копий необязательно
+    zstandard = None
 
 from config import CATEGORIES, logger
+from models import Question, QUESTION_FIELDS, QUESTION_TIME_FIELDS, TIME_UNIT, encode_time, decode_time
+from search import InvertedIndex, canonical_text
+from changefeed import ChangeFeed, change_type, public_fields, PRIVATE_FIELDS
+from rollups import Rollups, RollupKey
+
+# Операции, которые записываются в журнал изменений
+JOURNAL_OP_ADD = 'add'
+JOURNAL_OP_UPDATE = 'update'
+JOURNAL_OP_DELETE = 'delete'
+
+# Статусы вопросов
+QUESTION_STATUSES = ('pending', 'answered', 'rejected')
+
+# Префикс ключей счетчиков (статус x категория x важность) в таблице stats
+COUNT_KEY_PREFIX = 'count'
+
+# Префикс ID вопросов и ключ последовательности ID в таблице stats
+QUESTION_ID_PREFIX = 'q'
+SEQUENCE_KEY = 'sequence:questions'
+
+# Допустимые значения PRAGMA synchronous
+SQLITE_SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+# Статусы закрытых вопросов, которые переносятся в холодный архив
+ARCHIVE_STATUSES = ('answered', 'rejected')
+
+# Действия политики хранения: удаление вопроса или удаление данных пользователя
+RETENTION_DELETE = 'delete'
+RETENTION_ANONYMIZE = 'anonymize'
+RETENTION_ACTIONS = (RETENTION_DELETE, RETENTION_ANONYMIZE)
+# Вопросов, которые политика хранения изменяет за одно сохранение
+RETENTION_BATCH = 500
+
+# Окно в секундах, в котором такой же вопрос того же пользователя считается повторной отправкой
+DEDUP_WINDOW = 600
+
+# Файлы сегментов холодного архива: сжатые вопросы и их индекс
+COLD_SEGMENT_SUFFIX = '.jsonl.gz'
+COLD_INDEX_SUFFIX = '.idx.json'
+
+# Сжатие резервных копий и расширения их файлов
+BACKUP_EXTENSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+# Резервное копирование SQLite: страниц за шаг и пауза между шагами в секундах
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+
+# Блокировки изменений вопросов: количество полос (вопрос попадает в полосу по хешу ID)
+QUESTION_LOCK_STRIPES = 64
+# Попыток чтения без блокировки, после которых чтение выполняется под self.lock
+READ_RETRIES = 3
+
+# Форматы снимка JSON базы данных
+SNAPSHOT_FORMATS = ('json', 'binary')
+# Двоичный снимок: заголовок (сигнатура, версия, CRC32 и длина данных) и pickle с кортежами полей
+BINARY_SNAPSHOT_SUFFIX = '.snap'
+BINARY_SNAPSHOT_MAGIC = b'QBSNAP'
+BINARY_SNAPSHOT_VERSION = 2
+# Версия снимка, в которой время вопросов записано в секундах (читается с переводом в микросекунды)
+BINARY_SNAPSHOT_SECONDS_VERSION = 1
+BINARY_SNAPSHOT_HEADER = struct.Struct('<6sHIQ')
+
+# Колонки таблицы questions в порядке их объявления
+QUESTION_COLUMNS = QUESTION_FIELDS
+
+# Схема SQLite базы данных
+QUESTIONS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS questions (
+    id TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    text TEXT NOT NULL,
+    status TEXT NOT NULL,
+    time TEXT NOT NULL,
+    important INTEGER DEFAULT 0,
+    user_id INTEGER NOT NULL,
+    answer TEXT,
+    answer_time TEXT,
+    answer_message_id INTEGER
+)
+'''
+STATS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+)
+'''
+# Примененные миграции схемы
+SCHEMA_VERSION_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    applied_at TEXT NOT NULL
+)
+'''
+# Агрегаты активности по часам и дням (см. rollups.Rollups)
+ROLLUPS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS rollups (
+    period TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (period, bucket, category, metric)
+) WITHOUT ROWID
+'''
+
+# События ленты изменений, сохраненные в одной транзакции с изменениями (см. Database._recover_feed)
+FEED_OUTBOX_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS feed_outbox (
+    seq INTEGER PRIMARY KEY,
+    event TEXT NOT NULL
+)
+'''
+
+def _fill_rollups(conn: sqlite3.Connection) -> None:
+    """Построение агрегатов активности по вопросам, которые уже есть в базе (шаг миграции)"""
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    rollups = Rollups()
+    rollups.rebuild(Question.from_dict(dict(row)) for row in cursor.execute("SELECT * FROM questions"))
+    conn.execute("DELETE FROM rollups")
+    conn.executemany("INSERT INTO rollups (period, bucket, category, metric, value) VALUES (?, ?, ?, ?, ?)",
+                     rollups.rows())
+
+# Полнотекстовый поиск по тексту вопроса и ответа (внешнее содержимое - таблица questions)
+QUESTIONS_FTS_SQL = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+    text, answer, content='questions', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+)
+'''
+# Триггеры синхронизации поискового индекса с таблицей questions
+QUESTIONS_FTS_TRIGGERS_SQL = (
+    '''
+    CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+        INSERT INTO questions_fts (rowid, text, answer) VALUES (new.rowid, new.text, new.answer);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+        INSERT INTO questions_fts (questions_fts, rowid, text, answer) VALUES ('delete', old.rowid, old.text, old.answer);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS questions_fts_update AFTER UPDATE OF text, answer ON questions BEGIN
+        INSERT INTO questions_fts (questions_fts, rowid, text, answer) VALUES ('delete', old.rowid, old.text, old.answer);
+        INSERT INTO questions_fts (rowid, text, answer) VALUES (new.rowid, new.text, new.answer);
+    END
+    ''',
+)
+
+def _create_fts(conn: sqlite3.Connection) -> None:
+    """
+    Поисковый индекс FTS5 и триггеры синхронизации (шаг миграции)
+    
+    Новый индекс заполняется по уже существующим вопросам. Если SQLite собран без FTS5,
+    шаг откатывается до точки сохранения и миграция применяется без индекса:
+    поиск выполняется по индексу в памяти.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'questions_fts'"
+    ).fetchone() is not None
+    conn.execute("SAVEPOINT fts")
+    try:
+        conn.execute(QUESTIONS_FTS_SQL)
+        for sql in QUESTIONS_FTS_TRIGGERS_SQL:
+            conn.execute(sql)
+        if not exists:
+            conn.execute("INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        conn.execute("ROLLBACK TO fts")
+        logger.warning(f"Полнотекстовый поиск FTS5 недоступен: {e}")
+    conn.execute("RELEASE fts")
+
+# Миграции схемы по порядку: (версия, описание, шаги); шаг - SQL или функция от соединения.
+# Шаги первых версий идемпотентны, поэтому применяются и к базам, созданным до миграций.
+SCHEMA_MIGRATIONS: Tuple[Tuple[int, str, Tuple[Union[str, Callable[[sqlite3.Connection], None]], ...]], ...] = (
+    (1, 'Таблицы вопросов и статистики', (QUESTIONS_TABLE_SQL, STATS_TABLE_SQL)),
+    (2, 'Индексы для чтения вопросов по запросу', (
+        "CREATE INDEX IF NOT EXISTS idx_questions_user ON questions (user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_questions_hot ON questions (id) WHERE status = 'pending' OR important = 1",
+    )),
+    (3, 'Индексы по статусу и времени, важности и категории', (
+        # Индекс (status, time) заменяет индекс только по статусу
+        "CREATE INDEX IF NOT EXISTS idx_questions_status_time ON questions (status, time)",
+        "DROP INDEX IF EXISTS idx_questions_status",
+        "CREATE INDEX IF NOT EXISTS idx_questions_important ON questions (important)",
+        "CREATE INDEX IF NOT EXISTS idx_questions_category ON questions (category)",
+    )),
+    (4, 'Агрегаты активности по часам и дням', (ROLLUPS_TABLE_SQL, _fill_rollups)),
+    (5, 'События ленты изменений, еще не записанные в ленту', (FEED_OUTBOX_TABLE_SQL,)),
+    (6, 'Полнотекстовый поиск FTS5', (_create_fts,)),
+)
+# Версия схемы с таблицами, но без индексов (миграция JSON -> SQLite строит индексы после загрузки)
+SCHEMA_TABLES_VERSION = 1
+
+# Вес совпадений в тексте вопроса и в ответе при ранжировании
+SEARCH_TEXT_WEIGHT = 2.0
+SEARCH_ANSWER_WEIGHT = 1.0
+SEARCH_TERM_RE = re.compile(r'\w+')
+# Размер части при чтении вопросов из SQLite для построения индекса в памяти
+SEARCH_INDEX_CHUNK = 5000
+
+# Миграция JSON -> SQLite: размер пакета, чтение файла и ключ контрольной точки в таблице stats
+MIGRATION_BATCH_SIZE = 10000
+MIGRATION_CHUNK_SIZE = 1 << 20
+MIGRATION_KEY = 'migration:questions'
+
+def encode_base36(number: int) -> str:
+    """
+    Кодирование неотрицательного числа в base36
+    
+    Args:
+        number: Число
+        
+    Returns:
+        Строка из цифр и строчных латинских букв
+    """
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    if number == 0:
+        return '0'
+    result = ''
+    while number:
+        number, remainder = divmod(number, 36)
+        result = digits[remainder] + result
+    return result
+
+def parse_question_seq(question_id: str) -> Optional[int]:
+    """
+    Номер в последовательности, соответствующий ID вопроса
+    
+    Args:
+        question_id: ID вопроса (например, 'q1a')
+        
+    Returns:
+        Номер или None, если ID не из последовательности
+    """
+    if not question_id.startswith(QUESTION_ID_PREFIX):
+        return None
+    try:
+        # Прежние десятичные ID ('q12') разбираются как base36 и дают не меньшее число
+        return int(question_id[len(QUESTION_ID_PREFIX):], 36)
+    except ValueError:
+        return None
+
+@contextmanager
+def open_backup_file(backup_file: str, compression: Optional[str]):
+    """
+    Открытие файла резервной копии для потоковой записи со сжатием
+    
+    Файл пишется во временный и заменяет итоговый только после fsync.
+    
+    Args:
+        backup_file: Путь к файлу резервной копии
+        compression: Сжатие копии
+    
+    Returns:
+        Двоичный файл для записи
+    """
+    tmp_file = f"{backup_file}.tmp"
+    with open(tmp_file, 'wb') as raw:
+        try:
+            if compression == 'gzip':
+                with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                    yield f
+            elif compression == 'zstd':
+                with zstandard.ZstdCompressor().stream_writer(raw, closefd=False) as f:
+                    yield f
+            else:
+                yield raw
+            raw.flush()
+            os.fsync(raw.fileno())
+        except BaseException:
+            raw.close()
+            os.remove(tmp_file)
+            raise
+    os.replace(tmp_file, backup_file)
+
+def iter_snapshot_questions(json_file: str, meta: Optional[dict] = None,
+                            chunk_size: int = MIGRATION_CHUNK_SIZE) -> Iterator[Tuple[str, dict]]:
+    """
+    Потоковое чтение вопросов из JSON файла базы данных
+    
+    Файл читается частями, в памяти одновременно находится только один вопрос
+    и непрочитанный остаток части.
+    
+    Args:
+        json_file: Путь к JSON файлу
+        meta: Словарь, в который записываются остальные ключи верхнего уровня ('stats', 'sequence')
+        chunk_size: Размер читаемой части в символах
+        
+    Returns:
+        Итератор пар (ID, данные вопроса)
+    """
+    decoder = json.JSONDecoder()
+    with open(json_file, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            """Дочитывание следующей части файла"""
+            nonlocal buffer, pos, eof
+            if eof:
+                return False
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+
+        def skip(expected: str = '') -> str:
+            """Пропуск пробелов и чтение следующего символа-разделителя"""
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer):
+                    char = buffer[pos]
+                    if expected and char not in expected:
+                        raise ValueError(f"Ожидался один из символов {expected!r}, получен {char!r}")
+                    pos += 1
+                    return char
+                if not fill():
+                    raise ValueError("Неожиданный конец JSON файла")
+
+        def value() -> Any:
+            """Чтение очередного JSON значения, при необходимости с дочитыванием файла"""
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                try:
+                    result, end = decoder.raw_decode(buffer, pos)
+                    # Число в конце части может продолжаться в следующей
+                    if end < len(buffer) or eof:
+                        pos = end
+                        return result
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+
+        skip('{')
+        if skip() == '}':
+            return
+        pos -= 1
+        while True:
+            key = value()
+            skip(':')
+            if key == 'questions':
+                skip('{')
+                if skip() != '}':
+                    pos -= 1
+                    while True:
+                        question_id = value()
+                        skip(':')
+                        yield question_id, value()
+                        if skip(',}') == '}':
+                            break
+            else:
+                data = value()
+                if meta is not None:
+                    meta[key] = data
+            if skip(',}') == '}':
+                return
+
+class _ChecksumWriter:
+    """Обертка файла, считающая CRC32 и длину записанных данных"""
+    def __init__(self, f: io.BufferedIOBase):
+        self.f = f
+        self.crc = 0
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        return self.f.write(data)
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    """Чтение двоичного снимка: допускаются только встроенные типы данных"""
+    def find_class(self, module: str, name: str):
+        raise pickle.UnpicklingError(f"Недопустимый объект в снимке: {module}.{name}")
+
+def write_binary_snapshot(f: io.BufferedIOBase, questions: Dict[str, Question], stats: dict, sequence: int,
+                          rollups: Optional[list] = None, outbox: Optional[list] = None) -> None:
+    """
+    Запись двоичного снимка базы данных
+    
+    Вопросы хранятся кортежами значений без имен полей, время - числом секунд,
+    поэтому при загрузке не нужен разбор JSON и дат.
+    
+    Args:
+        f: Двоичный файл для записи с возможностью перемотки
+        questions: Вопросы для записи
+        stats: Статистика для записи
+        sequence: Следующий номер для ID вопроса
+        rollups: Строки агрегатов активности (None - не записывать)
+        outbox: События, еще не записанные в ленту изменений (None - не записывать)
+    """
+    start = f.tell()
+    f.write(BINARY_SNAPSHOT_HEADER.pack(BINARY_SNAPSHOT_MAGIC, BINARY_SNAPSHOT_VERSION, 0, 0))
+    writer = _ChecksumWriter(f)
+    pickle.Pickler(writer, protocol=pickle.HIGHEST_PROTOCOL).dump({
+        'fields': QUESTION_FIELDS,
+        'questions': [question.as_tuple() for question in questions.values()],
+        'stats': stats,
+        'sequence': sequence,
+        **({'rollups': rollups} if rollups is not None else {}),
+        **({'outbox': outbox} if outbox is not None else {}),
+    })
+    end = f.tell()
+    f.seek(start)
+    f.write(BINARY_SNAPSHOT_HEADER.pack(BINARY_SNAPSHOT_MAGIC, BINARY_SNAPSHOT_VERSION, writer.crc, writer.size))
+    f.seek(end)
+
+def read_binary_snapshot(snapshot_file: str, meta: Optional[dict] = None) -> Tuple[Dict[str, Question], dict, int]:
+    """
+    Чтение двоичного снимка базы данных с проверкой версии и контрольной суммы
+    
+    Args:
+        snapshot_file: Путь к файлу снимка
+        meta: Словарь, в который записываются остальные ключи снимка ('rollups', 'outbox')
+        
+    Returns:
+        Вопросы, статистика и следующий номер для ID вопроса
+    """
+    with open(snapshot_file, 'rb') as f:
+        header = f.read(BINARY_SNAPSHOT_HEADER.size)
+        if len(header) < BINARY_SNAPSHOT_HEADER.size:
+            raise ValueError(f"Снимок {snapshot_file} поврежден: неполный заголовок")
+        magic, version, crc, size = BINARY_SNAPSHOT_HEADER.unpack(header)
+        if magic != BINARY_SNAPSHOT_MAGIC:
+            raise ValueError(f"Файл {snapshot_file} не является двоичным снимком")
+        if version not in (BINARY_SNAPSHOT_VERSION, BINARY_SNAPSHOT_SECONDS_VERSION):
+            raise ValueError(f"Неподдерживаемая версия снимка {snapshot_file}: {version}")
+        payload = f.read(size)
+    if len(payload) != size or zlib.crc32(payload) != crc:
+        raise ValueError(f"Снимок {snapshot_file} поврежден: не совпадает контрольная сумма")
+
+    data = _SnapshotUnpickler(io.BytesIO(payload)).load()
+    del payload
+    if version == BINARY_SNAPSHOT_SECONDS_VERSION:
+        time_indexes = [index for index, field in enumerate(data['fields']) if field in QUESTION_TIME_FIELDS]
+        data['questions'] = [
+            tuple(value * TIME_UNIT if index in time_indexes and isinstance(value, int) else value
+                  for index, value in enumerate(values))
+            for values in data['questions']
+        ]
+    if tuple(data['fields']) == QUESTION_FIELDS:
+        questions = {values[0]: Question.from_tuple(values) for values in data['questions']}
+    else:
+        # Снимок с другим набором полей: значения сопоставляются по именам
+        fields = data['fields']
+        questions = {}
+        for values in data['questions']:
+            question = Question.from_dict(dict(zip(fields, values)))
+            questions[question.id] = question
+    if meta is not None:
+        meta.update((key, value) for key, value in data.items()
+                    if key not in ('fields', 'questions', 'stats', 'sequence'))
+    return questions, data['stats'], data['sequence']
+
+class StatsSnapshot(NamedTuple):
+    """
+    Неизменяемый снимок счетчиков и статистики
+    
+    Публикуется заменой одной ссылки после каждого изменения, поэтому читатели
+    получают согласованные данные без блокировки и не могут изменить состояние базы.
+    """
+    version: int  # Номер снимка, растет с каждым изменением счетчиков
+    counts: Mapping[Tuple[str, str, bool], int]  # Количество вопросов по ячейкам
+    stats: Mapping[str, Any]  # Статистика в формате get_stats
+
+def freeze_stats(stats: dict) -> Mapping[str, Any]:
+    """
+    Статистика только для чтения (вложенные словари тоже защищены от изменения)
+    
+    Args:
+        stats: Статистика
+        
+    Returns:
+        Представление статистики только для чтения
+    """
+    return MappingProxyType({key: MappingProxyType(value) if isinstance(value, dict) else value
+                             for key, value in stats.items()})
 
 class DatabaseException(Exception):
     """Базовое исключение для ошибок базы данных"""
@@ -14,7 +522,16 @@ class DatabaseException(Exception):
 
 class Database:
     """Класс для работы с базой данных"""
-    def __init__(self, db_type: str = 'json', filename: str = 'db.json', sqlite_file: str = 'bot.db'):
+    # Количество независимых частей хранилища со своими блокировками (см. ShardedDatabase)
+    shard_count = 1
+
+    def __init__(self, db_type: str = 'json', filename: str = 'db.json', sqlite_file: str = 'bot.db',
+                 journal: bool = False, compact_threshold: int = 1000,
+                 sqlite_synchronous: str = 'NORMAL', sqlite_cache_size: int = -16000,
+                 sqlite_mmap_size: int = 0, flush_interval_ms: int = 0, flush_max_batch: int = 100,
+                 sqlite_lazy: bool = False, sqlite_cache_rows: int = 1000, archive_after_days: int = 0,
+                 snapshot_format: str = 'json', change_feed: Optional[ChangeFeed] = None,
+                 dedup_window: int = DEDUP_WINDOW):
         """
         Инициализация базы данных
         
@@ -22,17 +539,118 @@ class Database:
             db_type: Тип базы данных ('json' или 'sqlite')
             filename: Имя файла для JSON базы данных
             sqlite_file: Имя файла для SQLite базы данных
+            journal: Записывать изменения JSON базы в журнал вместо полной перезаписи файла
+            compact_threshold: Количество записей в журнале, после которого запускается сжатие
+            sqlite_synchronous: Режим PRAGMA synchronous ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+            sqlite_cache_size: PRAGMA cache_size (отрицательное значение - размер в КиБ)
+            sqlite_mmap_size: PRAGMA mmap_size в байтах (0 - не использовать mmap)
+            flush_interval_ms: Окно группового сохранения в миллисекундах (0 - сохранять каждое изменение сразу)
+            flush_max_batch: Количество изменений, при котором сохранение выполняется не дожидаясь окна
+            sqlite_lazy: Держать в памяти только ожидающие и важные вопросы, остальные читать из SQLite по запросу
+            sqlite_cache_rows: Количество недавно прочитанных остальных вопросов, которые остаются в памяти
+            archive_after_days: Через сколько дней закрытые вопросы JSON базы переносятся в холодный архив (0 - не переносить)
+            snapshot_format: Формат снимка JSON базы ('json' или 'binary' - двоичный файл <filename>.snap)
+            change_feed: Лента, в которую записываются сохраненные изменения (закрывает ее владелец)
+            dedup_window: Окно в секундах для поиска повторных отправок вопроса (0 - не искать)
         """
         self.db_type = db_type
         self.filename = filename
         self.sqlite_file = sqlite_file
-        self.questions = {}
-        self.stats = {
-            'total_questions': 0,
-            'answered_questions': 0,
-            'categories': {cat: 0 for cat in CATEGORIES.keys()}
-        }
-        self.lock = threading.Lock()  # Для безопасного доступа к данным
+        self.journal = journal and db_type == 'json'
+        self.journal_file = f"{filename}.journal"
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise DatabaseException(f"Неподдерживаемый формат снимка: {snapshot_format}")
+        self.snapshot_format = snapshot_format
+        self.snapshot_file = f"{filename}{BINARY_SNAPSHOT_SUFFIX}"  # Двоичный снимок
+        self.compact_threshold = compact_threshold
+        self._journal = None  # Открытый файл журнала
+        self._journal_records = 0  # Количество записей в текущем журнале
+        self._compact_thread = None  # Фоновый поток сжатия журнала
+        self._compact_lock = threading.Lock()  # Одновременно выполняется только одно сжатие
+        self.sqlite_synchronous = sqlite_synchronous.upper()
+        self.sqlite_cache_size = sqlite_cache_size
+        self.sqlite_mmap_size = sqlite_mmap_size
+        self._conn = None  # Постоянное соединение с SQLite
+        # Соединение для чтений, которые не ждут сохранения изменений (WAL допускает параллельное чтение)
+        self._read_conn = None
+        self._read_conn_lock = threading.Lock()  # Доступ к self._read_conn; берется последним
+        self.fts = False  # Доступен ли поисковый индекс FTS5
+        # Инвертированный индекс для поиска без FTS5; строится в фоне после загрузки
+        self._search_index: Optional[InvertedIndex] = None
+        self._search_index_ready = False
+        self._search_index_lock = threading.Lock()  # Построение индекса; берется до self._flush_lock
+        # Изменение индекса и поиск по нему; берется до self.lock, запись его не берет
+        self._search_lock = threading.Lock()
+        # Изменения вопросов, еще не внесенные в индекс: ID -> новая версия (None - удален).
+        # Запись только запоминает изменение под self.lock, в индекс его вносит поиск;
+        # по одной записи на вопрос, поэтому размер не больше числа вопросов
+        self._search_index_changes: Optional[Dict[str, Optional[Question]]] = None
+        self._search_index_thread = None
+        self.lazy = sqlite_lazy and db_type == 'sqlite'
+        self.sqlite_cache_rows = sqlite_cache_rows
+        # Недавно использованные вопросы, которые не относятся к горячим (в ленивом режиме)
+        self._lru: 'OrderedDict[str, None]' = OrderedDict()
+        self.archive_after_days = archive_after_days if db_type == 'json' else 0
+        self.cold_dir = f"{filename}.cold"  # Каталог сегментов холодного архива
+        # Индекс холодного архива: ID -> (сегмент, статус, категория, важность, пользователь)
+        self._cold: Dict[str, Tuple[str, str, str, bool, int]] = {}
+        # ID вопросов архива по статусу и по пользователю в порядке переноса (см. _cold_put)
+        self._cold_by_status: Dict[str, Dict[str, None]] = {}
+        self._cold_by_user: Dict[int, Dict[str, None]] = {}
+        self._archiving: Dict[str, Question] = {}  # Перенесенные в архив, но еще не записанные
+        # Сегменты с устаревшими копиями вопросов, которые вернулись из архива или заархивированы повторно;
+        # при удалении вопроса (или его данных) копии удаляются из сегментов
+        self._stale: Dict[str, List[str]] = {}
+        # Запись и перезапись сегментов архива; берется после self._snapshot_lock и блокировок вопросов
+        self._cold_lock = threading.Lock()
+        self._segment_seq = 0  # Номер последнего сегмента архива
+        self._changed: Dict[str, None] = {}  # ID вопросов, измененных после последней резервной копии
+        self.flush_interval_ms = flush_interval_ms
+        self.flush_max_batch = flush_max_batch
+        # Примененные в памяти, но еще не сохраненные изменения: (запись, изменения счетчиков,
+        # строка таблицы для добавления, событие ленты, изменения агрегатов активности)
+        self._pending = []
+        # Число несохраненных изменений по ID вопроса, включая сохраняемые прямо сейчас; такие вопросы
+        # не вытесняются из памяти, и чтения из SQLite берут их версию из памяти
+        self._unsaved: Dict[str, int] = {}
+        self.change_feed = change_feed
+        # Имя базы в событиях ленты и номер последнего выданного события базы
+        self.feed_source = os.path.basename(sqlite_file if db_type == 'sqlite' else filename)
+        self._feed_seq = 0
+        self._feed_saved = 0  # Номер последнего сохраненного события базы
+        # События базы, которые еще не записаны в ленту: они сохраняются вместе с изменениями
+        # (журнал, снимок, таблица feed_outbox) и после сбоя дописываются в ленту при запуске
+        self._outbox: List[dict] = []
+        # Сохранение изменений, журнал и соединение с SQLite; берется до self.lock
+        self._flush_lock = threading.Lock()
+        self._flush_event = threading.Event()  # Пробуждение фонового сохранения
+        self._flush_stop = threading.Event()
+        self._flush_thread = None
+        self._snapshot_lock = threading.Lock()  # Запись снимка; берется после self._flush_lock
+        self.questions: Dict[str, Question] = {}
+        # Счетчики вопросов по ячейкам (статус, категория, важность); словарь заменяется
+        # целиком при каждом изменении (_set_counts) и не изменяется на месте
+        self._counts: Dict[Tuple[str, str, bool], int] = {}
+        self._stats_snapshot = StatsSnapshot(0, MappingProxyType(self._counts),
+                                             freeze_stats(self._stats_from_counts(self._counts)))
+        self._next_seq = 1  # Следующий номер для ID вопроса
+        # Агрегаты активности по часам и дням; обновляются вместе со счетчиками
+        self._rollups = Rollups()
+        # Изменение данных в памяти; чтение идет без блокировки и проверяет self._version
+        self.lock = threading.Lock()
+        # Номер версии данных в памяти: нечетный, пока идет изменение (см. _read_view)
+        self._version = 0
+        # Изменение вопроса от чтения до постановки в очередь; берется до self._flush_lock
+        self._question_locks = [threading.Lock() for _ in range(QUESTION_LOCK_STRIPES)]
+
+        # Вторичные индексы: упорядоченные множества ID вопросов (dict с ключами-ID)
+        self._by_status: Dict[str, Dict[str, None]] = {}
+        self._by_user: Dict[int, Dict[str, None]] = {}
+        self._important: Dict[str, None] = {}
+        # Ожидающие вопросы по (пользователь, категория, хеш текста) для поиска повторных отправок
+        self._by_text: Dict[Tuple[int, str, int], str] = {}
+        self.dedup_window = dedup_window
+        self._submit_lock = threading.Lock()  # Проверка повторной отправки и добавление; берется первой
         
         # Инициализация базы данных в зависимости от типа
         if db_type == 'json':
@@ -41,329 +659,2448 @@ class Database:
             self.init_sqlite()
         else:
             raise DatabaseException(f"Неподдерживаемый тип базы данных: {db_type}")
+        if change_feed is not None:
+            self._recover_feed()
+
+        if flush_interval_ms > 0:
+            self._flush_thread = threading.Thread(target=self._flush_loop, name='db-flush', daemon=True)
+            self._flush_thread.start()
+
+        if not self.fts:
+            # Без FTS5 поиск идет по индексу в памяти; он строится в фоне, не задерживая запуск
+            self._search_index_thread = threading.Thread(target=self._build_search_index,
+                                                         name='db-search-index', daemon=True)
+            self._search_index_thread.start()
+
+    @contextmanager
+    def _write_lock(self):
+        """
+        Изменение данных в памяти: self.lock и нечетная версия на время изменения
+
+        Читатели без блокировки по версии узнают, что данные менялись во время чтения.
+        """
+        with self.lock:
+            self._version += 1
+            try:
+                yield
+            finally:
+                self._version += 1
+
+    def _read_view(self, read: Callable[[], Any]) -> Any:
+        """
+        Чтение данных в памяти без блокировки (по версии, как seqlock)
+
+        Чтение повторяется, если во время него данные изменились, и выполняется
+        под self.lock, если изменение идет сейчас или попытки закончились.
+        Изменения в памяти короткие и не ждут записи на диск.
+
+        Args:
+            read: Функция чтения; не должна изменять данные
+
+        Returns:
+            Результат функции чтения
+        """
+        for _ in range(READ_RETRIES):
+            version = self._version
+            if version & 1:
+                break
+            try:
+                result = read()
+            except (RuntimeError, KeyError):
+                # Словарь изменился во время обхода
+                continue
+            if self._version == version:
+                return result
+        with self.lock:
+            return read()
+
+    def _question_lock(self, question_id: str) -> threading.Lock:
+        """
+        Блокировка изменений вопроса (полоса по хешу ID)
+
+        Args:
+            question_id: ID вопроса
+
+        Returns:
+            Блокировка полосы, к которой относится вопрос
+        """
+        return self._question_locks[zlib.crc32(question_id.encode('utf-8')) % QUESTION_LOCK_STRIPES]
+
+    def _open_sqlite(self, sqlite_file: str) -> sqlite3.Connection:
+        """
+        Открытие соединения с SQLite в режиме WAL с настроенными PRAGMA
+        
+        Args:
+            sqlite_file: Путь к файлу SQLite
+            
+        Returns:
+            Открытое соединение
+        """
+        if self.sqlite_synchronous not in SQLITE_SYNCHRONOUS_MODES:
+            raise DatabaseException(f"Неподдерживаемый режим synchronous: {self.sqlite_synchronous}")
+
+        # Соединение используется из разных потоков, доступ к нему защищен self._flush_lock
+        # (к соединению для чтений - self._read_conn_lock)
+        conn = sqlite3.connect(sqlite_file, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {self.sqlite_synchronous}")
+        conn.execute(f"PRAGMA cache_size = {int(self.sqlite_cache_size)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.sqlite_mmap_size)}")
+        # INSERT OR REPLACE удаляет старую строку; ее нужно убрать и из поискового индекса
+        conn.execute("PRAGMA recursive_triggers = ON")
+        return conn
+
+    @staticmethod
+    def schema_version(conn: sqlite3.Connection) -> int:
+        """
+        Текущая версия схемы SQLite базы
+        
+        Args:
+            conn: Соединение с SQLite
+            
+        Returns:
+            Номер последней примененной миграции (0 - миграции не применялись)
+        """
+        conn.execute(SCHEMA_VERSION_TABLE_SQL)
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+    @staticmethod
+    def _migrate_schema(conn: sqlite3.Connection, target: Optional[int] = None) -> int:
+        """
+        Применение миграций схемы, которые еще не применены
+        
+        Каждая миграция выполняется в своей транзакции вместе с записью в schema_version,
+        поэтому прерванный запуск продолжается с первой непримененной миграции.
+        
+        Args:
+            conn: Соединение с SQLite
+            target: Версия, до которой применяются миграции (None - последняя)
+            
+        Returns:
+            Версия схемы после миграций
+        """
+        with conn:
+            current = Database.schema_version(conn)
+        latest = SCHEMA_MIGRATIONS[-1][0]
+        if current > latest:
+            raise DatabaseException(f"Схема базы версии {current} новее поддерживаемой ({latest})")
+        for version, description, steps in SCHEMA_MIGRATIONS:
+            if version <= current or (target is not None and version > target):
+                continue
+            started = time.monotonic()
+            with conn:
+                # Без явной транзакции модуль sqlite3 выполняет DDL вне транзакции
+                conn.execute("BEGIN")
+                for step in steps:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                conn.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                             (version, description, datetime.now().isoformat()))
+            current = version
+            logger.info(f"Применена миграция схемы {version} ({description}) "
+                        f"за {time.monotonic() - started:.2f} с")
+        return current
+
+    @staticmethod
+    def _has_fts(conn: sqlite3.Connection) -> bool:
+        """
+        Доступен ли поисковый индекс FTS5 (создается миграцией схемы, см. _create_fts)
+        
+        Args:
+            conn: Соединение с SQLite
+            
+        Returns:
+            True, если индекс есть и SQLite может его читать
+        """
+        try:
+            conn.execute("SELECT rowid FROM questions_fts LIMIT 0")
+        except sqlite3.OperationalError:
+            return False
+        return True
 
     def load_json(self) -> None:
-        """Загрузка базы данных из JSON файла"""
+        """Загрузка базы данных из JSON файла или двоичного снимка"""
         try:
-            if os.path.exists(self.filename):
-                with self.lock:
-                    with open(self.filename, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        self.questions = data.get('questions', {})
-                        self.stats = data.get('stats', {
-                            'total_questions': 0,
-                            'answered_questions': 0,
-                            'categories': {cat: 0 for cat in CATEGORIES.keys()}
-                        })
-                logger.info(f"База данных успешно загружена из {self.filename}")
-            else:
+            snapshot_file = self._snapshot_source()
+            if snapshot_file:
+                with self._write_lock():
+                    meta = {}
+                    if snapshot_file == self.snapshot_file:
+                        # Номер в двоичном снимке записан базой и уже учитывает все ID
+                        self.questions, _, self._next_seq = read_binary_snapshot(snapshot_file, meta)
+                    else:
+                        with open(snapshot_file, 'r', encoding='utf-8') as f:
+                            data = json.load(f)
+                            self.questions = {q_id: Question.from_dict(q)
+                                              for q_id, q in data.get('questions', {}).items()}
+                            self._next_seq = data.get('sequence', 1)
+                            meta['rollups'] = data.get('rollups')
+                            meta['outbox'] = data.get('outbox')
+                        for question_id in self.questions:
+                            self._advance_sequence(question_id)
+                    self._rebuild_indexes()
+                    self._load_cold_index()
+                    self._set_counts(self._count_questions_in_memory())
+                    if meta.get('rollups') is not None:
+                        self._rollups.load(meta['rollups'])
+                    else:
+                        # Снимок прежней версии или восстановленный из копии - агрегаты строятся заново
+                        self._rollups.rebuild(self._iter_all_questions())
+                    self._outbox = list(meta.get('outbox') or [])
+                logger.info(f"База данных успешно загружена из {snapshot_file}")
+            elif not self.journal:
                 logger.info(f"Файл базы данных {self.filename} не найден, создана новая база")
                 self.save_json()
+
+            if self.journal:
+                with self._write_lock():
+                    # Сначала журнал, сжатие которого было прервано, затем текущий
+                    self._replay_journal(f"{self.journal_file}.compacting")
+                    self._journal_records = self._replay_journal(self.journal_file)
+                    self._journal = open(self.journal_file, 'a', encoding='utf-8')
         except Exception as e:
             logger.error(f"Ошибка при загрузке базы данных из JSON: {e}")
             raise DatabaseException(f"Ошибка при загрузке базы данных: {e}")
 
+    def _snapshot_source(self) -> Optional[str]:
+        """
+        Файл снимка для загрузки: снимок настроенного формата, а без него - снимок другого формата
+        
+        Время изменения файлов не учитывается: скопированный или восстановленный файл
+        может быть старше. Снимок другого формата загружается только после смены формата,
+        а первая запись снимка в новом формате удаляет его (см. _write_snapshot).
+        
+        Returns:
+            Путь к файлу снимка или None, если снимка нет
+        """
+        target = self._snapshot_target()
+        other = self._snapshot_other()
+        if os.path.exists(target):
+            if os.path.exists(other):
+                logger.warning(f"Найдены снимки обоих форматов, загружается {target} "
+                               f"(формат {self.snapshot_format}), {other} не используется")
+            return target
+        return other if os.path.exists(other) else None
+
     def save_json(self) -> None:
         """Сохранение базы данных в JSON файл"""
         try:
-            with self.lock:
-                with open(self.filename, 'w', encoding='utf-8') as f:
-                    json.dump({
-                        'questions': self.questions,
-                        'stats': self.stats
-                    }, f, ensure_ascii=False, indent=2)
-            logger.info(f"База данных успешно сохранена в {self.filename}")
+            with self._write_lock():
+                segment, archived = self._select_cold()
+            if archived:
+                self._write_archived(segment, archived)
+            with self._snapshot_lock:
+                with self.lock:
+                    # Вопросы не изменяются на месте, снимок пишется по копии словаря без блокировки
+                    questions = dict(self.questions)
+                    stats = self._build_stats()
+                    sequence = self._next_seq
+                    rollups = self._rollups.rows()
+                    outbox = list(self._outbox) or None
+                self._write_snapshot(questions, stats, sequence, rollups, outbox)
+            logger.info(f"База данных успешно сохранена в {self._snapshot_target()}")
         except Exception as e:
             logger.error(f"Ошибка при сохранении базы данных в JSON: {e}")
             raise DatabaseException(f"Ошибка при сохранении базы данных: {e}")
 
-    def init_sqlite(self) -> None:
-        """Инициализация SQLite базы данных"""
-        try:
-            with self.lock:
-                conn = sqlite3.connect(self.sqlite_file)
-                cursor = conn.cursor()
-                
-                # Создаем таблицу для вопросов, если она не существует
-                cursor.execute('''
-                CREATE TABLE IF NOT EXISTS questions (
-                    id TEXT PRIMARY KEY,
-                    category TEXT NOT NULL,
-                    text TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    time TEXT NOT NULL,
-                    important INTEGER DEFAULT 0,
-                    user_id INTEGER NOT NULL,
-                    answer TEXT,
-                    answer_time TEXT,
-                    answer_message_id INTEGER
-                )
-                ''')
-                
-                # Создаем таблицу для статистики
-                cursor.execute('''
-                CREATE TABLE IF NOT EXISTS stats (
-                    key TEXT PRIMARY KEY,
-                    value INTEGER
-                )
-                ''')
-                
-                # Инициализируем статистику, если она не существует
-                cursor.execute("INSERT OR IGNORE INTO stats (key, value) VALUES ('total_questions', 0)")
-                cursor.execute("INSERT OR IGNORE INTO stats (key, value) VALUES ('answered_questions', 0)")
-                
-                # Инициализируем статистику по категориям
-                for cat in CATEGORIES.keys():
-                    cursor.execute("INSERT OR IGNORE INTO stats (key, value) VALUES (?, 0)", (f"category_{cat}",))
-                
-                conn.commit()
-                conn.close()
-                
-                # Загружаем данные из SQLite в память
-                self._load_from_sqlite()
-                
-            logger.info(f"SQLite база данных инициализирована в {self.sqlite_file}")
-        except Exception as e:
-            logger.error(f"Ошибка при инициализации SQLite базы данных: {e}")
-            raise DatabaseException(f"Ошибка при инициализации SQLite базы данных: {e}")
+    def _snapshot_target(self) -> str:
+        """Файл, в который записывается снимок в настроенном формате"""
+        return self.snapshot_file if self.snapshot_format == 'binary' else self.filename
 
-    def _load_from_sqlite(self) -> None:
-        """Загрузка данных из SQLite в память"""
-        try:
-            with self.lock:
-                conn = sqlite3.connect(self.sqlite_file)
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
-                # Загружаем вопросы
-                cursor.execute("SELECT * FROM questions")
-                rows = cursor.fetchall()
-                self.questions = {}
-                for row in rows:
-                    question = dict(row)
-                    # Преобразуем important из 0/1 в False/True
-                    question['important'] = bool(question['important'])
-                    self.questions[question['id']] = question
-                
-                # Загружаем статистику
-                cursor.execute("SELECT * FROM stats")
-                rows = cursor.fetchall()
-                self.stats = {
-                    'total_questions': 0,
-                    'answered_questions': 0,
-                    'categories': {cat: 0 for cat in CATEGORIES.keys()}
-                }
-                
-                for row in rows:
-                    key, value = row['key'], row['value']
-                    if key == 'total_questions':
-                        self.stats['total_questions'] = value
-                    elif key == 'answered_questions':
-                        self.stats['answered_questions'] = value
-                    elif key.startswith('category_'):
-                        cat = key.replace('category_', '')
-                        if cat in CATEGORIES:
-                            self.stats['categories'][cat] = value
-                
-                conn.close()
-        except Exception as e:
-            logger.error(f"Ошибка при загрузке данных из SQLite: {e}")
-            raise DatabaseException(f"Ошибка при загрузке данных из SQLite: {e}")
+    def _snapshot_other(self) -> str:
+        """Файл снимка другого формата (остается после смены формата)"""
+        return self.filename if self.snapshot_format == 'binary' else self.snapshot_file
 
-    def _save_to_sqlite(self) -> None:
-        """Сохранение данных из памяти в SQLite"""
-        try:
-            with self.lock:
-                conn = sqlite3.connect(self.sqlite_file)
-                cursor = conn.cursor()
-                
-                # Сохраняем вопросы
-                for q_id, question in self.questions.items():
-                    # Преобразуем important из True/False в 1/0
-                    important = 1 if question.get('important', False) else 0
-                    
-                    cursor.execute('''
-                    INSERT OR REPLACE INTO questions 
-                    (id, category, text, status, time, important, user_id, answer, answer_time, answer_message_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        question['id'],
-                        question['category'],
-                        question['text'],
-                        question['status'],
-                        question['time'],
-                        important,
-                        question['user_id'],
-                        question.get('answer'),
-                        question.get('answer_time'),
-                        question.get('answer_message_id')
-                    ))
-                
-                # Сохраняем статистику
-                cursor.execute("UPDATE stats SET value = ? WHERE key = ?", 
-                              (self.stats['total_questions'], 'total_questions'))
-                cursor.execute("UPDATE stats SET value = ? WHERE key = ?", 
-                              (self.stats['answered_questions'], 'answered_questions'))
-                
-                # Сохраняем статистику по категориям
-                for cat, count in self.stats['categories'].items():
-                    cursor.execute("UPDATE stats SET value = ? WHERE key = ?", 
-                                  (count, f"category_{cat}"))
-                
-                conn.commit()
-                conn.close()
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении данных в SQLite: {e}")
-            raise DatabaseException(f"Ошибка при сохранении данных в SQLite: {e}")
+    def _write_snapshot(self, questions: Dict[str, Question], stats: dict, sequence: int,
+                        rollups: Optional[list] = None, outbox: Optional[list] = None) -> None:
+        """
+        Атомарная запись снимка базы данных в JSON файл или двоичный снимок
+        
+        Args:
+            questions: Вопросы для записи
+            stats: Статистика для записи
+            sequence: Следующий номер для ID вопроса
+            rollups: Строки агрегатов активности (None - не записывать)
+            outbox: События, еще не записанные в ленту изменений (None - не записывать)
+        """
+        target = self._snapshot_target()
+        tmp_file = f"{target}.tmp"
+        if self.snapshot_format == 'binary':
+            with open(tmp_file, 'wb') as f:
+                write_binary_snapshot(f, questions, stats, sequence, rollups, outbox)
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                self._dump_snapshot(f, questions, stats, sequence, rollups, outbox)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_file, target)
+        # Снимок прежнего формата устарел; загружается всегда снимок настроенного формата
+        other = self._snapshot_other()
+        if os.path.exists(other):
+            os.remove(other)
 
-    def save(self) -> None:
-        """Сохранение базы данных"""
-        if self.db_type == 'json':
-            self.save_json()
-        elif self.db_type == 'sqlite':
-            self._save_to_sqlite()
+    @staticmethod
+    def _dump_snapshot(f: io.TextIOBase, questions: Dict[str, Question], stats: dict, sequence: int,
+                       rollups: Optional[list] = None, outbox: Optional[list] = None) -> None:
+        """
+        Потоковая запись снимка в формате JSON файла базы данных
+        
+        Вопросы сериализуются по одному, поэтому весь снимок не собирается в памяти.
+        
+        Args:
+            f: Текстовый файл для записи
+            questions: Вопросы для записи
+            stats: Статистика для записи
+            sequence: Следующий номер для ID вопроса
+            rollups: Строки агрегатов активности (None - не записывать)
+            outbox: События, еще не записанные в ленту изменений (None - не записывать)
+        """
+        f.write('{\n  "questions": {')
+        separator = '\n'
+        for question_id, question in questions.items():
+            f.write(f"{separator}    {json.dumps(question_id, ensure_ascii=False)}: "
+                    f"{json.dumps(question.to_dict(), ensure_ascii=False)}")
+            separator = ',\n'
+        f.write(f'\n  }},\n  "stats": {json.dumps(stats, ensure_ascii=False)},\n  "sequence": {sequence}')
+        if rollups is not None:
+            f.write(f',\n  "rollups": {json.dumps(rollups, ensure_ascii=False)}')
+        if outbox is not None:
+            f.write(f',\n  "outbox": {json.dumps(outbox, ensure_ascii=False)}')
+        f.write('\n}\n')
 
-    def add_question(self, question_id: str, question_data: dict) -> None:
+    def _replay_journal(self, journal_file: str) -> int:
         """
-        Добавление нового вопроса
+        Применение записей журнала к загруженному снимку
         
         Args:
-            question_id: Уникальный идентификатор вопроса
-            question_data: Данные вопроса
+            journal_file: Путь к файлу журнала
+            
+        Returns:
+            Количество примененных записей
+        """
+        if not os.path.exists(journal_file):
+            return 0
+
+        count = 0
+        valid_size = 0
+        with open(journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    # Последняя запись могла быть записана не полностью при сбое
+                    logger.warning(f"Повреждённая запись в журнале {journal_file}, воспроизведение остановлено")
+                    break
+                self._apply_record(record)
+                if record.get('event') is not None:
+                    # Событие ленты сохранено вместе с изменением (см. _flush_pending)
+                    self._outbox.append(record['event'])
+                valid_size += len(line)
+                count += 1
+
+        if valid_size < os.path.getsize(journal_file):
+            with open(journal_file, 'r+b') as f:
+                f.truncate(valid_size)
+
+        logger.info(f"Из журнала {journal_file} воспроизведено записей: {count}")
+        return count
+
+    def _append_journal(self, records: List[dict]) -> None:
+        """
+        Добавление записей в журнал изменений одной записью на диск (вызывается под self._flush_lock)
+        
+        Args:
+            records: Записи об изменениях
+        """
+        self._journal.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._journal_records += len(records)
+
+        if self._journal_records >= self.compact_threshold and not self._compacting():
+            self._compact_thread = threading.Thread(target=self.compact, name='db-compact', daemon=True)
+            self._compact_thread.start()
+
+    def _compacting(self) -> bool:
+        """Проверка, выполняется ли сжатие журнала"""
+        return self._compact_thread is not None and self._compact_thread.is_alive()
+
+    def compact(self) -> None:
+        """
+        Сжатие журнала: текущее состояние записывается в новый снимок,
+        после чего записи журнала становятся не нужны
         """
+        if not self.journal:
+            return
+
+        compacting_file = f"{self.journal_file}.compacting"
         try:
-            with self.lock:
-                self.questions[question_id] = question_data
-                self.stats['total_questions'] += 1
-                category = question_data.get('category')
-                if category and category in self.stats['categories']:
-                    self.stats['categories'][category] = self.stats['categories'].get(category, 0) + 1
-            self.save()
-            logger.info(f"Вопрос {question_id} успешно добавлен")
+            with self._compact_lock:
+                with self._flush_lock:
+                    # Несохраненные изменения попадают в журнал до его ротации
+                    self._flush_pending()
+                    # Журнал защищен self._flush_lock, чтение данных в это время не блокируется
+                    if os.path.exists(compacting_file):
+                        # Сжатие было прервано при сбое, его записи уже загружены в память
+                        with open(compacting_file, 'a', encoding='utf-8') as dst, \
+                                open(self.journal_file, 'r', encoding='utf-8') as src:
+                            dst.write(src.read())
+                        os.remove(self.journal_file)
+                    else:
+                        os.replace(self.journal_file, compacting_file)
+                    self._journal.close()
+                    self._journal = open(self.journal_file, 'a', encoding='utf-8')
+                    self._journal_records = 0
+
+                    with self._write_lock():
+                        # Давно закрытые вопросы уходят в архив и не попадают в снимок
+                        segment, archived = self._select_cold()
+
+                        # Вопросы не изменяются на месте, поэтому для записи снимка
+                        # без блокировки достаточно копии словаря
+                        questions = dict(self.questions)
+                        stats = self._build_stats()
+                        sequence = self._next_seq
+                        rollups = self._rollups.rows()
+                        outbox = list(self._outbox) or None
+
+                # Сегмент архива записывается до снимка: при сбое между ними вопрос
+                # окажется и в снимке, и в архиве, и будет взят из снимка
+                with self._snapshot_lock:
+                    if archived:
+                        self._write_archived(segment, archived)
+                    self._write_snapshot(questions, stats, sequence, rollups, outbox)
+                os.remove(compacting_file)
+            logger.info(f"Журнал сжат в снимок {self._snapshot_target()}")
         except Exception as e:
-            logger.error(f"Ошибка при добавлении вопроса: {e}")
-            raise DatabaseException(f"Ошибка при добавлении вопроса: {e}")
+            logger.error(f"Ошибка при сжатии журнала: {e}")
+            raise DatabaseException(f"Ошибка при сжатии журнала: {e}")
 
-    def update_question(self, question_id: str, update_data: dict) -> None:
+    def _load_cold_index(self) -> None:
+        """Загрузка индекса холодного архива (вызывается под self.lock)"""
+        self._cold = {}
+        self._cold_by_status = {}
+        self._cold_by_user = {}
+        self._stale = {}
+        if not os.path.isdir(self.cold_dir):
+            return
+
+        segments = sorted(name for name in os.listdir(self.cold_dir) if name.endswith(COLD_SEGMENT_SUFFIX))
+        for segment in segments:
+            index_file = os.path.join(self.cold_dir, segment[:-len(COLD_SEGMENT_SUFFIX)] + COLD_INDEX_SUFFIX)
+            if os.path.exists(index_file):
+                with open(index_file, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+            else:
+                # Индекс не успел записаться при сбое - строим его по сегменту
+                entries = [[q.id, q.status, q.category, q.important, q.user_id]
+                           for q in self._read_segment(segment).values()]
+            # Более поздний сегмент содержит более новую копию вопроса
+            for question_id, status, category, important, user_id in entries:
+                previous = self._cold.get(question_id)
+                if previous is not None:
+                    self._stale.setdefault(question_id, []).append(previous[0])
+                self._cold_put(question_id, (segment, status, category, important, user_id))
+            self._segment_seq = max(self._segment_seq, int(segment.split('-')[1].split('.')[0]))
+
+        # Вопрос из снимка новее архивной копии
+        for question_id in self.questions:
+            entry = self._cold_pop(question_id)
+            if entry is not None:
+                self._stale.setdefault(question_id, []).append(entry[0])
+        for question_id in self._cold:
+            self._advance_sequence(question_id)
+        logger.info(f"Загружен индекс холодного архива: сегментов {len(segments)}, вопросов {len(self._cold)}")
+
+    def _select_cold(self) -> Tuple[str, Dict[str, Question]]:
         """
-        Обновление данных вопроса
+        Перенос давно закрытых вопросов из памяти в холодный архив (вызывается под self.lock)
+        
+        Вопросы остаются доступными из self._archiving, пока сегмент не будет записан.
+        
+        Returns:
+            Имя нового сегмента и перенесенные вопросы
+        """
+        if not self.archive_after_days:
+            return '', {}
+
+        cutoff = encode_time(datetime.now().isoformat()) - self.archive_after_days * 86400 * TIME_UNIT
+        archived = {}
+        for question_id, question in self.questions.items():
+            if question.status not in ARCHIVE_STATUSES or question.important:
+                continue
+            closed_time = question.answer_time if question.answer_time is not None else question.time
+            if isinstance(closed_time, int) and closed_time < cutoff:
+                archived[question_id] = question
+        if not archived:
+            return '', {}
+
+        self._segment_seq += 1
+        segment = f"cold-{self._segment_seq:06d}{COLD_SEGMENT_SUFFIX}"
+        for question_id, question in archived.items():
+            del self.questions[question_id]
+            self._index_remove(question)
+            self._cold_put(question_id, (segment, question.status, question.category,
+                                         question.important, question.user_id))
+        self._archiving.update(archived)
+        return segment, archived
+
+    def _write_archived(self, segment: str, archived: Dict[str, Question]) -> None:
+        """
+        Запись сегмента архива; при ошибке вопросы возвращаются в память
         
         Args:
-            question_id: Уникальный идентификатор вопроса
-            update_data: Данные для обновления
+            segment: Имя сегмента
+            archived: Перенесенные вопросы
         """
-        try:
+        with self._cold_lock:
             with self.lock:
-                if question_id in self.questions:
-                    # Проверяем, меняется ли статус на 'answered'
-                    was_answered = self.questions[question_id].get('status') == 'answered'
-                    will_be_answered = update_data.get('status') == 'answered'
-                    
-                    # Обновляем данные вопроса
-                    self.questions[question_id].update(update_data)
-                    
-                    # Если вопрос стал отвеченным, увеличиваем счетчик
-                    if not was_answered and will_be_answered:
-                        self.stats['answered_questions'] += 1
-                    
-                    self.save()
-                    logger.info(f"Вопрос {question_id} успешно обновлен")
-                else:
-                    logger.warning(f"Попытка обновить несуществующий вопрос: {question_id}")
-        except Exception as e:
-            logger.error(f"Ошибка при обновлении вопроса: {e}")
-            raise DatabaseException(f"Ошибка при обновлении вопроса: {e}")
+                # Вопросы, вернувшиеся в память до записи, в сегмент не попадают
+                written = {question_id: question for question_id, question in archived.items()
+                           if question_id in self._archiving}
+            try:
+                self._write_segment(segment, written)
+            except Exception:
+                with self._write_lock():
+                    for question_id, question in archived.items():
+                        # Вопрос, измененный во время записи, уже вернулся в память
+                        if self._archiving.pop(question_id, None) is not None:
+                            self._cold_pop(question_id)
+                            self.questions[question_id] = question
+                            self._index_add(question)
+                raise
+
+        with self._write_lock():
+            for question_id in archived:
+                self._archiving.pop(question_id, None)
+        logger.info(f"В холодный архив {segment} перенесено вопросов: {len(archived)}")
 
-    def get_question(self, question_id: str) -> dict:
+    def _write_segment(self, segment: str, questions: Dict[str, Question]) -> None:
         """
-        Получение данных вопроса
+        Атомарная запись сжатого сегмента архива и его индекса
         
         Args:
-            question_id: Уникальный идентификатор вопроса
-            
-        Returns:
-            Данные вопроса или пустой словарь, если вопрос не найден
+            segment: Имя сегмента
+            questions: Вопросы для записи
         """
-        with self.lock:
-            return self.questions.get(question_id, {})
+        os.makedirs(self.cold_dir, exist_ok=True)
+        segment_file = os.path.join(self.cold_dir, segment)
+        index_file = segment_file[:-len(COLD_SEGMENT_SUFFIX)] + COLD_INDEX_SUFFIX
 
-    def get_questions_by_status(self, status: str) -> List[dict]:
+        with open(f"{segment_file}.tmp", 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                for question in questions.values():
+                    f.write((json.dumps(question.to_dict(), ensure_ascii=False) + '\n').encode('utf-8'))
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(f"{segment_file}.tmp", segment_file)
+
+        with open(f"{index_file}.tmp", 'w', encoding='utf-8') as f:
+            json.dump([[q.id, q.status, q.category, q.important, q.user_id] for q in questions.values()],
+                      f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{index_file}.tmp", index_file)
+
+    def _read_segment(self, segment: str, question_ids: Optional[set] = None) -> Dict[str, Question]:
         """
-        Получение списка вопросов по статусу
+        Чтение вопросов из сегмента архива
         
         Args:
-            status: Статус вопросов ('pending', 'answered', 'rejected')
+            segment: Имя сегмента
+            question_ids: ID нужных вопросов (None - все вопросы сегмента)
             
         Returns:
-            Список вопросов с указанным статусом
+            Вопросы в порядке записи в сегмент
         """
-        with self.lock:
-            return [q for q in self.questions.values() if q.get('status') == status]
+        questions = {}
+        with gzip.open(os.path.join(self.cold_dir, segment), 'rt', encoding='utf-8') as f:
+            for line in f:
+                data = json.loads(line)
+                if question_ids is None or data['id'] in question_ids:
+                    questions[data['id']] = Question.from_dict(data)
+        return questions
 
-    def get_questions_by_user(self, user_id: int) -> List[dict]:
+    def _read_cold(self, question_ids: List[str]) -> List[Question]:
         """
-        Получение списка вопросов пользователя
+        Чтение вопросов из холодного архива, каждый сегмент читается один раз
         
         Args:
-            user_id: ID пользователя
+            question_ids: ID вопросов из индекса архива
             
         Returns:
-            Список вопросов пользователя
+            Найденные вопросы в порядке сегментов
         """
-        with self.lock:
-            return [q for q in self.questions.values() if q.get('user_id') == user_id]
+        def read() -> Tuple[Dict[str, set], Dict[str, Question]]:
+            by_segment: Dict[str, set] = {}
+            found = {}
+            for question_id in question_ids:
+                if question_id in self._archiving:
+                    found[question_id] = self._archiving[question_id]
+                elif question_id in self._cold:
+                    by_segment.setdefault(self._cold[question_id][0], set()).add(question_id)
+            return by_segment, found
+
+        by_segment, found = self._read_view(read)
+
+        # Сегменты не изменяются после записи, поэтому читаются без блокировки
+        result = []
+        for segment in sorted(by_segment):
+            result.extend(self._read_segment(segment, by_segment[segment]).values())
+        result.extend(found.values())
+        return result
 
-    def get_important_questions(self) -> List[dict]:
+    def _iter_all_questions(self) -> Iterator[Question]:
+        """Все вопросы: из памяти и холодного архива (вызывается под self.lock при загрузке)"""
+        yield from self.questions.values()
+        yield from self._archiving.values()
+        by_segment: Dict[str, set] = {}
+        for question_id, entry in self._cold.items():
+            if question_id not in self._archiving:
+                by_segment.setdefault(entry[0], set()).add(question_id)
+        for segment in sorted(by_segment):
+            yield from self._read_segment(segment, by_segment[segment]).values()
+
+    def _cold_put(self, question_id: str, entry: Tuple[str, str, str, bool, int]) -> None:
         """
-        Получение списка важных вопросов
+        Запись вопроса в индекс холодного архива и его индексы по статусу и пользователю
+        (вызывается под self.lock)
         
-        Returns:
-            Список важных вопросов
+        Args:
+            question_id: ID вопроса
+            entry: (сегмент, статус, категория, важность, пользователь)
         """
-        with self.lock:
-            return [q for q in self.questions.values() if q.get('important', False)]
+        self._cold_pop(question_id)
+        self._cold[question_id] = entry
+        self._cold_by_status.setdefault(entry[1], {})[question_id] = None
+        self._cold_by_user.setdefault(entry[4], {})[question_id] = None
 
-    def get_stats(self) -> dict:
+    def _cold_pop(self, question_id: str) -> Optional[Tuple[str, str, str, bool, int]]:
         """
-        Получение статистики
+        Удаление вопроса из индекса холодного архива и его индексов (вызывается под self.lock)
         
+        Args:
+            question_id: ID вопроса
+            
         Returns:
-            Статистика использования бота
+            Удаленная запись индекса или None, если вопроса нет в архиве
         """
-        with self.lock:
-            return self.stats.copy()
+        entry = self._cold.pop(question_id, None)
+        if entry is None:
+            return None
+        for index, key in ((self._cold_by_status, entry[1]), (self._cold_by_user, entry[4])):
+            ids = index.get(key)
+            if ids is not None:
+                ids.pop(question_id, None)
+                if not ids:
+                    del index[key]
+        return entry
 
-    def backup(self, backup_dir: str = 'backups') -> str:
+    def _thaw(self, question_id: str, question: Optional[Question] = None) -> Optional[Question]:
         """
-        Создание резервной копии базы данных
+        Возврат вопроса из холодного архива в память для изменения (вызывается под self.lock)
         
         Args:
-            backup_dir: Директория для резервных копий
+            question_id: ID вопроса
+            question: Актуальная копия вопроса, прочитанная из архива до блокировки
+                (None - сегмент читается под блокировкой)
             
         Returns:
-            Путь к файлу резервной копии
+            Вопрос или None, если его нет в архиве
         """
-        try:
-            # Создаем директорию для резервных копий, если она не существует
-            if not os.path.exists(backup_dir):
-                os.makedirs(backup_dir)
-            
+        entry = self._cold_pop(question_id)
+        if entry is None:
+            return None
+        # Копия в сегменте (записанном или записываемом) становится устаревшей
+        self._stale.setdefault(question_id, []).append(entry[0])
+        question = self._archiving.pop(question_id, None) or question
+        if question is None:
+            question = self._read_segment(entry[0], {question_id}).get(question_id)
+            if question is None:
+                return None
+        self.questions[question_id] = question
+        self._index_add(question)
+        return question
+
+    def _rewrite_segment(self, segment: str, changes: Dict[str, Optional[Question]]) -> None:
+        """
+        Перезапись сегмента архива с измененными вопросами и без удаленных
+        (вызывается под self._cold_lock и блокировками изменяемых вопросов)
+
+        Индекс сегмента удаляется до замены сегмента: при сбое он строится по сегменту заново.
+        Счетчики и агрегаты изменяются только для вопросов, актуальная копия которых в этом сегменте.
+
+        Args:
+            segment: Имя сегмента
+            changes: Новые версии вопросов по ID (None - удалить вопрос)
+        """
+        segment_file = os.path.join(self.cold_dir, segment)
+        if not os.path.exists(segment_file):
+            return
+        questions = self._read_segment(segment)
+        kept = {}
+        for question_id, question in questions.items():
+            question = changes.get(question_id, question)
+            if question is not None:
+                kept[question_id] = question
+        index_file = segment_file[:-len(COLD_SEGMENT_SUFFIX)] + COLD_INDEX_SUFFIX
+        if os.path.exists(index_file):
+            os.remove(index_file)
+        if kept:
+            self._write_segment(segment, kept)
+        else:
+            os.remove(segment_file)
+
+        with self._write_lock():
+            counts = dict(self._counts)
+            for question_id, question in changes.items():
+                old_question = questions.get(question_id)
+                if old_question is None:
+                    continue
+                entry = self._cold.get(question_id)
+                if entry is None or entry[0] != segment:
+                    # Удалена устаревшая копия
+                    segments = self._stale.get(question_id, [])
+                    if segment in segments:
+                        segments.remove(segment)
+                    if not segments:
+                        self._stale.pop(question_id, None)
+                    continue
+                if question is None:
+                    self._cold_pop(question_id)
+                    self._search_index_update(question_id, None)
+                else:
+                    self._cold_put(question_id, (segment, question.status, question.category,
+                                                 question.important, question.user_id))
+                    counts[self._cell(question)] = counts.get(self._cell(question), 0) + 1
+                counts[self._cell(old_question)] -= 1
+                self._rollups.apply(old_question, question)
+                self._changed[question_id] = None
+            self._set_counts(counts)
+        logger.info(f"Сегмент архива {segment} перезаписан, изменено вопросов: {len(changes)}")
+
+    def close(self) -> None:
+        """Закрытие базы данных с сохранением всех изменений"""
+        if self._search_index_thread is not None:
+            self._search_index_thread.join()
+            self._search_index_thread = None
+        if self._flush_thread is not None:
+            self._flush_stop.set()
+            self._flush_event.set()
+            self._flush_thread.join()
+            self._flush_thread = None
+        self.flush()
+
+        if self._journal is not None:
+            if self._compact_thread is not None:
+                self._compact_thread.join()
+            self.compact()
+            with self._flush_lock:
+                self._journal.close()
+                self._journal = None
+
+        if self._conn is not None:
+            with self._flush_lock:
+                # Переносим WAL в основной файл, чтобы он был самодостаточным
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._conn.close()
+                self._conn = None
+            with self._read_conn_lock:
+                self._read_conn.close()
+                self._read_conn = None
+            logger.info(f"Соединение с SQLite базой данных {self.sqlite_file} закрыто")
+
+    def init_sqlite(self) -> None:
+        """Инициализация SQLite базы данных"""
+        try:
+            with self.lock:
+                self._conn = self._open_sqlite(self.sqlite_file)
+                conn = self._conn
+                
+                # Таблицы и индексы создаются и обновляются миграциями схемы
+                self._migrate_schema(conn)
+                self.fts = self._has_fts(conn)
+                self._read_conn = self._open_sqlite(self.sqlite_file)
+                
+            # Загружаем данные из SQLite в память
+            self._load_from_sqlite()
+                
+            logger.info(f"SQLite база данных инициализирована в {self.sqlite_file}")
+        except Exception as e:
+            logger.error(f"Ошибка при инициализации SQLite базы данных: {e}")
+            raise DatabaseException(f"Ошибка при инициализации SQLite базы данных: {e}")
+
+    def _load_from_sqlite(self) -> None:
+        """Загрузка данных из SQLite в память"""
+        try:
+            with self._write_lock():
+                cursor = self._conn.cursor()
+                cursor.row_factory = sqlite3.Row
+                
+                # Загружаем вопросы (в ленивом режиме - только горячие)
+                if self.lazy:
+                    cursor.execute("SELECT * FROM questions WHERE status = 'pending' OR important = 1 ORDER BY rowid")
+                else:
+                    cursor.execute("SELECT * FROM questions")
+                self.questions = {}
+                for row in cursor.fetchall():
+                    question = self._question_from_row(row)
+                    self.questions[question['id']] = question
+                self._lru.clear()
+                self._rebuild_indexes()
+                
+                # Загружаем счетчики статистики
+                cursor.execute("SELECT key, value FROM stats WHERE key LIKE ?", (f"{COUNT_KEY_PREFIX}:%",))
+                counts = {}
+                for row in cursor.fetchall():
+                    cell = self._parse_count_key(row['key'])
+                    if cell is not None and row['value']:
+                        counts[cell] = row['value']
+                self._set_counts(counts)
+                has_counts = bool(counts)
+                
+                # Загружаем агрегаты активности; устаревшие почасовые удаляются и из файла
+                self._rollups.load(cursor.execute(
+                    "SELECT period, bucket, category, metric, value FROM rollups").fetchall())
+                cursor.execute("DELETE FROM rollups WHERE period = 'hour' AND bucket < ?",
+                               (self._rollups._hourly_cutoff(),))
+                self._conn.commit()
+                
+                # Загружаем последовательность ID
+                cursor.execute("SELECT value FROM stats WHERE key = ?", (SEQUENCE_KEY,))
+                row = cursor.fetchone()
+                self._next_seq = row['value'] if row else 1
+                if row is None and self.lazy:
+                    # База прежней версии: последовательность восстанавливается по всем ID
+                    cursor.execute("SELECT id FROM questions")
+                    for row in cursor.fetchall():
+                        self._advance_sequence(row['id'])
+                for question_id in self.questions:
+                    self._advance_sequence(question_id)
+
+            # База без счетчиков (создана прежней версией бота) - считаем их заново
+            if not has_counts:
+                self.reconcile_stats()
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке данных из SQLite: {e}")
+            raise DatabaseException(f"Ошибка при загрузке данных из SQLite: {e}")
+
+    def _save_to_sqlite(self) -> None:
+        """Сохранение данных из памяти в SQLite"""
+        try:
+            with self._flush_lock:
+                with self.lock:
+                    # Полная запись состояния включает все несохраненные изменения
+                    batch, self._pending = self._pending, []
+                    questions = list(self.questions.values())
+                    counts = self._counts
+                    sequence = self._next_seq
+                    rollups = self._rollups.rows()
+                conn = self._conn
+                try:
+                    with conn:
+                        cursor = conn.cursor()
+                        
+                        # Изменения из очереди, в том числе удаления: удаленных вопросов уже нет в памяти
+                        self._write_batch_rows(cursor, batch)
+                        
+                        # Сохраняем вопросы
+                        cursor.executemany(f'''
+                        INSERT OR REPLACE INTO questions ({', '.join(QUESTION_COLUMNS)})
+                        VALUES ({', '.join('?' * len(QUESTION_COLUMNS))})
+                        ''', [self._question_to_row(q) for q in questions])
+                        
+                        # Сохраняем счетчики статистики и последовательность ID
+                        self._write_sqlite_counts(cursor, counts)
+                        cursor.execute("INSERT OR REPLACE INTO stats (key, value) VALUES (?, ?)",
+                                      (SEQUENCE_KEY, sequence))
+                        
+                        # Агрегаты активности записываются целиком
+                        cursor.execute("DELETE FROM rollups")
+                        cursor.executemany("INSERT INTO rollups (period, bucket, category, metric, value) VALUES (?, ?, ?, ?, ?)",
+                                           rollups)
+                        self._write_outbox(cursor, batch)
+                except Exception:
+                    # Транзакция откачена, изменения сохранятся следующим сохранением
+                    with self.lock:
+                        self._pending[:0] = batch
+                    raise
+                with self.lock:
+                    self._mark_saved(batch)
+                self._publish_changes(batch)
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении данных в SQLite: {e}")
+            raise DatabaseException(f"Ошибка при сохранении данных в SQLite: {e}")
+
+    def save(self) -> None:
+        """Сохранение базы данных"""
+        if self.db_type == 'json':
+            self.save_json()
+        elif self.db_type == 'sqlite':
+            self._save_to_sqlite()
+
+    def _apply_record(self, record: dict) -> Tuple[Dict[Tuple[str, str, bool], int], Dict[RollupKey, int]]:
+        """
+        Применение записи об изменении к данным в памяти (вызывается под self.lock)
+        
+        Args:
+            record: Запись об изменении ('op', 'id', 'data')
+            
+        Returns:
+            Изменения счетчиков в виде {(статус, категория, важность): приращение}
+            и изменения агрегатов активности
+        """
+        question_id = record['id']
+        data = record['data']
+        old_question = self.questions.get(question_id)
+        if old_question is None and question_id in self._cold:
+            old_question = self._thaw(question_id)
+
+        if record['op'] == JOURNAL_OP_ADD:
+            # Повторное воспроизведение записи заменяет вопрос, не удваивая счетчики
+            if old_question is not None:
+                self._index_remove(old_question)
+            question = Question.from_dict({**data, 'id': question_id})
+            self.questions[question_id] = question
+            self._index_add(question)
+            self._advance_sequence(question_id)
+        elif record['op'] == JOURNAL_OP_UPDATE:
+            if old_question is None:
+                return {}, {}
+            # Вопрос неизменяем: изменение создает новую запись, старую могут читать снимки
+            question = old_question.replace(data)
+            self.questions[question_id] = question
+            self._index_update(old_question, question)
+        elif record['op'] == JOURNAL_OP_DELETE:
+            # Повторное воспроизведение удаления уже удаленного вопроса ничего не меняет
+            if old_question is None:
+                return {}, {}
+            question = None
+            del self.questions[question_id]
+            self._index_remove(old_question)
+        else:
+            return {}, {}
+
+        if question is None or record['op'] == JOURNAL_OP_ADD or 'text' in data or 'answer' in data:
+            self._search_index_update(question_id, question)
+        rollup_deltas = self._rollups.apply(old_question, question)
+
+        # Переносим вопрос между ячейками счетчиков
+        deltas = {}
+        new_cell = self._cell(question) if question is not None else None
+        if old_question is not None:
+            old_cell = self._cell(old_question)
+            if old_cell == new_cell:
+                return deltas, rollup_deltas
+            deltas[old_cell] = -1
+        if new_cell is not None:
+            deltas[new_cell] = 1
+        # Новый словарь счетчиков подменяет старый одной операцией
+        counts = dict(self._counts)
+        for cell, delta in deltas.items():
+            counts[cell] = counts.get(cell, 0) + delta
+        self._set_counts(counts)
+        return deltas, rollup_deltas
+
+    def _set_counts(self, counts: Dict[Tuple[str, str, bool], int]) -> None:
+        """
+        Замена счетчиков и публикация нового снимка статистики (вызывается под self.lock)
+        
+        Args:
+            counts: Новый словарь счетчиков; после вызова не изменяется
+        """
+        self._counts = counts
+        self._stats_snapshot = StatsSnapshot(self._stats_snapshot.version + 1, MappingProxyType(counts),
+                                             freeze_stats(self._stats_from_counts(counts)))
+
+    @staticmethod
+    def _cell(question: Question) -> Tuple[str, str, bool]:
+        """
+        Ячейка счетчиков, к которой относится вопрос
+        
+        Args:
+            question: Данные вопроса
+            
+        Returns:
+            Кортеж (статус, категория, важность)
+        """
+        return (question.status, question.category, question.important)
+
+    @staticmethod
+    def _count_key(cell: Tuple[str, str, bool]) -> str:
+        """Ключ ячейки счетчиков в таблице stats"""
+        status, category, important = cell
+        return f"{COUNT_KEY_PREFIX}:{status}:{category}:{int(important)}"
+
+    @staticmethod
+    def _parse_count_key(key: str) -> Optional[Tuple[str, str, bool]]:
+        """Разбор ключа ячейки счетчиков из таблицы stats"""
+        parts = key.split(':')
+        if len(parts) != 4 or parts[0] != COUNT_KEY_PREFIX:
+            return None
+        return (parts[1], parts[2], parts[3] == '1')
+
+    def _index_add(self, question: Question) -> None:
+        """
+        Добавление вопроса во вторичные индексы (вызывается под self.lock)
+        
+        Args:
+            question: Данные вопроса
+        """
+        question_id = question.id
+        self._by_status.setdefault(question.status, {})[question_id] = None
+        self._by_user.setdefault(question.user_id, {})[question_id] = None
+        if question.important:
+            self._important[question_id] = None
+        if question.status == 'pending':
+            self._text_index_add(question)
+
+    def _index_remove(self, question: Question) -> None:
+        """
+        Удаление вопроса из вторичных индексов (вызывается под self.lock)
+        
+        Args:
+            question: Данные вопроса
+        """
+        question_id = question.id
+        self._by_status.get(question.status, {}).pop(question_id, None)
+        self._by_user.get(question.user_id, {}).pop(question_id, None)
+        self._important.pop(question_id, None)
+        if question.status == 'pending':
+            self._text_index_remove(question)
+
+    def _index_update(self, old_question: Question, question: Question) -> None:
+        """
+        Перенос вопроса между записями индексов, ключи которых изменились (вызывается под self.lock)
+        
+        Args:
+            old_question: Данные вопроса до изменения
+            question: Данные вопроса после изменения
+        """
+        question_id = question.id
+        if old_question.status != question.status:
+            self._by_status.get(old_question.status, {}).pop(question_id, None)
+            self._by_status.setdefault(question.status, {})[question_id] = None
+        if old_question.user_id != question.user_id:
+            self._by_user.get(old_question.user_id, {}).pop(question_id, None)
+            self._by_user.setdefault(question.user_id, {})[question_id] = None
+        if question.important:
+            self._important[question_id] = None
+        else:
+            self._important.pop(question_id, None)
+        if 'pending' in (old_question.status, question.status) and (
+                old_question.status != question.status or old_question.user_id != question.user_id
+                or old_question.category != question.category or old_question.text != question.text):
+            if old_question.status == 'pending':
+                self._text_index_remove(old_question)
+            if question.status == 'pending':
+                self._text_index_add(question)
+
+    @staticmethod
+    def _text_key(user_id: int, category: str, text: Optional[str]) -> Optional[Tuple[int, str, int]]:
+        """
+        Ключ индекса повторных отправок
+
+        Args:
+            user_id: ID пользователя
+            category: Категория вопроса
+            text: Текст вопроса
+
+        Returns:
+            (пользователь, категория, хеш текста) или None, если в тексте нет слов
+            (такие вопросы не сравниваются)
+        """
+        text = canonical_text(text)
+        return (user_id, category, hash(text)) if text else None
+
+    def _text_index_add(self, question: Question) -> None:
+        """Добавление ожидающего вопроса в индекс повторных отправок (вызывается под self.lock)"""
+        key = self._text_key(question.user_id, question.category, question.text)
+        if key is not None:
+            self._by_text[key] = question.id
+
+    def _text_index_remove(self, question: Question) -> None:
+        """Удаление вопроса из индекса повторных отправок (вызывается под self.lock)"""
+        key = self._text_key(question.user_id, question.category, question.text)
+        if key is not None and self._by_text.get(key) == question.id:
+            del self._by_text[key]
+
+    def _rebuild_indexes(self) -> None:
+        """Построение вторичных индексов по всем вопросам (вызывается под self.lock)"""
+        self._by_status = {}
+        self._by_user = {}
+        self._important = {}
+        self._by_text = {}
+        for question in self.questions.values():
+            self._index_add(question)
+
+    def _write_sqlite_batch(self, batch: List[tuple], sequence: int) -> None:
+        """
+        Запись группы изменений в SQLite в одной транзакции (вызывается под self._flush_lock)
+        
+        Args:
+            batch: Изменения из очереди (см. self._pending)
+            sequence: Следующий номер для ID вопроса
+        """
+        conn = self._conn
+        with conn:
+            cursor = conn.cursor()
+            totals, rollup_totals = self._write_batch_rows(cursor, batch)
+
+            cursor.execute('''
+            INSERT INTO stats (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)
+            ''', (SEQUENCE_KEY, sequence))
+            cursor.executemany('''
+            INSERT INTO stats (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = value + excluded.value
+            ''', [(self._count_key(cell), delta) for cell, delta in totals.items() if delta])
+            cursor.executemany('''
+            INSERT INTO rollups (period, bucket, category, metric, value) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(period, bucket, category, metric) DO UPDATE SET value = value + excluded.value
+            ''', [(*key, delta) for key, delta in rollup_totals.items() if delta])
+            self._write_outbox(cursor, batch)
+
+    @staticmethod
+    def _write_batch_rows(cursor: sqlite3.Cursor,
+                          batch: List[tuple]) -> Tuple[Dict[Tuple[str, str, bool], int], Dict[RollupKey, int]]:
+        """
+        Запись изменений вопросов из очереди в таблицу questions открытой транзакции
+        
+        Args:
+            cursor: Курсор открытой транзакции
+            batch: Изменения из очереди (см. self._pending)
+            
+        Returns:
+            Суммарные изменения счетчиков и агрегатов активности группы
+        """
+        totals = {}
+        rollup_totals = {}
+        for record, deltas, row, _, rollup_deltas in batch:
+            if record['op'] == JOURNAL_OP_ADD:
+                cursor.execute(f'''
+                INSERT OR REPLACE INTO questions ({', '.join(QUESTION_COLUMNS)})
+                VALUES ({', '.join('?' * len(QUESTION_COLUMNS))})
+                ''', row)
+            elif record['op'] == JOURNAL_OP_DELETE:
+                cursor.execute("DELETE FROM questions WHERE id = ?", (record['id'],))
+            else:
+                # Обновляем только изменившиеся колонки
+                data = record['data']
+                columns = [col for col in QUESTION_COLUMNS if col in data and col != 'id']
+                if columns:
+                    values = [int(bool(data[col])) if col == 'important' else data[col] for col in columns]
+                    cursor.execute(
+                        f"UPDATE questions SET {', '.join(f'{col} = ?' for col in columns)} WHERE id = ?",
+                        (*values, record['id'])
+                    )
+            for cell, delta in deltas.items():
+                totals[cell] = totals.get(cell, 0) + delta
+            for key, delta in rollup_deltas.items():
+                rollup_totals[key] = rollup_totals.get(key, 0) + delta
+        return totals, rollup_totals
+
+    def _write_outbox(self, cursor: sqlite3.Cursor, batch: List[tuple]) -> None:
+        """
+        Запись событий ленты в транзакцию изменений SQLite (вызывается под self._flush_lock)
+        
+        События, которые уже есть в ленте, удаляются из таблицы.
+        
+        Args:
+            cursor: Курсор открытой транзакции
+            batch: Сохраняемые изменения из очереди (см. self._pending)
+        """
+        if self.change_feed is None:
+            return
+        cursor.execute("DELETE FROM feed_outbox WHERE seq <= ?", (self.change_feed.published(self.feed_source),))
+        cursor.executemany("INSERT OR REPLACE INTO feed_outbox (seq, event) VALUES (?, ?)",
+                           [(change['source_seq'], json.dumps(change, ensure_ascii=False))
+                            for _, _, _, change, _ in batch if change is not None])
+
+    @staticmethod
+    def _question_from_row(row: sqlite3.Row) -> Question:
+        """
+        Преобразование строки таблицы questions в вопрос
+        
+        Args:
+            row: Строка таблицы
+            
+        Returns:
+            Вопрос
+        """
+        # important из 0/1 преобразуется в False/True в Question
+        return Question.from_dict(dict(row))
+
+    @staticmethod
+    def _question_to_row(question: dict) -> tuple:
+        """
+        Преобразование вопроса в строку таблицы questions
+        
+        Args:
+            question: Данные вопроса
+            
+        Returns:
+            Значения колонок в порядке QUESTION_COLUMNS
+        """
+        return (
+            question['id'],
+            question['category'],
+            question['text'],
+            question['status'],
+            question['time'],
+            # Преобразуем important из True/False в 1/0
+            1 if question.get('important', False) else 0,
+            question['user_id'],
+            question.get('answer'),
+            question.get('answer_time'),
+            question.get('answer_message_id')
+        )
+
+    def _commit(self, record: dict, question: Optional[Question] = None) -> None:
+        """
+        Применение изменения в памяти и постановка его в очередь на сохранение
+        
+        Без окна группового сохранения изменение сохраняется сразу.
+        
+        Args:
+            record: Запись об изменении
+            question: Прочитанный до блокировки вопрос, к которому относится изменение
+                (из SQLite в ленивом режиме или из холодного архива)
+        """
+        self._schedule_flush(self._enqueue(record, question))
+
+    def _enqueue(self, record: dict, question: Optional[Question] = None) -> bool:
+        """
+        Применение изменения в памяти и постановка его в очередь без сохранения
+        
+        Args:
+            record: Запись об изменении
+            question: Прочитанный до блокировки вопрос, к которому относится изменение
+                (из SQLite в ленивом режиме или из холодного архива)
+            
+        Returns:
+            True, если очередь заполнена и ее пора сохранить
+        """
+        with self._write_lock():
+            if question is not None and record['id'] not in self.questions:
+                if record['id'] in self._cold:
+                    # Вопрос прочитан из архива до блокировки: сегмент не распаковывается под ней
+                    self._thaw(record['id'], question)
+                elif self.lazy:
+                    # Вопрос успели вытеснить из памяти после чтения
+                    self._cache_question(question)
+            if self.change_feed is not None:
+                previous = self.questions.get(record['id']) or self._archiving.get(record['id'])
+                entry = self._cold.get(record['id'])
+                previous_status = previous.status if previous is not None else entry[1] if entry else None
+            deltas, rollup_deltas = self._apply_record(record)
+            self._changed[record['id']] = None
+            self._unsaved[record['id']] = self._unsaved.get(record['id'], 0) + 1
+            if self.lazy:
+                self._retier(record['id'])
+            row = None
+            if self.db_type == 'sqlite' and record['op'] == JOURNAL_OP_ADD:
+                # Строка фиксируется сейчас, при сохранении вопрос может уже измениться
+                row = self._question_to_row(self.questions[record['id']])
+            change = None
+            if self.change_feed is not None:
+                current = self.questions.get(record['id'])
+                if record['op'] == JOURNAL_OP_DELETE and previous_status is not None:
+                    change = {'type': change_type(record['op'], None, previous_status),
+                              'id': record['id'], 'data': {}, 'question': None}
+                elif current is not None:
+                    change = {
+                        'type': change_type(record['op'], current.status, previous_status),
+                        'id': record['id'],
+                        # ID пользователя не попадает в ленту, которая хранится без срока
+                        'data': public_fields(record['data']),
+                        'question': public_fields(current.to_dict())
+                    }
+                if change is not None:
+                    # Номер события базы: по нему после сбоя находятся события, не попавшие в ленту
+                    self._feed_seq += 1
+                    change.update(source=self.feed_source, source_seq=self._feed_seq)
+                    self._outbox.append(change)
+            self._pending.append((record, deltas, row, change, rollup_deltas))
+            return len(self._pending) >= self.flush_max_batch
+
+    def _schedule_flush(self, batch_full: bool) -> None:
+        """
+        Сохранение очереди после изменения: сразу или фоновым потоком
+        
+        Args:
+            batch_full: Очередь заполнена
+        """
+        if self._flush_thread is None:
+            self.flush()
+        elif batch_full:
+            self._flush_event.set()
+
+    def flush(self) -> None:
+        """Сохранение всех изменений, примененных в памяти"""
+        try:
+            with self._flush_lock:
+                self._flush_pending()
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении изменений: {e}")
+            raise DatabaseException(f"Ошибка при сохранении изменений: {e}")
+
+    def _flush_pending(self) -> None:
+        """
+        Сохранение накопленных изменений одной записью (вызывается под self._flush_lock)
+        
+        При ошибке изменения возвращаются в очередь и будут сохранены следующим сохранением.
+        """
+        with self.lock:
+            batch, self._pending = self._pending, []
+            sequence = self._next_seq
+        if not batch:
+            return
+
+        try:
+            if self.journal:
+                # Событие ленты записывается в журнал вместе с изменением
+                self._append_journal([record if change is None else {**record, 'event': change}
+                                      for record, _, _, change, _ in batch])
+            elif self.db_type == 'sqlite':
+                self._write_sqlite_batch(batch, sequence)
+            else:
+                self.save()
+        except Exception:
+            with self.lock:
+                self._pending[:0] = batch
+            raise
+
+        with self.lock:
+            self._mark_saved(batch)
+        if len(batch) > 1:
+            logger.info(f"Сохранено изменений одной записью: {len(batch)}")
+        self._publish_changes(batch)
+
+    def _mark_saved(self, batch: List[tuple]) -> None:
+        """
+        Снятие отметок о несохраненных изменениях после записи (вызывается под self.lock)
+        
+        Args:
+            batch: Сохраненные изменения из очереди
+        """
+        for record, *_ in batch:
+            left = self._unsaved[record['id']] - 1
+            if left:
+                self._unsaved[record['id']] = left
+            else:
+                del self._unsaved[record['id']]
+
+    def _publish_changes(self, batch: List[tuple]) -> None:
+        """
+        Запись сохраненных изменений в ленту (вызывается под self._flush_lock)
+        
+        Вместе с событиями группы записываются сохраненные ранее события, запись которых
+        не удалась: они остаются в self._outbox, пока не попадут в ленту.
+        
+        Args:
+            batch: Сохраненные изменения из очереди
+        """
+        if self.change_feed is None:
+            return
+        published = self.change_feed.published(self.feed_source)
+        with self.lock:
+            for _, _, _, change, _ in batch:
+                if change is not None:
+                    self._feed_saved = max(self._feed_saved, change['source_seq'])
+            # События изменений, которые еще в очереди, не записываются
+            changes = [change for change in self._outbox if published < change['source_seq'] <= self._feed_saved]
+        try:
+            self.change_feed.append(changes)
+        except Exception as e:
+            logger.error(f"Ошибка при записи в ленту изменений, событий отложено: {len(changes)}: {e}")
+            raise
+        published = self.change_feed.published(self.feed_source)
+        with self.lock:
+            written = 0
+            while written < len(self._outbox) and self._outbox[written]['source_seq'] <= published:
+                written += 1
+            del self._outbox[:written]
+
+    def _recover_feed(self) -> None:
+        """
+        Запись в ленту событий, сохраненных вместе с изменениями до сбоя, но не попавших в ленту
+        
+        Лента знает последний записанный номер события базы (ChangeFeed.published),
+        база хранит события после него; уже записанные события не повторяются.
+        """
+        published = self.change_feed.published(self.feed_source)
+        if self.db_type == 'sqlite':
+            events = [json.loads(row[0]) for row in
+                      self._conn.execute("SELECT event FROM feed_outbox ORDER BY seq").fetchall()]
+        else:
+            events = self._outbox
+        # Событие может быть и в снимке, и в журнале
+        unique = {event['source_seq']: event for event in events}
+        self._outbox = [unique[seq] for seq in sorted(unique) if seq > published]
+        self._feed_seq = self._feed_saved = max([published, *unique])
+        if not self._outbox:
+            return
+        logger.warning(f"В ленту изменений дописываются события, сохраненные до сбоя: {len(self._outbox)}")
+        try:
+            with self._flush_lock:
+                self._publish_changes([])
+        except Exception:
+            # События остаются в self._outbox и будут записаны следующим сохранением
+            pass
+
+    def _flush_loop(self) -> None:
+        """Фоновое сохранение изменений раз в окно или при заполнении очереди"""
+        while not self._flush_stop.is_set():
+            self._flush_event.wait(self.flush_interval_ms / 1000)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except DatabaseException:
+                # Изменения остались в очереди, повторим в следующем окне
+                pass
+
+    def next_question_id(self) -> str:
+        """
+        Выдача нового уникального ID вопроса
+        
+        ID монотонно растут и не повторяются после удаления вопросов и перезапуска,
+        короткая base36-запись держит callback_data в пределах лимита Telegram.
+        
+        Returns:
+            ID вида 'q' + base36-номер
+        """
+        with self.lock:
+            question_id = f"{QUESTION_ID_PREFIX}{encode_base36(self._next_seq)}"
+            while question_id in self.questions or question_id in self._cold:
+                self._next_seq += 1
+                question_id = f"{QUESTION_ID_PREFIX}{encode_base36(self._next_seq)}"
+            self._next_seq += 1
+        return question_id
+
+    def shard_index(self, question_id: str, question_data: Optional[dict] = None) -> int:
+        """
+        Номер части хранилища, в которой хранится вопрос
+        
+        Изменения одной части выполняются по порядку, разных частей - параллельно.
+        
+        Args:
+            question_id: ID вопроса
+            question_data: Данные добавляемого вопроса
+            
+        Returns:
+            Номер части (у базы без разделения всегда 0)
+        """
+        return 0
+
+    def has_question(self, question_id: str) -> bool:
+        """
+        Проверка наличия вопроса без чтения его данных
+        
+        В ленивом режиме вопрос, которого нет в памяти, ищется в SQLite по первичному ключу.
+        
+        Args:
+            question_id: ID вопроса
+            
+        Returns:
+            True, если вопрос существует
+        """
+        found, unsaved = self._read_view(lambda: (
+            question_id in self.questions or question_id in self._cold, question_id in self._unsaved))
+        # Несохраненный вопрос не вытесняется из памяти: если его там нет, он удален
+        if found or unsaved or not self.lazy:
+            return found
+        with self._read_conn_lock:
+            return self._read_conn.execute(
+                "SELECT 1 FROM questions WHERE id = ?", (question_id,)).fetchone() is not None
+
+    def question_ids(self) -> List[str]:
+        """
+        ID всех вопросов, включая холодный архив и не загруженные в память
+        
+        Returns:
+            Список ID
+        """
+        if self.lazy:
+            with self._flush_lock:
+                self._flush_pending()
+                return [row[0] for row in self._conn.execute("SELECT id FROM questions ORDER BY rowid")]
+        with self.lock:
+            return list(self._cold) + list(self.questions)
+
+    def _advance_sequence(self, question_id: str) -> None:
+        """
+        Сдвиг последовательности за существующий ID (вызывается под self.lock)
+        
+        Args:
+            question_id: ID вопроса
+        """
+        seq = parse_question_seq(question_id)
+        if seq is not None and seq >= self._next_seq:
+            self._next_seq = seq + 1
+
+    def add_question(self, question_id: str, question_data: dict) -> None:
+        """
+        Добавление нового вопроса
+        
+        Args:
+            question_id: Уникальный идентификатор вопроса
+            question_data: Данные вопроса
+        """
+        try:
+            with self._question_lock(question_id):
+                batch_full = self._enqueue({'op': JOURNAL_OP_ADD, 'id': question_id, 'data': question_data})
+            self._schedule_flush(batch_full)
+            logger.info(f"Вопрос {question_id} успешно добавлен")
+        except Exception as e:
+            logger.error(f"Ошибка при добавлении вопроса: {e}")
+            raise DatabaseException(f"Ошибка при добавлении вопроса: {e}")
+
+    def submit_question(self, question_id: str, question_data: dict) -> str:
+        """
+        Добавление вопроса пользователя, если это не повторная отправка
+
+        Такой же ожидающий ответа вопрос того же пользователя, заданный не раньше
+        dedup_window секунд назад, не добавляется еще раз.
+
+        Args:
+            question_id: ID нового вопроса
+            question_data: Данные вопроса
+
+        Returns:
+            question_id, если вопрос добавлен, иначе ID ранее заданного такого же вопроса
+        """
+        try:
+            # Отправки проверяются и добавляются по очереди, чтобы одновременные копии не прошли обе
+            with self._submit_lock:
+                duplicate = self.find_duplicate(question_data.get('user_id', 0), question_data.get('category'),
+                                                question_data.get('text'), question_data.get('time'))
+                if duplicate is None:
+                    with self._question_lock(question_id):
+                        batch_full = self._enqueue({'op': JOURNAL_OP_ADD, 'id': question_id, 'data': question_data})
+            if duplicate is not None:
+                logger.info(f"Повторная отправка вопроса {duplicate}, новый вопрос не добавлен")
+                return duplicate
+            self._schedule_flush(batch_full)
+            logger.info(f"Вопрос {question_id} успешно добавлен")
+            return question_id
+        except Exception as e:
+            logger.error(f"Ошибка при добавлении вопроса: {e}")
+            raise DatabaseException(f"Ошибка при добавлении вопроса: {e}")
+
+    def find_duplicate(self, user_id: int, category: str, text: Optional[str],
+                       time: Optional[str] = None) -> Optional[str]:
+        """
+        Поиск такого же ожидающего ответа вопроса пользователя в окне dedup_window
+
+        Args:
+            user_id: ID пользователя
+            category: Категория вопроса; в другой категории вопрос не считается повторным
+            text: Текст вопроса; сравнивается без регистра, лишних пробелов и знаков препинания
+            time: Время нового вопроса в ISO формате (None - текущее)
+
+        Returns:
+            ID найденного вопроса или None (в том числе для текста без слов)
+        """
+        if self.dedup_window <= 0:
+            return None
+        key = self._text_key(user_id, category, text)
+        if key is None:
+            return None
+        question = self._read_view(lambda: self.questions.get(self._by_text.get(key)))
+        if question is None or question.status != 'pending' or question.category != category:
+            return None
+        # Хеш мог совпасть у разных текстов
+        if canonical_text(question.text) != canonical_text(text):
+            return None
+        now = encode_time(time or datetime.now().isoformat())
+        if (not isinstance(now, int) or not isinstance(question.time, int)
+                or now - question.time > self.dedup_window * TIME_UNIT):
+            return None
+        return question.id
+
+    def update_question(self, question_id: str, update_data: dict) -> None:
+        """
+        Обновление данных вопроса
+        
+        Args:
+            question_id: Уникальный идентификатор вопроса
+            update_data: Данные для обновления
+        """
+        try:
+            # Чтение и изменение вопроса не перемежаются с изменениями того же вопроса
+            # из других потоков; сохранение на диск идет уже без блокировки вопроса
+            with self._question_lock(question_id):
+                question = self.get_question(question_id)
+                if question:
+                    batch_full = self._enqueue({'op': JOURNAL_OP_UPDATE, 'id': question_id, 'data': update_data},
+                                               question)
+            if question:
+                self._schedule_flush(batch_full)
+                logger.info(f"Вопрос {question_id} успешно обновлен")
+            else:
+                logger.warning(f"Попытка обновить несуществующий вопрос: {question_id}")
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении вопроса: {e}")
+            raise DatabaseException(f"Ошибка при обновлении вопроса: {e}")
+
+    def delete_question(self, question_id: str) -> None:
+        """
+        Удаление вопроса вместе с его копиями в холодном архиве
+
+        Args:
+            question_id: Уникальный идентификатор вопроса
+        """
+        try:
+            if self._retain(question_id, RETENTION_DELETE):
+                logger.info(f"Вопрос {question_id} успешно удален")
+            else:
+                logger.warning(f"Попытка удалить несуществующий вопрос: {question_id}")
+        except Exception as e:
+            logger.error(f"Ошибка при удалении вопроса: {e}")
+            raise DatabaseException(f"Ошибка при удалении вопроса: {e}")
+
+    def purge(self, status: str, days: int, action: str = RETENTION_DELETE,
+              batch_size: int = RETENTION_BATCH) -> List[str]:
+        """
+        Политика хранения: удаление давно закрытых вопросов или ID пользователя в них
+
+        Вопросы обрабатываются пачками: пачка сохраняется одной записью, а блокировки
+        берутся на время изменения одного вопроса (в архиве - одного сегмента).
+        Возраст считается от ответа, а без ответа - от создания вопроса, как для архива.
+        Важные вопросы не затрагиваются.
+
+        Args:
+            status: Статус вопросов
+            days: Через сколько дней применяется действие
+            action: RETENTION_DELETE - удалить вопрос, RETENTION_ANONYMIZE - удалить ID пользователя
+            batch_size: Вопросов в пачке
+
+        Returns:
+            ID удаленных или обезличенных вопросов
+        """
+        if action not in RETENTION_ACTIONS:
+            raise DatabaseException(f"Неизвестное действие политики хранения: {action}")
+        cutoff = encode_time(datetime.now().isoformat()) - days * 86400 * TIME_UNIT
+        try:
+            purged = []
+            for batch in self._expired_batches(status, cutoff, action, batch_size):
+                for question_id in batch:
+                    if self._retain(question_id, action, (status, cutoff), schedule=False):
+                        purged.append(question_id)
+                self.flush()
+            archived = self._purge_cold(status, cutoff, action, batch_size)
+            if archived:
+                purged.extend(archived)
+                # Агрегаты в снимке должны учитывать изменения архива
+                if self.journal:
+                    self.compact()
+                else:
+                    self.save_json()
+            if purged and self.change_feed is not None:
+                # Прежние события ленты хранят данные вопросов, в том числе записанные до архива
+                self.change_feed.redact(purged, None if action == RETENTION_DELETE else PRIVATE_FIELDS)
+            if purged:
+                logger.info(f"Политика хранения ({status}, {days} дн., {action}): вопросов {len(purged)}")
+            return purged
+        except DatabaseException:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка при применении политики хранения: {e}")
+            raise DatabaseException(f"Ошибка при применении политики хранения: {e}")
+
+    @staticmethod
+    def _expired(question: Question, status: str, cutoff: int, action: str) -> bool:
+        """
+        Подпадает ли вопрос под действие политики хранения
+
+        Args:
+            question: Вопрос
+            status: Статус вопросов
+            cutoff: Время закрытия в микросекундах, раньше которого применяется действие
+            action: Действие политики хранения
+
+        Returns:
+            True, если действие нужно применить
+        """
+        if question.status != status or question.important:
+            return False
+        if action == RETENTION_ANONYMIZE and not question.user_id:
+            return False
+        closed_time = question.answer_time if question.answer_time is not None else question.time
+        return isinstance(closed_time, int) and closed_time < cutoff
+
+    def _expired_batches(self, status: str, cutoff: int, action: str, batch_size: int) -> Iterator[List[str]]:
+        """
+        Пачки ID вопросов в памяти (в ленивом режиме - в SQLite), подпадающих под политику хранения
+
+        Args:
+            status: Статус вопросов
+            cutoff: Время закрытия в микросекундах, раньше которого применяется действие
+            action: Действие политики хранения
+            batch_size: Вопросов в пачке
+
+        Yields:
+            Списки ID; условие проверяется еще раз при изменении вопроса
+        """
+        if self.lazy:
+            where = "status = ? AND important = 0 AND COALESCE(answer_time, time) < ? AND rowid > ?"
+            if action == RETENTION_ANONYMIZE:
+                where += " AND user_id != 0"
+            last_rowid = 0
+            while True:
+                with self._flush_lock:
+                    self._flush_pending()
+                    rows = self._conn.execute(
+                        f"SELECT rowid, id FROM questions WHERE {where} ORDER BY rowid LIMIT ?",
+                        (status, decode_time(cutoff), last_rowid, batch_size)).fetchall()
+                if not rows:
+                    return
+                last_rowid = rows[-1][0]
+                yield [question_id for _, question_id in rows]
+            return
+
+        # Вопросы не изменяются на месте, поэтому проверяются по копии списка без блокировки
+        question_ids = self._read_view(lambda: list(self._by_status.get(status, {})))
+        batch = []
+        for question_id in question_ids:
+            question = self.questions.get(question_id)
+            if question is not None and self._expired(question, status, cutoff, action):
+                batch.append(question_id)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def _purge_cold(self, status: str, cutoff: int, action: str, batch_size: int) -> List[str]:
+        """
+        Применение политики хранения к холодному архиву: сегменты перезаписываются по одному
+
+        Args:
+            status: Статус вопросов
+            cutoff: Время закрытия в микросекундах, раньше которого применяется действие
+            action: Действие политики хранения
+            batch_size: Вопросов, изменяемых за одну перезапись сегмента
+
+        Returns:
+            ID удаленных или обезличенных вопросов
+        """
+        segments = self._read_view(lambda: sorted({
+            entry[0] for question_id, entry in self._cold.items()
+            if entry[1] == status and not entry[3] and question_id not in self._archiving}))
+        purged = []
+        for segment in segments:
+            if not os.path.exists(os.path.join(self.cold_dir, segment)):
+                continue
+            expired = [question_id for question_id, question in self._read_segment(segment).items()
+                       if self._expired(question, status, cutoff, action)]
+            for start in range(0, len(expired), batch_size):
+                batch = expired[start:start + batch_size]
+                stripes = sorted({zlib.crc32(question_id.encode('utf-8')) % QUESTION_LOCK_STRIPES
+                                  for question_id in batch})
+                with ExitStack() as stack:
+                    for stripe in stripes:
+                        stack.enter_context(self._question_locks[stripe])
+                    with self._cold_lock:
+                        # Вопрос мог вернуться в память или быть изменен, пока читался сегмент
+                        with self.lock:
+                            live = {question_id for question_id in batch
+                                    if question_id in self._cold and self._cold[question_id][0] == segment
+                                    and question_id not in self._archiving}
+                        current = {question_id: question
+                                   for question_id, question in self._read_segment(segment, live).items()
+                                   if self._expired(question, status, cutoff, action)}
+                        if not current:
+                            continue
+                        self._rewrite_segment(segment, {
+                            question_id: None if action == RETENTION_DELETE else question.replace({'user_id': 0})
+                            for question_id, question in current.items()})
+                purged.extend(current)
+        return purged
+
+    def _retain(self, question_id: str, action: str, expired: Optional[Tuple[str, int]] = None,
+                schedule: bool = True) -> bool:
+        """
+        Удаление вопроса или ID пользователя в нем, в том числе в холодном архиве
+
+        Устаревшие копии вопроса в сегментах архива удаляются до записи изменения:
+        при сбое между ними вопрос остается в снимке или журнале.
+
+        Args:
+            question_id: ID вопроса
+            action: Действие политики хранения
+            expired: (статус, время закрытия) для повторной проверки условия политики хранения
+            schedule: Сохранить изменение как обычно (False - сохраняет вызывающий)
+
+        Returns:
+            True, если вопрос найден и изменен
+        """
+        with self._question_lock(question_id):
+            question = self.get_question(question_id)
+            if not question or (expired is not None and not self._expired(question, *expired, action)):
+                return False
+            data = {'user_id': 0} if action == RETENTION_ANONYMIZE else {}
+            with self._cold_lock:
+                entry, stale = self._read_view(lambda: (
+                    None if question_id in self._archiving else self._cold.get(question_id),
+                    list(self._stale.get(question_id, ()))))
+                for segment in stale:
+                    self._rewrite_segment(segment, {question_id: None})
+                if entry is not None:
+                    self._rewrite_segment(entry[0], {question_id: question.replace(data) if data else None})
+                    return True
+                op = JOURNAL_OP_UPDATE if data else JOURNAL_OP_DELETE
+                batch_full = self._enqueue({'op': op, 'id': question_id, 'data': data},
+                                           question if self.lazy else None)
+                if op == JOURNAL_OP_DELETE:
+                    with self.lock:
+                        self._stale.pop(question_id, None)
+        if schedule:
+            self._schedule_flush(batch_full)
+        return True
+
+    def get_question(self, question_id: str) -> Union[Question, dict]:
+        """
+        Получение данных вопроса
+        
+        Args:
+            question_id: Уникальный идентификатор вопроса
+            
+        Returns:
+            Данные вопроса или пустой словарь, если вопрос не найден
+        """
+        question = self.questions.get(question_id)
+        if question is not None:
+            if question_id in self._lru:
+                with self.lock:
+                    if question_id in self._lru:
+                        self._lru.move_to_end(question_id)
+            return question
+
+        question, archived = self._read_view(lambda: (self.questions.get(question_id), question_id in self._cold))
+        if question is not None:
+            return question
+        if not (self.lazy or archived):
+            return {}
+
+        if archived:
+            questions = self._read_cold([question_id])
+            return questions[0] if questions else {}
+
+        rows = self._query_questions("id = ?", (question_id,), lambda q: q.id == question_id)
+        if not rows:
+            return {}
+        with self._write_lock():
+            # Вопрос мог быть загружен другим потоком, пока шел запрос
+            question = self.questions.get(question_id)
+            if question is None:
+                question = rows[0]
+                self._cache_question(question)
+            return question
+
+    def _query_questions(self, where: str, params: tuple,
+                         match: Callable[[Question], bool]) -> List[Question]:
+        """
+        Чтение вопросов из SQLite по индексированному условию (в ленивом режиме)
+        
+        Запрос не ждет сохранения очереди: несохраненные изменения накладываются
+        на результат из памяти. Вопросы, которые уже есть в памяти, возвращаются из памяти.
+        
+        Args:
+            where: Условие WHERE
+            params: Параметры условия
+            match: То же условие для вопросов в памяти
+            
+        Returns:
+            Список вопросов в порядке добавления
+        """
+        with self.lock:
+            # Снимок берется до запроса: изменение, сохраненное после снимка, запрос уже увидит.
+            # Несохраненный вопрос не вытесняется, поэтому его отсутствие в памяти означает удаление
+            unsaved = {question_id: self.questions.get(question_id) for question_id in self._unsaved}
+        with self._read_conn_lock:
+            cursor = self._read_conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            rows = cursor.execute(f"SELECT * FROM questions WHERE {where} ORDER BY rowid", params).fetchall()
+
+        questions = []
+        for row in rows:
+            question_id = row['id']
+            if question_id in unsaved:
+                question = unsaved.pop(question_id)
+                if question is None or not match(question):
+                    continue
+            else:
+                question = self.questions.get(question_id) or self._question_from_row(row)
+            questions.append(question)
+        # Добавленные и изменившиеся под условие вопросы, которых еще нет в SQLite
+        questions.extend(question for question in unsaved.values() if question is not None and match(question))
+        return questions
+
+    @staticmethod
+    def _is_hot(question: Question) -> bool:
+        """Горячие вопросы (ожидающие и важные) всегда находятся в памяти"""
+        return question.get('status') == 'pending' or bool(question.get('important', False))
+
+    def _cache_question(self, question: Question) -> None:
+        """
+        Размещение прочитанного из SQLite вопроса в памяти (вызывается под self.lock)
+        
+        Args:
+            question: Данные вопроса
+        """
+        self.questions[question['id']] = question
+        self._index_add(question)
+        self._retier(question['id'])
+
+    def _retier(self, question_id: str) -> None:
+        """
+        Перенос вопроса между горячими и LRU с вытеснением давно не использованных (вызывается под self.lock)
+        
+        Args:
+            question_id: ID вопроса
+        """
+        question = self.questions.get(question_id)
+        if question is None or self._is_hot(question):
+            self._lru.pop(question_id, None)
+            return
+
+        self._lru[question_id] = None
+        self._lru.move_to_end(question_id)
+        for _ in range(len(self._lru) - self.sqlite_cache_rows):
+            evicted_id, _ = self._lru.popitem(last=False)
+            if evicted_id in self._unsaved:
+                # Вопрос с несохраненными изменениями остается в памяти до записи
+                self._lru[evicted_id] = None
+                continue
+            self._index_remove(self.questions.pop(evicted_id))
+
+    def get_questions_by_status(self, status: str, limit: Optional[int] = None,
+                                offset: int = 0) -> List[Question]:
+        """
+        Получение списка вопросов по статусу
+        
+        Args:
+            status: Статус вопросов ('pending', 'answered', 'rejected')
+            limit: Максимальное количество вопросов (None - все)
+            offset: Сколько вопросов пропустить (для постраничного вывода)
+            
+        Returns:
+            Список вопросов с указанным статусом
+        """
+        # В ленивом режиме в памяти гарантированно есть только все ожидающие вопросы
+        if self.lazy and status != 'pending':
+            questions = self._query_questions("status = ?", (status,), lambda q: q.status == status)
+            return questions[offset:None if limit is None else offset + limit]
+        cold_ids, questions = self._read_view(lambda: (
+            list(self._cold_by_status.get(status, {})),
+            [self.questions[q_id] for q_id in self._by_status.get(status, {})]
+        ))
+        return self._cold_page(cold_ids, questions, limit, offset)
+
+    def get_questions_by_user(self, user_id: int, status: Optional[str] = None,
+                              limit: Optional[int] = None, offset: int = 0) -> List[Question]:
+        """
+        Получение списка вопросов пользователя
+        
+        Args:
+            user_id: ID пользователя
+            status: Статус вопросов (None - все вопросы пользователя)
+            limit: Максимальное количество вопросов (None - все)
+            offset: Сколько вопросов пропустить (для постраничного вывода)
+            
+        Returns:
+            Список вопросов пользователя
+        """
+        if self.lazy:
+            if status is None:
+                questions = self._query_questions("user_id = ?", (user_id,), lambda q: q.user_id == user_id)
+            else:
+                questions = self._query_questions("user_id = ? AND status = ?", (user_id, status),
+                                                  lambda q: q.user_id == user_id and q.status == status)
+            return questions[offset:None if limit is None else offset + limit]
+        cold_ids, questions = self._read_view(lambda: (
+            # Статус вопроса архива есть в индексе, сегменты для фильтрации не читаются
+            [q_id for q_id in self._cold_by_user.get(user_id, {})
+             if status is None or self._cold[q_id][1] == status],
+            [self.questions[q_id] for q_id in self._by_user.get(user_id, {})
+             if status is None or self.questions[q_id].status == status]
+        ))
+        return self._cold_page(cold_ids, questions, limit, offset)
+
+    def _cold_page(self, cold_ids: List[str], questions: List[Question], limit: Optional[int],
+                   offset: int) -> List[Question]:
+        """
+        Страница списка, в начале которого вопросы холодного архива
+        
+        Архивные вопросы закрыты раньше остальных, поэтому идут первыми; с диска
+        читаются только те из них, что попали на страницу.
+        
+        Args:
+            cold_ids: ID вопросов архива
+            questions: Вопросы в памяти
+            limit: Максимальное количество вопросов (None - все)
+            offset: Сколько вопросов пропустить
+            
+        Returns:
+            Вопросы страницы
+        """
+        end = None if limit is None else offset + limit
+        page = questions[max(offset - len(cold_ids), 0):None if end is None else max(end - len(cold_ids), 0)]
+        page_ids = cold_ids[offset:end]
+        return self._read_cold(page_ids) + page if page_ids else page
+
+    def search(self, query: str, limit: int = 50, offset: int = 0) -> List[Question]:
+        """
+        Полнотекстовый поиск вопросов по тексту вопроса и ответа
+        
+        Каждое слово запроса ищется как начало слова, вопрос должен содержать все слова.
+        Результаты упорядочены по релевантности (BM25), совпадения в тексте вопроса важнее.
+        SQLite база ищет по FTS5, JSON база - по инвертированному индексу в памяти.
+        
+        Args:
+            query: Строка поиска
+            limit: Максимальное количество результатов
+            offset: Сколько результатов пропустить (для постраничного вывода)
+            
+        Returns:
+            Список найденных вопросов
+        """
+        return [question for question, _ in self.search_ranked(query, limit, offset)]
+
+    def search_ranked(self, query: str, limit: int = 50, offset: int = 0) -> List[Tuple[Question, float]]:
+        """
+        Полнотекстовый поиск с оценками релевантности (см. search)
+        
+        Args:
+            query: Строка поиска
+            limit: Максимальное количество результатов
+            offset: Сколько результатов пропустить
+            
+        Returns:
+            Пары (вопрос, оценка BM25), большая оценка - более релевантный вопрос
+        """
+        terms = [term.lower() for term in SEARCH_TERM_RE.findall(query)]
+        if not terms:
+            return []
+        try:
+            if self.fts:
+                return self._search_fts(terms, limit, offset)
+            return self._search_inverted(query, limit, offset)
+        except Exception as e:
+            logger.error(f"Ошибка при поиске вопросов: {e}")
+            raise DatabaseException(f"Ошибка при поиске вопросов: {e}")
+
+    def _search_fts(self, terms: List[str], limit: int, offset: int) -> List[Tuple[Question, float]]:
+        """
+        Поиск по индексу FTS5 в SQLite
+        
+        Поиск не ждет сохранения очереди: несохраненные вопросы проверяются по версии
+        в памяти (см. _query_questions). Вопросы, которых еще нет в индексе, получают
+        оценку 0 и идут после найденных в индексе.
+        """
+        match = ' '.join(f'"{term}"*' for term in terms)
+        with self.lock:
+            unsaved = {question_id: self.questions.get(question_id) for question_id in self._unsaved}
+        with self._read_conn_lock:
+            cursor = self._read_conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            # Несохраненные вопросы могут выпасть из результата, поэтому строк читается с запасом
+            rows = cursor.execute(f'''
+            SELECT questions.*, bm25(questions_fts, {SEARCH_TEXT_WEIGHT}, {SEARCH_ANSWER_WEIGHT}) AS score
+            FROM questions_fts
+            JOIN questions ON questions.rowid = questions_fts.rowid
+            WHERE questions_fts MATCH ?
+            ORDER BY score
+            LIMIT ?
+            ''', (match, offset + limit + len(unsaved))).fetchall()
+
+        found = []
+        for row in rows:
+            question_id = row['id']
+            if question_id in unsaved:
+                question = unsaved.pop(question_id)
+                if question is None or not self._matches_terms(question, terms):
+                    continue
+            else:
+                question = self.questions.get(question_id) or self._question_from_row(row)
+            # bm25() в FTS5 отрицательна: чем меньше, тем релевантнее
+            found.append((question, -row['score']))
+        found.extend((question, 0.0) for question in unsaved.values()
+                     if question is not None and self._matches_terms(question, terms))
+        return found[offset:offset + limit]
+
+    @staticmethod
+    def _matches_terms(question: Question, terms: List[str]) -> bool:
+        """
+        Проверка вопроса в памяти по правилам запроса FTS5 (каждое слово - начало слова текста)
+        
+        Args:
+            question: Данные вопроса
+            terms: Слова запроса в нижнем регистре
+            
+        Returns:
+            True, если вопрос содержит все слова запроса
+        """
+        def fold(text: str) -> str:
+            # Как remove_diacritics в токенизаторе unicode61
+            return ''.join(char for char in unicodedata.normalize('NFKD', text.lower())
+                           if not unicodedata.combining(char))
+
+        words = SEARCH_TERM_RE.findall(fold(f"{question.text or ''} {question.answer or ''}"))
+        return all(any(word.startswith(fold(term)) for word in words) for term in terms)
+
+    def _search_inverted(self, query: str, limit: int, offset: int) -> List[Tuple[Question, float]]:
+        """Поиск по инвертированному индексу в памяти (JSON база и SQLite без FTS5)"""
+        index = self._ensure_search_index()
+        with self._search_lock:
+            with self.lock:
+                changes, self._search_index_changes = self._search_index_changes, {}
+            # Изменения вносятся и запрос оценивается без self.lock: запись не ждет поиска
+            for question_id, question in changes.items():
+                if question is None:
+                    index.remove(question_id)
+                else:
+                    index.add(question_id, question.text, question.answer)
+            ranked = index.search(query, limit=offset + limit)[offset:]
+        with self.lock:
+            found = {}
+            for question_id, _ in ranked:
+                question = self.questions.get(question_id) or self._archiving.get(question_id)
+                if question is not None:
+                    found[question_id] = question
+        missing = [question_id for question_id, _ in ranked if question_id not in found]
+        if missing and not self.lazy:
+            found.update((question.id, question) for question in self._read_cold(missing))
+        elif missing:
+            found.update((question_id, self.get_question(question_id)) for question_id in missing)
+        return [(found[question_id], score) for question_id, score in ranked if found.get(question_id)]
+
+    def _search_index_update(self, question_id: str, question: Optional[Question]) -> None:
+        """
+        Запоминание изменения вопроса для поискового индекса (вызывается под self.lock)
+        
+        Разбор текста и изменение индекса выполняет следующий поиск (см. _search_inverted),
+        в том числе для изменений, сделанных во время построения индекса.
+        
+        Args:
+            question_id: ID вопроса
+            question: Новая версия вопроса (None - вопрос удален)
+        """
+        if self._search_index_changes is not None:
+            self._search_index_changes[question_id] = question
+
+    def _build_search_index(self) -> None:
+        """Фоновое построение поискового индекса после загрузки"""
+        try:
+            self._ensure_search_index()
+        except Exception as e:
+            # Индекс будет построен заново при первом поиске
+            logger.error(f"Ошибка при построении поискового индекса: {e}")
+
+    def _ensure_search_index(self) -> InvertedIndex:
+        """
+        Построение инвертированного индекса (в фоне после загрузки или при первом поиске)
+        
+        Под блокировкой берется только список вопросов в памяти; разбор текста, чтение
+        холодного архива по сегментам и SQLite частями по SEARCH_INDEX_CHUNK строк
+        (в ленивом режиме) идут без нее. Изменения, сделанные за время построения и после
+        него, запоминаются в _search_index_update и вносятся в индекс при поиске.
+        
+        Returns:
+            Готовый индекс
+        """
+        if self._search_index_ready:
+            return self._search_index
+        with self._search_index_lock:
+            if self._search_index_ready:
+                return self._search_index
+            index = InvertedIndex(SEARCH_TEXT_WEIGHT, SEARCH_ANSWER_WEIGHT)
+            with self.lock:
+                questions = list(self.questions.values()) + list(self._archiving.values())
+                cold: Dict[str, set] = {}
+                for question_id, entry in self._cold.items():
+                    if question_id not in self._archiving:
+                        cold.setdefault(entry[0], set()).add(question_id)
+                # Несохраненный вопрос, которого нет в памяти, удален: его строка в SQLite устарела
+                unsaved = set(self._unsaved)
+                self._search_index_changes = {}
+
+            try:
+                for question in questions:
+                    index.add(question.id, question.text, question.answer)
+                # Версия из памяти новее прочитанной с диска
+                if self.lazy:
+                    for question_id, text, answer in self._iter_sqlite_texts():
+                        if question_id not in index and question_id not in unsaved:
+                            index.add(question_id, text, answer)
+                for segment in sorted(cold):
+                    for question in self._read_segment(segment, cold[segment]).values():
+                        if question.id not in index:
+                            index.add(question.id, question.text, question.answer)
+
+                with self.lock:
+                    self._search_index = index
+                    self._search_index_ready = True
+            except Exception:
+                with self.lock:
+                    self._search_index_changes = None
+                raise
+            logger.info(f"Построен поисковый индекс, вопросов: {len(index)}")
+            return index
+
+    def _iter_sqlite_texts(self) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+        """
+        Потоковое чтение текстов всех вопросов из SQLite частями по SEARCH_INDEX_CHUNK строк
+        
+        Соединение для чтения занято только на время чтения одной части.
+        
+        Returns:
+            Итератор троек (ID вопроса, текст, ответ) в порядке добавления
+        """
+        last_rowid = 0
+        while True:
+            with self._read_conn_lock:
+                rows = self._read_conn.execute(
+                    "SELECT rowid, id, text, answer FROM questions WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, SEARCH_INDEX_CHUNK)
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            for _, question_id, text, answer in rows:
+                yield question_id, text, answer
+
+    def get_important_questions(self) -> List[Question]:
+        """
+        Получение списка важных вопросов
+        
+        Returns:
+            Список важных вопросов
+        """
+        return self._read_view(lambda: [self.questions[q_id] for q_id in self._important])
+
+    @property
+    def stats(self) -> Mapping[str, Any]:
+        """Статистика в формате, который используют обработчики"""
+        return self.get_stats()
+
+    def get_stats(self) -> Mapping[str, Any]:
+        """
+        Получение статистики из последнего опубликованного снимка без блокировки
+        
+        Returns:
+            Статистика использования бота (только для чтения)
+        """
+        return self._stats_snapshot.stats
+
+    def stats_snapshot(self) -> StatsSnapshot:
+        """
+        Последний опубликованный снимок счетчиков и статистики
+        
+        Returns:
+            Неизменяемый снимок с номером версии
+        """
+        return self._stats_snapshot
+
+    def get_rollups(self, period: str = 'day', start: Optional[str] = None, end: Optional[str] = None,
+                    category: Optional[str] = None) -> List[dict]:
+        """
+        Активность по часам или дням из агрегатов, без просмотра вопросов (см. Rollups.query)
+
+        Args:
+            period: Период агрегатов ('hour' или 'day')
+            start: Начало в ISO формате включительно (None - с первого интервала)
+            end: Конец в ISO формате не включительно (None - до последнего интервала)
+            category: Категория (None - все категории вместе)
+
+        Returns:
+            Интервалы по возрастанию времени с количеством вопросов, ответов и временем ответа
+        """
+        return self._read_view(lambda: self._rollups.query(period, start, end, category))
+
+    def rollup_cells(self) -> Dict[RollupKey, int]:
+        """
+        Копия агрегатов активности (для объединения частей хранилища)
+
+        Returns:
+            Значения агрегатов по ключам (период, интервал, категория, показатель)
+        """
+        return self._read_view(lambda: dict(self._rollups.cells))
+
+    def _build_stats(self) -> dict:
+        """
+        Сборка статистики из счетчиков для записи в снимок базы
+        
+        Returns:
+            Общее количество, количество по статусам, категориям и важных вопросов
+        """
+        return self._stats_from_counts(self._counts)
+
+    @staticmethod
+    def _stats_from_counts(counts: Dict[Tuple[str, str, bool], int]) -> dict:
+        """
+        Статистика по счетчикам ячеек
+        
+        Args:
+            counts: Количество вопросов по ячейкам (статус, категория, важность)
+            
+        Returns:
+            Общее количество, количество по статусам, категориям и важных вопросов
+        """
+        statuses = {status: 0 for status in QUESTION_STATUSES}
+        categories = {cat: 0 for cat in CATEGORIES.keys()}
+        important = 0
+        for (status, category, is_important), count in counts.items():
+            statuses[status] = statuses.get(status, 0) + count
+            categories[category] = categories.get(category, 0) + count
+            if is_important:
+                important += count
+
+        total = sum(statuses.values())
+        return {
+            'total_questions': total,
+            'answered_questions': statuses.get('answered', 0),
+            'categories': categories,
+            'statuses': statuses,
+            'important_questions': important
+        }
+
+    def count_questions(self, status: Optional[str] = None, category: Optional[str] = None,
+                        important: Optional[bool] = None) -> int:
+        """
+        Количество вопросов по фильтру без просмотра архива
+        
+        Args:
+            status: Статус вопросов (None - любой)
+            category: Категория вопросов (None - любая)
+            important: Важность вопросов (None - любая)
+            
+        Returns:
+            Количество вопросов
+        """
+        return sum(
+            count for (cell_status, cell_category, cell_important), count in self._stats_snapshot.counts.items()
+            if (status is None or cell_status == status)
+            and (category is None or cell_category == category)
+            and (important is None or cell_important == important)
+        )
+
+    def reconcile_stats(self) -> Dict[Tuple[str, str, bool], Tuple[int, int]]:
+        """
+        Сверка счетчиков с фактическими данными и исправление расхождений
+        
+        Returns:
+            Расхождения в виде {ячейка: (значение счетчика, фактическое значение)}
+        """
+        try:
+            with self._flush_lock:
+                # Сверяем с сохраненными данными, поэтому сначала сохраняем очередь
+                self._flush_pending()
+                if self.db_type == 'sqlite':
+                    # Запрос идет без self.lock: SQLite изменяется только под self._flush_lock
+                    cursor = self._conn.execute(
+                        "SELECT status, category, important, COUNT(*) FROM questions "
+                        "GROUP BY status, category, important"
+                    )
+                    stored = {(status, category, bool(important)): count
+                              for status, category, important, count in cursor.fetchall()}
+                with self.lock:
+                    if self.db_type == 'sqlite':
+                        # Изменения, примененные в памяти во время запроса, еще в очереди
+                        actual = dict(stored)
+                        for _, deltas, *_ in self._pending:
+                            for cell, delta in deltas.items():
+                                actual[cell] = actual.get(cell, 0) + delta
+                    else:
+                        actual = self._count_questions_in_memory()
+
+                    counts = self._counts
+                    mismatches = {
+                        cell: (counts.get(cell, 0), actual.get(cell, 0))
+                        for cell in set(counts) | set(actual)
+                        if counts.get(cell, 0) != actual.get(cell, 0)
+                    }
+                    if mismatches:
+                        self._set_counts(actual)
+                if mismatches and self.db_type == 'sqlite':
+                    # Очередь добавит свои приращения при сохранении
+                    with self._conn:
+                        self._write_sqlite_counts(self._conn.cursor(), stored)
+
+            if mismatches:
+                logger.warning(f"Счетчики статистики исправлены, расхождений: {len(mismatches)}")
+            return mismatches
+        except Exception as e:
+            logger.error(f"Ошибка при сверке статистики: {e}")
+            raise DatabaseException(f"Ошибка при сверке статистики: {e}")
+
+    def _count_questions_in_memory(self) -> Dict[Tuple[str, str, bool], int]:
+        """Подсчет вопросов по ячейкам по данным в памяти и индексу архива (вызывается под self.lock)"""
+        counts = {}
+        for question in self.questions.values():
+            cell = self._cell(question)
+            counts[cell] = counts.get(cell, 0) + 1
+        for _, status, category, important, _ in self._cold.values():
+            cell = (status, category, important)
+            counts[cell] = counts.get(cell, 0) + 1
+        return counts
+
+    def _write_sqlite_counts(self, cursor: sqlite3.Cursor, counts: Dict[Tuple[str, str, bool], int]) -> None:
+        """
+        Полная перезапись счетчиков в таблице stats (вызывается под self._flush_lock)
+        
+        Args:
+            cursor: Курсор транзакции
+            counts: Счетчики для записи
+        """
+        cursor.execute("DELETE FROM stats WHERE key LIKE ?", (f"{COUNT_KEY_PREFIX}:%",))
+        cursor.executemany(
+            "INSERT INTO stats (key, value) VALUES (?, ?)",
+            [(self._count_key(cell), count) for cell, count in counts.items() if count]
+        )
+
+    def backup(self, backup_dir: str = 'backups', compression: Optional[str] = None) -> str:
+        """
+        Создание резервной копии базы данных без остановки записи
+        
+        JSON база копируется по снимку словаря вопросов, взятому под блокировкой за время
+        копирования ссылок. SQLite копируется по отдельному соединению небольшими шагами
+        внутри одной читающей транзакции, которая в режиме WAL не мешает записи.
+        
+        Args:
+            backup_dir: Директория для резервных копий
+            compression: Сжатие копии (None, 'gzip' или 'zstd')
+            
+        Returns:
+            Путь к файлу резервной копии
+        """
+        try:
+            if compression not in BACKUP_EXTENSIONS:
+                raise DatabaseException(f"Неподдерживаемое сжатие резервной копии: {compression}")
+            if compression == 'zstd' and zstandard is None:
+                raise DatabaseException("Для сжатия zstd требуется пакет zstandard")
+
+            # Создаем директорию для резервных копий, если она не существует
+            if not os.path.exists(backup_dir):
+                os.makedirs(backup_dir)
+            
             # Формируем имя файла резервной копии с текущей датой и временем
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            source = self.filename if self.db_type == 'json' else self.sqlite_file
+            backup_file = os.path.join(
+                backup_dir, f"backup_{timestamp}_{os.path.basename(source)}{BACKUP_EXTENSIONS[compression]}"
+            )
             
             if self.db_type == 'json':
-                backup_file = os.path.join(backup_dir, f"backup_{timestamp}_{os.path.basename(self.filename)}")
-                with self.lock:
-                    with open(self.filename, 'r', encoding='utf-8') as src, open(backup_file, 'w', encoding='utf-8') as dst:
-                        dst.write(src.read())
+                self._backup_json(backup_file, compression)
             elif self.db_type == 'sqlite':
-                backup_file = os.path.join(backup_dir, f"backup_{timestamp}_{os.path.basename(self.sqlite_file)}")
-                with self.lock:
-                    conn = sqlite3.connect(self.sqlite_file)
-                    backup_conn = sqlite3.connect(backup_file)
-                    conn.backup(backup_conn)
-                    backup_conn.close()
-                    conn.close()
+                self._backup_sqlite(backup_file, compression)
             
             logger.info(f"Создана резервная копия базы данных: {backup_file}")
             return backup_file
@@ -371,29 +3108,373 @@ class Database:
             logger.error(f"Ошибка при создании резервной копии: {e}")
             raise DatabaseException(f"Ошибка при создании резервной копии: {e}")
 
-    def migrate_json_to_sqlite(self, json_file: str, sqlite_file: str) -> None:
+    def take_changed_ids(self) -> List[str]:
+        """
+        Получение ID вопросов, измененных после предыдущего вызова
+        
+        Используется для инкрементных резервных копий.
+        
+        Returns:
+            Список ID в порядке первого изменения
+        """
+        with self.lock:
+            changed, self._changed = self._changed, {}
+        return list(changed)
+
+    def _backup_json(self, backup_file: str, compression: Optional[str]) -> None:
         """
-        Миграция данных из JSON в SQLite
+        Потоковая запись снимка JSON базы в резервную копию
+        
+        Args:
+            backup_file: Путь к файлу резервной копии
+            compression: Сжатие копии
+        """
+        with self.lock:
+            # Вопросы не изменяются на месте, копии словаря достаточно для согласованного снимка
+            questions = dict(self.questions)
+            questions.update(self._archiving)
+            stats = self._build_stats()
+            sequence = self._next_seq
+            segments = {entry[0] for entry in self._cold.values()}
+
+        with open_backup_file(backup_file, compression) as raw:
+            f = io.TextIOWrapper(raw, encoding='utf-8', write_through=False)
+            self._dump_snapshot(f, questions, stats, sequence)
+            f.flush()
+            f.detach()
+
+        # Сегменты архива не изменяются, поэтому в копию попадают жесткие ссылки на них
+        for segment in sorted(segments):
+            segment_file = os.path.join(self.cold_dir, segment)
+            if not os.path.exists(segment_file):
+                # Сегмент еще записывается, его вопросы вошли в снимок
+                continue
+            os.makedirs(f"{backup_file}.cold", exist_ok=True)
+            for name in (segment, segment[:-len(COLD_SEGMENT_SUFFIX)] + COLD_INDEX_SUFFIX):
+                src = os.path.join(self.cold_dir, name)
+                dst = os.path.join(f"{backup_file}.cold", name)
+                if not os.path.exists(src) or os.path.exists(dst):
+                    continue
+                try:
+                    os.link(src, dst)
+                except OSError:
+                    shutil.copy2(src, dst)
+
+    def _backup_sqlite(self, backup_file: str, compression: Optional[str]) -> None:
+        """
+        Пошаговое копирование SQLite базы в резервную копию
+        
+        Args:
+            backup_file: Путь к файлу резервной копии
+            compression: Сжатие копии
+        """
+        # Копия должна содержать изменения, примененные в памяти
+        self.flush()
+
+        db_file = f"{backup_file}.db.tmp"
+        src = sqlite3.connect(self.sqlite_file)
+        try:
+            # Читающая транзакция фиксирует момент копии: изменения других соединений
+            # не перезапускают копирование
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM stats").fetchone()
+            dst = sqlite3.connect(db_file)
+            try:
+                src.backup(dst, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP)
+            finally:
+                dst.close()
+        finally:
+            src.rollback()
+            src.close()
+
+        try:
+            with open_backup_file(backup_file, compression) as f, open(db_file, 'rb') as db:
+                shutil.copyfileobj(db, f)
+        finally:
+            os.remove(db_file)
+
+    def migrate_json_to_sqlite(self, json_file: str, sqlite_file: str,
+                               batch_size: int = MIGRATION_BATCH_SIZE,
+                               progress: Optional[Callable[[int, float], None]] = None) -> int:
+        """
+        Потоковая миграция данных из JSON в SQLite
+        
+        JSON файл и сегменты холодного архива читаются потоково, вопросы вставляются
+        пакетами через executemany, каждый пакет - одна транзакция вместе с контрольной
+        точкой. После прерывания повторный запуск пропускает уже перенесенные вопросы.
+        Индексы, счетчики и последовательность ID строятся после загрузки.
         
         Args:
             json_file: Путь к JSON файлу
             sqlite_file: Путь к SQLite файлу
+            batch_size: Количество вопросов в одной транзакции
+            progress: Функция, вызываемая после каждого пакета с числом перенесенных вопросов и скоростью
+            
+        Returns:
+            Количество перенесенных вопросов
         """
         try:
-            # Загружаем данные из JSON
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                questions = data.get('questions', {})
-                stats = data.get('stats', {
-                    'total_questions': 0,
-                    'answered_questions': 0,
-                    'categories': {cat: 0 for cat in CATEGORIES.keys()}
-                })
-            
-            # Создаем и инициализируем SQLite базу данных
-            conn = sqlite3.connect(sqlite_file)
-            cursor = conn.cursor()
+            conn = self._open_sqlite(sqlite_file)
+            try:
+                self._migrate_schema(conn, SCHEMA_TABLES_VERSION)
+                row = conn.execute("SELECT value FROM stats WHERE key = ?", (MIGRATION_KEY,)).fetchone()
+                done = row[0] if row else 0
+                if done:
+                    logger.info(f"Миграция из {json_file} продолжается, уже перенесено вопросов: {done}")
+
+                meta = {}
+                sequence = 1
+                processed = 0
+                batch = []
+                started = time.monotonic()
+
+                def write_batch() -> None:
+                    """Вставка пакета вместе с контрольной точкой в одной транзакции"""
+                    with conn:
+                        conn.executemany(f'''
+                        INSERT OR REPLACE INTO questions ({', '.join(QUESTION_COLUMNS)})
+                        VALUES ({', '.join('?' * len(QUESTION_COLUMNS))})
+                        ''', batch)
+                        conn.execute("INSERT OR REPLACE INTO stats (key, value) VALUES (?, ?)",
+                                     (MIGRATION_KEY, processed))
+                    batch.clear()
+                    rate = (processed - done) / max(time.monotonic() - started, 1e-6)
+                    logger.info(f"Миграция: перенесено вопросов {processed}, {rate:.0f} в секунду")
+                    if progress is not None:
+                        progress(processed, rate)
+
+                for question_id, question in self._iter_migration_source(json_file, meta):
+                    seq = parse_question_seq(question_id)
+                    if seq is not None and seq >= sequence:
+                        sequence = seq + 1
+                    processed += 1
+                    if processed <= done:
+                        continue
+                    question.setdefault('id', question_id)
+                    batch.append(self._question_to_row(question))
+                    if len(batch) >= batch_size:
+                        write_batch()
+                if batch:
+                    write_batch()
+
+                # Индексы и поисковый индекс быстрее строятся по загруженной таблице
+                self._migrate_schema(conn)
+
+                # Счетчики статистики и последовательность ID по перенесенным вопросам
+                with conn:
+                    counts = conn.execute(
+                        "SELECT status, category, important, COUNT(*) FROM questions "
+                        "GROUP BY status, category, important"
+                    ).fetchall()
+                    conn.execute("DELETE FROM stats WHERE key LIKE ?", (f"{COUNT_KEY_PREFIX}:%",))
+                    conn.executemany(
+                        "INSERT INTO stats (key, value) VALUES (?, ?)",
+                        [(self._count_key((status, category, bool(important))), count)
+                         for status, category, important, count in counts]
+                    )
+                    conn.execute('''
+                    INSERT INTO stats (key, value) VALUES (?, ?)
+                    ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)
+                    ''', (SEQUENCE_KEY, max(sequence, meta.get('sequence', 1))))
+                    conn.execute("DELETE FROM stats WHERE key = ?", (MIGRATION_KEY,))
+            finally:
+                conn.close()
+            
+            elapsed = time.monotonic() - started
+            logger.info(f"Миграция из {json_file} в {sqlite_file} завершена, перенесено вопросов: "
+                        f"{processed} за {elapsed:.1f} с")
+            return processed
+        except Exception as e:
+            logger.error(f"Ошибка при миграции из JSON в SQLite: {e}")
+            raise DatabaseException(f"Ошибка при миграции из JSON в SQLite: {e}")
+
+    @staticmethod
+    def _iter_migration_source(json_file: str, meta: dict) -> Iterator[Tuple[str, dict]]:
+        """
+        Вопросы для миграции: сначала холодный архив, затем снимок
+        
+        Порядок совпадает с приоритетом копий: более поздняя запись заменяет раннюю.
+        
+        Args:
+            json_file: Путь к JSON файлу
+            meta: Словарь для остальных ключей верхнего уровня снимка
+            
+        Returns:
+            Итератор пар (ID, данные вопроса)
+        """
+        cold_dir = f"{json_file}.cold"
+        if os.path.isdir(cold_dir):
+            for segment in sorted(n for n in os.listdir(cold_dir) if n.endswith(COLD_SEGMENT_SUFFIX)):
+                with gzip.open(os.path.join(cold_dir, segment), 'rt', encoding='utf-8') as f:
+                    for line in f:
+                        question = json.loads(line)
+                        yield question['id'], question
+        yield from iter_snapshot_questions(json_file, meta)
+
+class AsyncDatabase:
+    """
+    Неблокирующий интерфейс к Database для обработчиков asyncio
+    
+    Изменения выполняются в отдельном потоке записи, поэтому медленная запись на диск
+    не останавливает цикл событий. Чтения, которые могут обратиться к диску (SQLite
+    в ленивом режиме, холодный архив), выполняются в общем пуле потоков; остальные
+    чтения идут из памяти и делегируются напрямую.
+    У разделенного хранилища по потоку записи на каждую часть.
+    """
+    def __init__(self, db: Database):
+        """
+        Инициализация обертки
+        
+        Args:
+            db: Синхронная база данных
+        """
+        self.db = db
+        # Один поток на часть хранилища сохраняет порядок изменений в ней
+        self._writers = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'db-writer-{index}')
+                         for index in range(db.shard_count)]
+
+    def __getattr__(self, name: str) -> Any:
+        """Делегирование чтения синхронной базе данных"""
+        return getattr(self.db, name)
+
+    async def _run(self, func: Callable, *args, shard: int = 0) -> Any:
+        """
+        Выполнение блокирующего вызова в потоке записи
+        
+        Args:
+            func: Метод синхронной базы данных
+            shard: Номер части хранилища, в потоке которой выполняется вызов
+            
+        Returns:
+            Результат вызова
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writers[shard], functools.partial(func, *args))
+
+    async def _run_after_all(self, func: Callable) -> Any:
+        """
+        Выполнение вызова после изменений, начатых во всех потоках записи
+        
+        Args:
+            func: Метод синхронной базы данных
+            
+        Returns:
+            Результат вызова
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(writer, lambda: None) for writer in self._writers[1:]))
+        return await self._run(func)
+
+    async def _read(self, func: Callable, *args) -> Any:
+        """
+        Выполнение чтения в общем пуле потоков, не дожидаясь изменений в потоках записи
+        
+        Args:
+            func: Метод синхронной базы данных
+            
+        Returns:
+            Результат вызова
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args))
+
+    async def get_question(self, question_id: str) -> Question:
+        """Получение данных вопроса (см. Database.get_question)"""
+        return await self._read(self.db.get_question, question_id)
+
+    async def get_questions_by_status(self, status: str, limit: Optional[int] = None,
+                                      offset: int = 0) -> List[Question]:
+        """Получение списка вопросов по статусу (см. Database.get_questions_by_status)"""
+        return await self._read(self.db.get_questions_by_status, status, limit, offset)
+
+    async def get_questions_by_user(self, user_id: int, status: Optional[str] = None,
+                                    limit: Optional[int] = None, offset: int = 0) -> List[Question]:
+        """Получение списка вопросов пользователя (см. Database.get_questions_by_user)"""
+        return await self._read(self.db.get_questions_by_user, user_id, status, limit, offset)
+
+    async def search(self, query: str, limit: int = 50, offset: int = 0) -> List[Question]:
+        """Полнотекстовый поиск вопросов (см. Database.search)"""
+        return await self._read(self.db.search, query, limit, offset)
+
+    async def search_ranked(self, query: str, limit: int = 50, offset: int = 0) -> List[Tuple[Question, float]]:
+        """Полнотекстовый поиск с оценками релевантности (см. Database.search_ranked)"""
+        return await self._read(self.db.search_ranked, query, limit, offset)
+
+    async def _shard(self, question_id: str, question_data: Optional[dict] = None) -> int:
+        """
+        Номер потока записи для вопроса
+        
+        Часть разделенного хранилища может искаться по первичному ключу в SQLite,
+        поэтому поиск идет вне цикла событий.
+        
+        Args:
+            question_id: ID вопроса
+            question_data: Данные добавляемого вопроса
             
-            # Создаем таблицы
-            cur
-(Content truncated due to size limit. Use line ranges to read in chunks)
\ No newline at end of file
+        Returns:
+            Номер части хранилища
+        """
+        if len(self._writers) == 1:
+            return 0
+        return await self._read(self.db.shard_index, question_id, question_data)
+
+    async def add_question(self, question_id: str, question_data: dict) -> None:
+        """Добавление нового вопроса (см. Database.add_question)"""
+        await self._run(self.db.add_question, question_id, question_data,
+                        shard=await self._shard(question_id, question_data))
+
+    async def submit_question(self, question_id: str, question_data: dict) -> str:
+        """Добавление вопроса без повторных отправок (см. Database.submit_question)"""
+        return await self._run(self.db.submit_question, question_id, question_data,
+                               shard=await self._shard(question_id, question_data))
+
+    async def update_question(self, question_id: str, update_data: dict) -> None:
+        """Обновление данных вопроса (см. Database.update_question)"""
+        await self._run(self.db.update_question, question_id, update_data,
+                        shard=await self._shard(question_id))
+
+    async def delete_question(self, question_id: str) -> None:
+        """Удаление вопроса (см. Database.delete_question)"""
+        await self._run(self.db.delete_question, question_id, shard=await self._shard(question_id))
+
+    async def purge(self, status: str, days: int, action: str = RETENTION_DELETE,
+                    batch_size: int = RETENTION_BATCH) -> List[str]:
+        """
+        Политика хранения (см. Database.purge)
+
+        Выполняется вне потоков записи: пачки сохраняются по очереди и не задерживают изменения.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.db.purge, status, days, action, batch_size))
+
+    async def flush(self) -> None:
+        """
+        Ожидание сохранения изменений (см. Database.flush)
+        
+        Выполняется в потоке записи после всех ранее начатых изменений,
+        поэтому после ожидания они гарантированно сохранены.
+        """
+        await self._run_after_all(self.db.flush)
+
+    async def compact(self) -> None:
+        """Сжатие журнала (см. Database.compact)"""
+        await self._run_after_all(self.db.compact)
+
+    async def reconcile_stats(self) -> Dict[Tuple[str, str, bool], Tuple[int, int]]:
+        """Сверка счетчиков статистики (см. Database.reconcile_stats)"""
+        return await self._run_after_all(self.db.reconcile_stats)
+
+    async def backup(self, backup_dir: str = 'backups', compression: Optional[str] = None) -> str:
+        """
+        Создание резервной копии (см. Database.backup)
+        
+        Копия создается вне потока записи, чтобы не задерживать изменения.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.db.backup, backup_dir, compression))
+
+    async def close(self) -> None:
+        """Закрытие базы данных после завершения всех начатых изменений"""
+        await self._run_after_all(self.db.close)
+        for writer in self._writers:
+            writer.shutdown(wait=True)
@@ -2,6 +2,7 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMa
 from typing import List, Dict, Optional
 
 from config import CATEGORIES, CHANNEL_ID, logger
+from models import Question
 
 def get_main_keyboard() -> ReplyKeyboardMarkup:
     """
@@ -72,7 +73,7 @@ def get_admin_keyboard(question_id: str) -> InlineKeyboardMarkup:
     ]
     return InlineKeyboardMarkup(keyboard)
 
-def get_questions_list_keyboard(questions: List[dict], page: int = 0, items_per_page: int = 5) -> InlineKeyboardMarkup:
+def get_questions_list_keyboard(questions: List[Question], page: int = 0, items_per_page: int = 5) -> InlineKeyboardMarkup:
     """
     Создание клавиатуры со списком вопросов с пагинацией
     
@@ -95,20 +96,20 @@ def get_questions_list_keyboard(questions: List[dict], page: int = 0, items_per_
             'pending': '⏳',
             'answered': '✅',
             'rejected': '❌'
-        }.get(q['status'], '⏳')
+        }.get(q.status, '⏳')
         
         # Обрезаем текст вопроса до 30 символов
-        short_text = q['text'][:30] + '...' if len(q['text']) > 30 else q['text']
+        short_text = q.text[:30] + '...' if len(q.text) > 30 else q.text
         keyboard.append([InlineKeyboardButton(
-            f"{status_emoji} {CATEGORIES[q['category']]}: {short_text}",
-            callback_data=f"view_q_{q['id']}"
+            f"{status_emoji} {CATEGORIES[q.category]}: {short_text}",
+            callback_data=f"view_q_{q.id}"
         )])
         
         # Если вопрос отклонен, добавляем кнопку восстановления
-        if q['status'] == 'rejected':
+        if q.status == 'rejected':
             keyboard.append([InlineKeyboardButton(
                 "↩️ Відновити",
-                callback_data=f"restore_{q['id']}"
+                callback_data=f"restore_{q.id}"
             )])
     
     # Добавляем навигационные кнопки
@@ -3,12 +3,12 @@ from telegram.ext import ContextTypes, ConversationHandler
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
-from config import logger, CHOOSING, TYPING_QUESTION, TYPING_CATEGORY, TYPING_REPLY, CATEGORIES, ADMIN_IDS, CHANNEL_ID
-from keyboards import get_main_keyboard, get_admin_menu_keyboard, get_category_keyboard, get_channel_button
-from utils import is_admin, format_question_for_user, handle_admin_question, notify_user_about_answer, generate_help_text
-from database import Database
+from config import logger, CHOOSING, TYPING_QUESTION, TYPING_CATEGORY, TYPING_REPLY, CATEGORIES, ADMIN_IDS, ADMIN_GROUP_ID, CHANNEL_ID
+from keyboards import get_main_keyboard, get_admin_menu_keyboard, get_category_keyboard, get_channel_button, get_questions_list_keyboard
+from utils import is_admin, format_question_for_user, format_stats, handle_admin_question, notify_user_about_answer, generate_help_text
+from database import AsyncDatabase
 
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE, db: Database):
+async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE, db: AsyncDatabase):
     """
     Обработчик всех текстовых сообщений
     
@@ -90,7 +90,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE, db:
         )
         return CHOOSING
 
-async def handle_regular_message(update: Update, context: ContextTypes.DEFAULT_TYPE, db: Database):
+async def handle_regular_message(update: Update, context: ContextTypes.DEFAULT_TYPE, db: AsyncDatabase):
     """
     Обработка обычных текстовых сообщений
     
@@ -114,7 +114,7 @@ async def handle_regular_message(update: Update, context: ContextTypes.DEFAULT_T
             try:
                 question_id = context.user_data.get('answering') or context.user_data.get('editing')
                 answer_text = message_text
-                question = db.get_question(question_id)
+                question = await db.get_question(question_id)
                 is_editing = context.user_data.get('editing')
 
                 # Публикуем ответ в канал
@@ -158,10 +158,10 @@ async def handle_regular_message(update: Update, context: ContextTypes.DEFAULT_T
                 if not is_editing:
                     update_data['answer_message_id'] = message.message_id
                 
-                db.update_question(question_id, update_data)
+                await db.update_question(question_id, update_data)
 
                 # Уведомляем пользователя о ответе
-                await notify_user_about_answer(context, db.get_question(question_id))
+                await notify_user_about_answer(context, await db.get_question(question_id))
 
                 # Очищаем состояние
                 context.user_data.clear()
@@ -190,10 +190,10 @@ async def handle_regular_message(update: Update, context: ContextTypes.DEFAULT_T
                 category = context.user_data['category']
 
                 # Генерируем уникальный ID для вопроса
-                question_id = f"q{len(db.questions) + 1}"
+                question_id = db.next_question_id()
 
-                # Сохраняем вопрос в базе данных
-                db.add_question(question_id, {
+                # Сохраняем вопрос в базе данных; повторная отправка того же вопроса не добавляется
+                stored_id = await db.submit_question(question_id, {
                     'id': question_id,
                     'category': category,
                     'text': message_text,
@@ -203,6 +203,15 @@ async def handle_regular_message(update: Update, context: ContextTypes.DEFAULT_T
                     'user_id': user_id
                 })
 
+                if stored_id != question_id:
+                    context.user_data.clear()
+                    await update.message.reply_text(
+                        "ℹ️ Це питання вже надіслано і очікує на відповідь.",
+                        reply_markup=get_main_keyboard(),
+                        disable_notification=True
+                    )
+                    return CHOOSING
+
                 logger.info(f"Питання збережено з ID {question_id}")
 
                 # Отправляем вопрос в группу администраторов
@@ -259,7 +268,7 @@ async def handle_regular_message(update: Update, context: ContextTypes.DEFAULT_T
         )
         return CHOOSING
 
-async def show_my_questions(update: Update, context: ContextTypes.DEFAULT_TYPE, db: Database):
+async def show_my_questions(update: Update, context: ContextTypes.DEFAULT_TYPE, db: AsyncDatabase):
     """
     Показать вопросы пользователя
     
@@ -273,7 +282,7 @@ async def show_my_questions(update: Update, context: ContextTypes.DEFAULT_TYPE,
     """
     try:
         user_id = update.effective_user.id
-        user_questions = db.get_questions_by_user(user_id)
+        user_questions = await db.get_questions_by_user(user_id)
 
         if not user_questions:
             await update.message.reply_text(
@@ -315,7 +324,7 @@ async def show_my_questions(update: Update, context: ContextTypes.DEFAULT_TYPE,
         )
         return CHOOSING
 
-async def show_my_answers(update: Update, context: ContextTypes.DEFAULT_TYPE, db: Database):
+async def show_my_answers(update: Update, context: ContextTypes.DEFAULT_TYPE, db: AsyncDatabase):
     """
     Показать ответы на вопросы пользователя
     
@@ -329,7 +338,7 @@ async def show_my_answers(update: Update, context: ContextTypes.DEFAULT_TYPE, db
     """
     try:
         user_id = update.effective_user.id
-        answered_questions = [q for q in db.get_questions_by_user(user_id) if q.get('status') == 'answered']
+        answered_questions = await db.get_questions_by_user(user_id, status='answered')
 
         if not answered_questions:
             await update.message.reply_text(
@@ -365,7 +374,7 @@ async def show_my_answers(update: Update, context: ContextTypes.DEFAULT_TYPE, db
         )
         return CHOOSING
 
-async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, db: Database):
+async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, db: AsyncDatabase):
     """
     Обработчик админского меню
     
@@ -405,7 +414,7 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE,
             
         elif text == "📥 Нові питання":
             # Получаем список новых вопросов
-            new_questions = db.get_questions_by_status('pending')
+            new_questions = await db.get_questions_by_status('pending')
             if not new_questions:
                 await update.message.reply_text(
                     "📭 Нових питань немає",
@@ -415,5 +424,114 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE,
                 return CHOOSING
             
             # Сохраняем список вопросов в контексте
-            contex
-(Content truncated due to size limit. Use line ranges to read in chunks)
\ No newline at end of file
+            context.user_data['current_questions'] = new_questions
+            context.user_data['current_page'] = 0
+            
+            await update.message.reply_text(
+                "📥 Нові питання:",
+                reply_markup=get_questions_list_keyboard(new_questions),
+                disable_notification=True
+            )
+            return CHOOSING
+            
+        elif text == "⭐️ Важливі питання":
+            # Получаем список важных вопросов
+            important_questions = db.get_important_questions()
+            if not important_questions:
+                await update.message.reply_text(
+                    "⭐️ Важливих питань немає",
+                    reply_markup=get_admin_menu_keyboard(),
+                    disable_notification=True
+                )
+                return CHOOSING
+            
+            context.user_data['current_questions'] = important_questions
+            context.user_data['current_page'] = 0
+            
+            await update.message.reply_text(
+                "⭐️ Важливі питання:",
+                reply_markup=get_questions_list_keyboard(important_questions),
+                disable_notification=True
+            )
+            return CHOOSING
+            
+        elif text == "✅ Опрацьовані":
+            # Получаем список отвеченных вопросов
+            answered_questions = await db.get_questions_by_status('answered')
+            if not answered_questions:
+                await update.message.reply_text(
+                    "✅ Опрацьованих питань немає",
+                    reply_markup=get_admin_menu_keyboard(),
+                    disable_notification=True
+                )
+                return CHOOSING
+            
+            context.user_data['current_questions'] = answered_questions
+            context.user_data['current_page'] = 0
+            
+            await update.message.reply_text(
+                "✅ Опрацьовані питання:",
+                reply_markup=get_questions_list_keyboard(answered_questions),
+                disable_notification=True
+            )
+            return CHOOSING
+            
+        elif text == "❌ Відхилені":
+            # Получаем список отклоненных вопросов
+            rejected_questions = await db.get_questions_by_status('rejected')
+            if not rejected_questions:
+                await update.message.reply_text(
+                    "❌ Відхилених питань немає",
+                    reply_markup=get_admin_menu_keyboard(),
+                    disable_notification=True
+                )
+                return CHOOSING
+            
+            context.user_data['current_questions'] = rejected_questions
+            context.user_data['current_page'] = 0
+            
+            await update.message.reply_text(
+                "❌ Відхилені питання:",
+                reply_markup=get_questions_list_keyboard(rejected_questions),
+                disable_notification=True
+            )
+            return CHOOSING
+            
+        elif text == "🔄 Змінити відповідь":
+            # Получаем список отвеченных вопросов для изменения
+            answered_questions = await db.get_questions_by_status('answered')
+            if not answered_questions:
+                await update.message.reply_text(
+                    "✅ Немає питань з відповідями для зміни",
+                    reply_markup=get_admin_menu_keyboard(),
+                    disable_notification=True
+                )
+                return CHOOSING
+            
+            context.user_data['current_questions'] = answered_questions
+            context.user_data['current_page'] = 0
+            context.user_data['editing_answer'] = True
+            
+            await update.message.reply_text(
+                "🔄 Оберіть питання для зміни відповіді:",
+                reply_markup=get_questions_list_keyboard(answered_questions),
+                disable_notification=True
+            )
+            return CHOOSING
+            
+        else:
+            await update.message.reply_text(
+                "❗️ Оберіть дію з меню:",
+                reply_markup=get_admin_menu_keyboard(),
+                disable_notification=True
+            )
+            return CHOOSING
+            
+    except Exception as e:
+        logger.error(f"Помилка в адмінському меню: {e}")
+        await update.message.reply_text(
+            "❌ Виникла помилка. Спробуйте пізніше.",
+            reply_markup=get_admin_menu_keyboard(),
+            disable_notification=True
+        )
+        return CHOOSING
@@ -0,0 +1,198 @@
+import sys
+from calendar import timegm
+from datetime import datetime, timedelta
+from typing import Any, Optional, Union
+
+try:
+    # Быстрый доступ к элементу кортежа по атрибуту, как у collections.namedtuple
+    from _collections import _tuplegetter
+except ImportError:
+    def _tuplegetter(index: int, doc: str) -> property:
+        return property(lambda self: tuple.__getitem__(self, index), doc=doc)
+
+# Поля вопроса в порядке колонок таблицы questions
+QUESTION_FIELDS = ('id', 'category', 'text', 'status', 'time', 'important',
+                   'user_id', 'answer', 'answer_time', 'answer_message_id')
+
+# Поля со временем, которые хранятся как микросекунды эпохи
+QUESTION_TIME_FIELDS = ('time', 'answer_time')
+
+# Единиц хранимого времени в секунде: время хранится в микросекундах, как в ISO строке datetime
+TIME_UNIT = 1000000
+
+# Начало эпохи для перевода микросекунд в дату без потери точности
+_EPOCH = datetime(1970, 1, 1)
+
+def encode_time(value: Union[str, int, None]) -> Union[int, str, None]:
+    """
+    Преобразование времени из ISO формата в целое число микросекунд
+
+    Время без часового пояса хранится как показания часов (без пересчета в UTC),
+    поэтому обратное преобразование возвращает ту же строку. Время с часовым поясом
+    хранится строкой без изменений: число не сохранило бы смещение.
+
+    Args:
+        value: Время в ISO формате, число микросекунд или None
+
+    Returns:
+        Число микросекунд; строка, если ее не удалось разобрать или в ней есть часовой пояс; None
+    """
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return value
+    if dt.tzinfo is not None:
+        return value
+    return timegm(dt.timetuple()) * TIME_UNIT + dt.microsecond
+
+def decode_time(value: Union[int, str, None]) -> Optional[str]:
+    """
+    Преобразование времени из числа микросекунд в ISO формат
+
+    Args:
+        value: Число микросекунд, строка или None
+
+    Returns:
+        Время в ISO формате или None
+    """
+    if isinstance(value, int):
+        return (_EPOCH + timedelta(microseconds=value)).isoformat()
+    return value
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Общий объект строки для повторяющихся значений (статус, категория)"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+class Question(tuple):
+    """
+    Вопрос пользователя
+
+    Неизменяемая компактная запись (кортеж значений полей): статус и категория хранятся
+    как общие (интернированные) строки, время - как целое число микросекунд. Изменение
+    создает новую запись (replace), поэтому вопрос, полученный из базы, можно читать
+    и передавать между потоками без блокировок. Для совместимости с кодом, работавшим
+    со словарями, поддерживается доступ question['field'] и question.get('field'),
+    при котором время возвращается в ISO формате.
+    """
+    __slots__ = ()
+
+    def __new__(cls, id: str, category: str, text: str, status: str, time: Union[str, int],
+                important: bool = False, user_id: int = 0, answer: Optional[str] = None,
+                answer_time: Union[str, int, None] = None, answer_message_id: Optional[int] = None):
+        """
+        Создание вопроса
+
+        Args:
+            id: Уникальный идентификатор вопроса
+            category: Категория вопроса
+            text: Текст вопроса
+            status: Статус вопроса ('pending', 'answered', 'rejected')
+            time: Время создания (ISO формат или микросекунды)
+            important: Признак важного вопроса
+            user_id: ID пользователя
+            answer: Текст ответа
+            answer_time: Время ответа (ISO формат или микросекунды)
+            answer_message_id: ID сообщения с ответом в канале
+        """
+        return tuple.__new__(cls, (id, _intern(category), text, _intern(status), encode_time(time),
+                                   bool(important), user_id, answer, encode_time(answer_time),
+                                   answer_message_id))
+
+    def __getnewargs__(self) -> tuple:
+        return tuple(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Question':
+        """
+        Создание вопроса из словаря (JSON, строка SQLite, данные обработчиков)
+
+        Args:
+            data: Данные вопроса
+
+        Returns:
+            Вопрос
+        """
+        return cls(**{field: data[field] for field in QUESTION_FIELDS if field in data})
+
+    def to_dict(self) -> dict:
+        """
+        Преобразование вопроса в словарь для JSON
+
+        Returns:
+            Данные вопроса со временем в ISO формате
+        """
+        return {field: self[field] for field in QUESTION_FIELDS}
+
+    def replace(self, data: dict) -> 'Question':
+        """
+        Новый вопрос с измененными полями (сам вопрос не изменяется)
+
+        Args:
+            data: Новые значения полей
+
+        Returns:
+            Измененная копия вопроса
+        """
+        values = list(self)
+        for field, value in data.items():
+            if field in ('category', 'status'):
+                value = _intern(value)
+            elif field in QUESTION_TIME_FIELDS:
+                value = encode_time(value)
+            elif field == 'important':
+                value = bool(value)
+            elif field not in QUESTION_FIELDS:
+                raise KeyError(field)
+            values[FIELD_INDEX[field]] = value
+        return tuple.__new__(Question, values)
+
+    @classmethod
+    def from_tuple(cls, values: tuple) -> 'Question':
+        """
+        Создание вопроса из значений полей в хранимом виде (порядок QUESTION_FIELDS)
+
+        Значения не преобразуются, поэтому время должно быть уже в микросекундах.
+
+        Args:
+            values: Значения полей
+
+        Returns:
+            Вопрос
+        """
+        return tuple.__new__(cls, values)
+
+    def as_tuple(self) -> tuple:
+        """Значения полей в хранимом виде в порядке QUESTION_FIELDS"""
+        return tuple(self)
+
+    def copy(self) -> 'Question':
+        """Копия вопроса (вопрос неизменяем, поэтому копией служит он сам)"""
+        return self
+
+    def __getitem__(self, field: str) -> Any:
+        index = FIELD_INDEX.get(field) if isinstance(field, str) else None
+        if index is None:
+            raise KeyError(field)
+        value = tuple.__getitem__(self, index)
+        if field in QUESTION_TIME_FIELDS:
+            return decode_time(value)
+        return value
+
+    def get(self, field: str, default: Any = None) -> Any:
+        """Значение поля как у dict.get; незаполненное поле (None) считается отсутствующим"""
+        value = self[field] if field in FIELD_INDEX else None
+        return default if value is None else value
+
+    def __contains__(self, field: str) -> bool:
+        return field in FIELD_INDEX
+
+    def __repr__(self) -> str:
+        return f"Question(id={self.id!r}, status={self.status!r}, category={self.category!r})"
+
+# Номер поля в записи вопроса и доступ к полю как к атрибуту (question.status)
+FIELD_INDEX = {field: index for index, field in enumerate(QUESTION_FIELDS)}
+for _field, _index in FIELD_INDEX.items():
+    setattr(Question, _field, _tuplegetter(_index, f"Поле {_field}"))
+del _field, _index
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+from typing import List, NamedTuple, Union
+
+from config import logger
+from database import Database, DatabaseException, RETENTION_ACTIONS, RETENTION_BATCH
+from sharding import ShardedDatabase
+
+class RetentionRule(NamedTuple):
+    """Правило политики хранения: действие с вопросами статуса через указанное количество дней"""
+    status: str
+    days: int
+    action: str
+
+def parse_retention_rules(value: str) -> List[RetentionRule]:
+    """
+    Разбор правил политики хранения из строки настроек
+
+    Args:
+        value: Правила 'статус:дни:действие' через запятую, например 'rejected:90:delete'
+
+    Returns:
+        Список правил
+    """
+    rules = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            status, days, action = item.split(':')
+            rule = RetentionRule(status.strip(), int(days), action.strip())
+        except ValueError:
+            raise DatabaseException(f"Некорректное правило политики хранения: {item}")
+        if rule.action not in RETENTION_ACTIONS or rule.days < 0:
+            raise DatabaseException(f"Некорректное правило политики хранения: {item}")
+        rules.append(rule)
+    return rules
+
+class RetentionPolicy:
+    """
+    Политика хранения по расписанию: удаление давно закрытых вопросов
+    или ID пользователя в них, чтобы база не росла бесконечно
+
+    Правила применяются по очереди пачками (см. Database.purge), поэтому
+    обработка вопросов бота во время применения не останавливается.
+    """
+    def __init__(self, db: Union[Database, ShardedDatabase], rules: List[RetentionRule],
+                 batch_size: int = RETENTION_BATCH):
+        """
+        Инициализация политики хранения
+
+        Args:
+            db: База данных
+            rules: Правила политики хранения
+            batch_size: Вопросов, сохраняемых одной записью
+        """
+        self.db = db
+        self.rules = rules
+        self.batch_size = batch_size
+        self._lock = threading.Lock()  # Одновременно выполняется только одно применение
+
+    async def job(self, context) -> None:
+        """Задача очереди заданий бота: применение политики вне цикла событий"""
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.run)
+        except Exception as e:
+            logger.error(f"Ошибка при применении политики хранения по расписанию: {e}")
+
+    def run(self) -> List[str]:
+        """
+        Применение всех правил
+
+        Returns:
+            ID удаленных или обезличенных вопросов
+        """
+        with self._lock:
+            purged = []
+            for rule in self.rules:
+                purged.extend(self.db.purge(rule.status, rule.days, rule.action, self.batch_size))
+            logger.info(f"Политика хранения применена, изменено вопросов: {len(purged)}")
+            return purged
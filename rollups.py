@@ -0,0 +1,214 @@
+import time
+import bisect
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models import Question, decode_time, encode_time, TIME_UNIT
+
+# Периоды агрегатов и их длительность в секундах
+ROLLUP_PERIODS = {'hour': 3600, 'day': 86400}
+# Сколько дней хранятся почасовые агрегаты (дневные хранятся всегда)
+ROLLUP_HOURLY_RETENTION_DAYS = 30
+# Границы интервалов гистограммы времени ответа в секундах: до 1 ч, 6 ч, 1 дня, 3 дней, 7 дней и дольше
+LATENCY_BOUNDS = (3600, 6 * 3600, 86400, 3 * 86400, 7 * 86400)
+
+# Показатели агрегата: вопросы, заданные за период, по текущему статусу;
+# ответы, данные за период; гистограмма и сумма времени ответа
+METRIC_ASKED = 'asked:'
+METRIC_ANSWERED = 'answered'
+METRIC_LATENCY = 'latency:'
+METRIC_LATENCY_SUM = 'latency_sum'
+
+# Ключ агрегата: (период, начало интервала в секундах, категория, показатель)
+RollupKey = Tuple[str, int, str, str]
+
+class Rollups:
+    """
+    Агрегаты активности по часам и дням в разрезе категорий
+
+    Вопрос вносит в агрегаты вклад: заданный вопрос с его статусом - в интервал
+    времени создания, ответ и время ответа - в интервал времени ответа. Изменение
+    вопроса вычитает вклад старой версии и добавляет вклад новой, поэтому агрегаты
+    обновляются без просмотра вопросов, а повторное применение изменения ничего не удваивает.
+    Агрегаты не потокобезопасны, вызовы защищает владелец (Database.lock).
+    """
+    def __init__(self, hourly_retention_days: int = ROLLUP_HOURLY_RETENTION_DAYS):
+        """
+        Создание пустых агрегатов
+
+        Args:
+            hourly_retention_days: Сколько дней хранить почасовые агрегаты
+        """
+        self.hourly_retention_days = hourly_retention_days
+        self.cells: Dict[RollupKey, int] = {}
+        self._pruned_at = 0.0  # Время последнего удаления устаревших почасовых агрегатов
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    @staticmethod
+    def contributions(question: Optional[Question]) -> Dict[RollupKey, int]:
+        """
+        Вклад вопроса в агрегаты
+
+        Args:
+            question: Вопрос (None - вопроса нет)
+
+        Returns:
+            Приращения агрегатов
+        """
+        result = {}
+        if question is None or not isinstance(question.time, int):
+            return result
+        category = question.category
+        # Агрегаты считаются в секундах, вопрос хранит время в микросекундах
+        created = question.time // TIME_UNIT
+        answer_time = question.answer_time
+        answered = question.status == 'answered' and isinstance(answer_time, int)
+        if answered:
+            answer_time //= TIME_UNIT
+            latency = max(answer_time - created, 0)
+            latency_metric = f"{METRIC_LATENCY}{bisect.bisect_left(LATENCY_BOUNDS, latency)}"
+        for period, length in ROLLUP_PERIODS.items():
+            result[(period, created - created % length, category,
+                    f"{METRIC_ASKED}{question.status}")] = 1
+            if answered:
+                bucket = answer_time - answer_time % length
+                result[(period, bucket, category, METRIC_ANSWERED)] = 1
+                result[(period, bucket, category, latency_metric)] = 1
+                result[(period, bucket, category, METRIC_LATENCY_SUM)] = latency
+        return result
+
+    def _hourly_cutoff(self) -> int:
+        """Начало самого старого хранимого почасового интервала"""
+        # Время вопросов - показания часов без часового пояса, граница считается так же
+        return encode_time(datetime.now().isoformat()) // TIME_UNIT - self.hourly_retention_days * 86400
+
+    def apply(self, old_question: Optional[Question], question: Optional[Question]) -> Dict[RollupKey, int]:
+        """
+        Замена вклада старой версии вопроса вкладом новой
+
+        Args:
+            old_question: Вопрос до изменения (None - новый вопрос)
+            question: Вопрос после изменения (None - вопрос удален)
+
+        Returns:
+            Примененные приращения агрегатов
+        """
+        deltas = self.contributions(question)
+        for key, value in self.contributions(old_question).items():
+            deltas[key] = deltas.get(key, 0) - value
+        cutoff = self._hourly_cutoff()
+        deltas = {key: value for key, value in deltas.items()
+                  if value and (key[0] != 'hour' or key[1] >= cutoff)}
+        self.add(deltas)
+        if time.time() - self._pruned_at > 3600:
+            self.prune()
+        return deltas
+
+    def add(self, deltas: Dict[RollupKey, int]) -> None:
+        """
+        Прибавление приращений к агрегатам
+
+        Args:
+            deltas: Приращения агрегатов
+        """
+        cells = self.cells
+        for key, value in deltas.items():
+            value += cells.get(key, 0)
+            if value:
+                cells[key] = value
+            else:
+                cells.pop(key, None)
+
+    def prune(self) -> int:
+        """
+        Удаление почасовых агрегатов старше срока хранения
+
+        Returns:
+            Количество удаленных агрегатов
+        """
+        cutoff = self._hourly_cutoff()
+        expired = [key for key in self.cells if key[0] == 'hour' and key[1] < cutoff]
+        for key in expired:
+            del self.cells[key]
+        self._pruned_at = time.time()
+        return len(expired)
+
+    def rebuild(self, questions: Iterable[Question]) -> None:
+        """
+        Построение агрегатов заново по всем вопросам
+
+        Args:
+            questions: Вопросы
+        """
+        self.cells = {}
+        for question in questions:
+            self.add(self.contributions(question))
+        self.prune()
+
+    def rows(self) -> List[Tuple[str, int, str, str, int]]:
+        """Агрегаты в виде строк (период, интервал, категория, показатель, значение) для сохранения"""
+        return [(*key, value) for key, value in self.cells.items()]
+
+    def load(self, rows: Iterable[Iterable]) -> None:
+        """
+        Загрузка сохраненных агрегатов
+
+        Args:
+            rows: Строки (период, интервал, категория, показатель, значение)
+        """
+        self.cells = {}
+        for period, bucket, category, metric, value in rows:
+            if value:
+                self.cells[(period, bucket, category, metric)] = value
+        self.prune()
+
+    def query(self, period: str = 'day', start: Optional[str] = None, end: Optional[str] = None,
+              category: Optional[str] = None) -> List[dict]:
+        """
+        Активность по интервалам
+
+        Args:
+            period: Период агрегатов ('hour' или 'day')
+            start: Начало в ISO формате включительно (None - с первого интервала)
+            end: Конец в ISO формате не включительно (None - до последнего интервала)
+            category: Категория (None - все категории вместе)
+
+        Returns:
+            Интервалы по возрастанию времени: начало ('bucket'), заданные вопросы ('asked')
+            и их текущие статусы ('statuses'), ответы ('answered'), гистограмма времени
+            ответа ('latency', интервалы по LATENCY_BOUNDS) и среднее время ответа в секундах
+        """
+        if period not in ROLLUP_PERIODS:
+            raise ValueError(f"Неизвестный период агрегатов: {period}")
+        start_time = encode_time(start) // TIME_UNIT if start is not None else None
+        end_time = encode_time(end) // TIME_UNIT if end is not None else None
+        buckets: Dict[int, dict] = {}
+        for (cell_period, bucket, cell_category, metric), value in self.cells.items():
+            if cell_period != period or (category is not None and cell_category != category):
+                continue
+            if (start_time is not None and bucket < start_time) or (end_time is not None and bucket >= end_time):
+                continue
+            row = buckets.get(bucket)
+            if row is None:
+                row = buckets[bucket] = {'asked': 0, 'statuses': {}, 'answered': 0,
+                                         'latency': [0] * (len(LATENCY_BOUNDS) + 1), 'latency_sum': 0}
+            if metric.startswith(METRIC_ASKED):
+                status = metric[len(METRIC_ASKED):]
+                row['asked'] += value
+                row['statuses'][status] = row['statuses'].get(status, 0) + value
+            elif metric == METRIC_ANSWERED:
+                row['answered'] += value
+            elif metric == METRIC_LATENCY_SUM:
+                row['latency_sum'] += value
+            elif metric.startswith(METRIC_LATENCY):
+                row['latency'][int(metric[len(METRIC_LATENCY):])] += value
+
+        result = []
+        for bucket in sorted(buckets):
+            row = buckets[bucket]
+            latency_sum = row.pop('latency_sum')
+            row['avg_latency'] = latency_sum / row['answered'] if row['answered'] else None
+            result.append({'bucket': decode_time(bucket * TIME_UNIT), **row})
+        return result
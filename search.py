@@ -0,0 +1,225 @@
+import re
+import math
+import heapq
+import bisect
+import functools
+from typing import Dict, List, Optional, Tuple
+
+# Слова: буквы и цифры, апостроф внутри слова (з'явиться, п'ять) не разделяет слово
+TOKEN_RE = re.compile(r"\w+(?:'\w+)*")
+# Варианты апострофа, которые встречаются в украинских текстах
+APOSTROPHES = str.maketrans({'’': "'", 'ʼ': "'", '`': "'", '‘': "'"})
+# Знаки ударения и апостроф удаляются из слова, ґ заменяется на г
+TOKEN_CHARS = str.maketrans({'\u0301': None, '\u0300': None, "'": None, 'ґ': 'г'})
+# Окончания, которые отбрасываются при нормализации
+UKRAINIAN_SUFFIXES = frozenset((
+    'ування', 'ювання', 'ання', 'яння', 'ення', 'іння', 'ість', 'ості', 'істю',
+    'ами', 'ями', 'ові', 'еві', 'єві', 'ого', 'ому', 'ими', 'іми', 'ися', 'ись', 'ться',
+    'ий', 'ій', 'ої', 'ою', 'ею', 'єю', 'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ів', 'їв', 'их', 'іх',
+    'ся', 'сь', 'а', 'я', 'у', 'ю', 'і', 'ї', 'и', 'е', 'є', 'о', 'ь',
+))
+SUFFIX_LENGTHS = sorted({len(suffix) for suffix in UKRAINIAN_SUFFIXES}, reverse=True)
+# Минимальная длина основы после отбрасывания окончания
+MIN_STEM_LENGTH = 3
+
+@functools.lru_cache(maxsize=65536)
+def normalize_token(token: str) -> str:
+    """
+    Нормализация слова с учетом украинской орфографии
+
+    Приводит к нижнему регистру, убирает ударения и апострофы, заменяет ґ на г
+    и отбрасывает окончание, если основа остается не короче MIN_STEM_LENGTH.
+
+    Args:
+        token: Слово
+
+    Returns:
+        Нормализованная основа слова
+    """
+    token = token.lower().translate(TOKEN_CHARS)
+    # Отбрасывается самое длинное подходящее окончание
+    for length in SUFFIX_LENGTHS:
+        if len(token) - length >= MIN_STEM_LENGTH and token[-length:] in UKRAINIAN_SUFFIXES:
+            return token[:-length]
+    return token
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Разбиение текста на нормализованные слова
+
+    Args:
+        text: Текст (None - пустой текст)
+
+    Returns:
+        Список нормализованных слов в порядке появления
+    """
+    if not text:
+        return []
+    return [normalize_token(token) for token in TOKEN_RE.findall(text.translate(APOSTROPHES))]
+
+def canonical_text(text: Optional[str]) -> str:
+    """
+    Текст для сравнения отправок: слова в нижнем регистре через один пробел, без знаков
+    препинания; окончания не отбрасываются, чтобы разные вопросы не совпадали
+
+    Args:
+        text: Текст (None - пустой текст)
+
+    Returns:
+        Слова через пробел; пустая строка, если в тексте нет слов
+    """
+    if not text:
+        return ''
+    return ' '.join(TOKEN_RE.findall(text.translate(APOSTROPHES).lower()))
+
+class InvertedIndex:
+    """
+    Инвертированный индекс по тексту вопроса и ответа
+
+    Для каждого слова хранится список вопросов с частотой слова, для каждого
+    вопроса - его слова, чтобы изменение вопроса обновляло только его записи.
+    Поиск по началу слов использует отсортированный словарь, ранжирование - BM25,
+    где слова из текста вопроса учитываются с большим весом, чем слова из ответа.
+    Индекс не потокобезопасен, вызовы защищает владелец (Database._search_lock).
+    """
+    def __init__(self, text_weight: float = 2.0, answer_weight: float = 1.0, k1: float = 1.2, b: float = 0.75):
+        """
+        Создание пустого индекса
+
+        Args:
+            text_weight: Вес слова из текста вопроса
+            answer_weight: Вес слова из ответа
+            k1: Насыщение частоты слова в BM25
+            b: Нормализация по длине документа в BM25
+        """
+        self.text_weight = text_weight
+        self.answer_weight = answer_weight
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, float]] = {}  # Слово -> {ID вопроса: взвешенная частота}
+        self._terms: Dict[str, Dict[str, float]] = {}  # ID вопроса -> {слово: взвешенная частота}
+        self._lengths: Dict[str, float] = {}  # ID вопроса -> взвешенная длина
+        self._total_length = 0.0
+        self._vocabulary: List[str] = []  # Отсортированные слова для поиска по началу слова
+        self._order: Dict[str, int] = {}  # Порядок добавления для равных оценок
+        self._next_order = 0
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._terms
+
+    def add(self, doc_id: str, text: Optional[str], answer: Optional[str] = None) -> None:
+        """
+        Добавление или замена вопроса в индексе
+
+        Args:
+            doc_id: ID вопроса
+            text: Текст вопроса
+            answer: Текст ответа
+        """
+        self.remove(doc_id, keep_order=True)
+        terms: Dict[str, float] = {}
+        for term in tokenize(text):
+            terms[term] = terms.get(term, 0.0) + self.text_weight
+        for term in tokenize(answer):
+            terms[term] = terms.get(term, 0.0) + self.answer_weight
+
+        for term, frequency in terms.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                bisect.insort(self._vocabulary, term)
+            posting[doc_id] = frequency
+        length = sum(terms.values())
+        self._terms[doc_id] = terms
+        self._lengths[doc_id] = length
+        self._total_length += length
+        if doc_id not in self._order:
+            self._order[doc_id] = self._next_order
+            self._next_order += 1
+
+    def remove(self, doc_id: str, keep_order: bool = False) -> None:
+        """
+        Удаление вопроса из индекса
+
+        Args:
+            doc_id: ID вопроса
+            keep_order: Сохранить порядок добавления (при замене вопроса)
+        """
+        terms = self._terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self._postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self._postings[term]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, term)]
+        self._total_length -= self._lengths.pop(doc_id)
+        if not keep_order:
+            self._order.pop(doc_id, None)
+
+    def _expand(self, prefix: str) -> List[str]:
+        """Слова словаря, начинающиеся с prefix"""
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + '\U0010ffff', start)
+        return self._vocabulary[start:end]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Поиск вопросов, содержащих все слова запроса (каждое - как начало слова)
+
+        Args:
+            query: Строка поиска
+            limit: Максимальное количество результатов (None - все)
+
+        Returns:
+            Пары (ID вопроса, оценка BM25) от более релевантных к менее
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self._terms:
+            return []
+
+        # Для каждого слова запроса: подходящие слова словаря и вопросы, где они есть
+        expanded = []
+        for term in terms:
+            words = self._expand(term)
+            if not words:
+                return []
+            docs = set()
+            for word in words:
+                docs.update(self._postings[word])
+            expanded.append((words, docs))
+
+        # Пересечение начинается с самого короткого списка
+        expanded.sort(key=lambda item: len(item[1]))
+        candidates = set(expanded[0][1])
+        for _, docs in expanded[1:]:
+            candidates &= docs
+            if not candidates:
+                return []
+
+        count = len(self._terms)
+        average = self._total_length / count
+        k1, lengths = self.k1, self._lengths
+        base = k1 * (1 - self.b)
+        scale = k1 * self.b / average if average else 0.0
+        scores = dict.fromkeys(candidates, 0.0)
+        for words, _ in expanded:
+            for word in words:
+                posting = self._postings[word]
+                idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5)) * (k1 + 1)
+                if len(posting) <= len(candidates):
+                    matches = ((doc_id, frequency) for doc_id, frequency in posting.items() if doc_id in candidates)
+                else:
+                    matches = ((doc_id, posting[doc_id]) for doc_id in candidates if doc_id in posting)
+                for doc_id, frequency in matches:
+                    scores[doc_id] += idf * frequency / (frequency + base + scale * lengths[doc_id])
+
+        order = self._order
+        key = lambda item: (item[1], order[item[0]])
+        if limit is None:
+            return sorted(scores.items(), key=key, reverse=True)
+        return heapq.nlargest(limit, scores.items(), key=key)
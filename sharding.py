@@ -0,0 +1,382 @@
+import os
+import zlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+from config import logger
+from database import (Database, DatabaseException, QUESTION_ID_PREFIX, RETENTION_BATCH, RETENTION_DELETE,
+                      encode_base36, parse_question_seq, freeze_stats)
+from models import Question
+from rollups import Rollups
+
+# Сколько последних маршрутов вопросов помнить; часть остальных находится по первичному ключу
+ROUTE_CACHE_SIZE = 10000
+
+class ShardedDatabase:
+    """
+    Хранилище, разделенное на несколько SQLite файлов по хешу user_id
+
+    Каждая часть - отдельная база SQLite со своим файлом, соединением и блокировками,
+    поэтому вопросы разных пользователей добавляются и изменяются параллельно.
+    Списки вопросов, поиск и статистика собираются из всех частей.
+    """
+    db_type = 'sharded'
+
+    def __init__(self, shard_count: int = 4, sqlite_file: str = 'bot.db', **options):
+        """
+        Открытие частей хранилища
+
+        Args:
+            shard_count: Количество частей
+            sqlite_file: Базовое имя файла; части хранятся в файлах <имя>.shard<N><расширение>
+            options: Параметры Database для каждой части (sqlite_synchronous, sqlite_lazy и т.д.)
+        """
+        if shard_count < 1:
+            raise DatabaseException(f"Некорректное количество частей хранилища: {shard_count}")
+        self.shard_count = shard_count
+        self.sqlite_file = sqlite_file
+        base, extension = os.path.splitext(sqlite_file)
+        self.shards = [Database(db_type='sqlite', sqlite_file=f"{base}.shard{index}{extension}", **options)
+                       for index in range(shard_count)]
+
+        # Части недавно использованных вопросов (LRU не больше ROUTE_CACHE_SIZE); нужны для изменений
+        # и чтения по ID, при промахе часть находится запросом по первичному ключу (см. _locate)
+        self._routes: 'OrderedDict[str, int]' = OrderedDict()
+        self._routes_lock = threading.Lock()
+        self._id_lock = threading.Lock()  # Выдача ID, общая для всех частей
+        # Последовательность каждой части сохраняется вместе с ее вопросами, поэтому
+        # новые ID не совпадают с существующими
+        self._next_seq = max(shard._next_seq for shard in self.shards)
+        logger.info(f"Открыто хранилище из {shard_count} частей, "
+                    f"вопросов: {self.get_stats()['total_questions']}")
+
+    def user_shard(self, user_id: int) -> int:
+        """Номер части, в которой хранятся вопросы пользователя"""
+        return zlib.crc32(str(user_id).encode('utf-8')) % self.shard_count
+
+    def shard_index(self, question_id: str, question_data: Optional[dict] = None) -> int:
+        """
+        Номер части хранилища, в которой хранится вопрос
+
+        Args:
+            question_id: ID вопроса
+            question_data: Данные добавляемого вопроса
+
+        Returns:
+            Номер части; новый вопрос попадает в часть своего пользователя
+        """
+        index = self._locate(question_id)
+        if index is not None:
+            return index
+        if question_data is not None:
+            return self.user_shard(question_data.get('user_id', 0))
+        return 0
+
+    def next_question_id(self) -> str:
+        """
+        Выдача нового уникального ID вопроса, общего для всех частей
+
+        Returns:
+            ID вида 'q' + base36-номер
+        """
+        with self._id_lock:
+            question_id = f"{QUESTION_ID_PREFIX}{encode_base36(self._next_seq)}"
+            self._next_seq += 1
+        return question_id
+
+    def _locate(self, question_id: str) -> Optional[int]:
+        """
+        Номер части, в которой хранится вопрос: из кеша маршрутов или поиском по частям
+
+        Args:
+            question_id: ID вопроса
+
+        Returns:
+            Номер части или None, если вопроса нет ни в одной части
+        """
+        with self._routes_lock:
+            index = self._routes.get(question_id)
+            if index is not None:
+                self._routes.move_to_end(question_id)
+                return index
+        for index, shard in enumerate(self.shards):
+            if shard.has_question(question_id):
+                self._remember(question_id, index)
+                return index
+        return None
+
+    def _remember(self, question_id: str, index: int) -> None:
+        """Запоминание части вопроса с вытеснением давно не использованных маршрутов"""
+        with self._routes_lock:
+            self._routes[question_id] = index
+            self._routes.move_to_end(question_id)
+            if len(self._routes) > ROUTE_CACHE_SIZE:
+                self._routes.popitem(last=False)
+
+    def _forget(self, question_id: str) -> None:
+        """Удаление маршрута удаленного вопроса"""
+        with self._routes_lock:
+            self._routes.pop(question_id, None)
+
+    def add_question(self, question_id: str, question_data: dict) -> None:
+        """
+        Добавление нового вопроса в часть его пользователя
+
+        Args:
+            question_id: Уникальный идентификатор вопроса
+            question_data: Данные вопроса
+        """
+        index = self.shard_index(question_id, question_data)
+        self.shards[index].add_question(question_id, question_data)
+        self._route(question_id, index)
+
+    def submit_question(self, question_id: str, question_data: dict) -> str:
+        """
+        Добавление вопроса без повторных отправок (см. Database.submit_question)
+
+        Вопросы пользователя хранятся в одной части, поэтому повторная отправка ищется только в ней.
+
+        Args:
+            question_id: ID нового вопроса
+            question_data: Данные вопроса
+
+        Returns:
+            question_id, если вопрос добавлен, иначе ID ранее заданного такого же вопроса
+        """
+        index = self.shard_index(question_id, question_data)
+        stored_id = self.shards[index].submit_question(question_id, question_data)
+        if stored_id == question_id:
+            self._route(question_id, index)
+        return stored_id
+
+    def _route(self, question_id: str, index: int) -> None:
+        """Запоминание части добавленного вопроса и продвижение общей последовательности ID"""
+        self._remember(question_id, index)
+        seq = parse_question_seq(question_id)
+        if seq is not None:
+            with self._id_lock:
+                if seq >= self._next_seq:
+                    self._next_seq = seq + 1
+
+    def update_question(self, question_id: str, update_data: dict) -> None:
+        """
+        Обновление данных вопроса в его части
+
+        Args:
+            question_id: Уникальный идентификатор вопроса
+            update_data: Данные для обновления
+        """
+        index = self._locate(question_id)
+        if index is None:
+            logger.warning(f"Попытка обновить несуществующий вопрос: {question_id}")
+            return
+        self.shards[index].update_question(question_id, update_data)
+
+    def delete_question(self, question_id: str) -> None:
+        """
+        Удаление вопроса из его части
+
+        Args:
+            question_id: Уникальный идентификатор вопроса
+        """
+        index = self._locate(question_id)
+        if index is None:
+            logger.warning(f"Попытка удалить несуществующий вопрос: {question_id}")
+            return
+        self.shards[index].delete_question(question_id)
+        self._forget(question_id)
+
+    def purge(self, status: str, days: int, action: str = RETENTION_DELETE,
+              batch_size: int = RETENTION_BATCH) -> List[str]:
+        """
+        Политика хранения во всех частях по очереди (см. Database.purge)
+
+        Args:
+            status: Статус вопросов
+            days: Через сколько дней применяется действие
+            action: RETENTION_DELETE - удалить вопрос, RETENTION_ANONYMIZE - удалить ID пользователя
+            batch_size: Вопросов в пачке
+
+        Returns:
+            ID удаленных или обезличенных вопросов
+        """
+        purged = []
+        for shard in self.shards:
+            purged.extend(shard.purge(status, days, action, batch_size))
+        if action == RETENTION_DELETE:
+            for question_id in purged:
+                self._forget(question_id)
+        return purged
+
+    def get_question(self, question_id: str) -> Union[Question, dict]:
+        """
+        Получение данных вопроса
+
+        Args:
+            question_id: Уникальный идентификатор вопроса
+
+        Returns:
+            Данные вопроса или пустой словарь, если вопрос не найден
+        """
+        index = self._locate(question_id)
+        if index is None:
+            return {}
+        return self.shards[index].get_question(question_id)
+
+    @staticmethod
+    def _merge(lists: List[List[Question]]) -> List[Question]:
+        """Объединение списков частей в порядке выдачи ID"""
+        questions = [question for part in lists for question in part]
+        questions.sort(key=lambda question: parse_question_seq(question.id) or 0)
+        return questions
+
+    def get_questions_by_status(self, status: str, limit: Optional[int] = None,
+                                offset: int = 0) -> List[Question]:
+        """
+        Получение списка вопросов по статусу из всех частей
+
+        Args:
+            status: Статус вопросов
+            limit: Максимальное количество вопросов (None - все)
+            offset: Сколько вопросов пропустить
+
+        Returns:
+            Список вопросов с указанным статусом
+        """
+        # Страница объединения - среди первых offset + limit вопросов каждой части
+        end = None if limit is None else offset + limit
+        return self._merge([shard.get_questions_by_status(status, end) for shard in self.shards])[offset:end]
+
+    def get_questions_by_user(self, user_id: int, status: Optional[str] = None,
+                              limit: Optional[int] = None, offset: int = 0) -> List[Question]:
+        """
+        Получение списка вопросов пользователя (читается только его часть)
+
+        Args:
+            user_id: ID пользователя
+            status: Статус вопросов (None - все вопросы пользователя)
+            limit: Максимальное количество вопросов (None - все)
+            offset: Сколько вопросов пропустить
+
+        Returns:
+            Список вопросов пользователя
+        """
+        return self.shards[self.user_shard(user_id)].get_questions_by_user(user_id, status, limit, offset)
+
+    def get_important_questions(self) -> List[Question]:
+        """
+        Получение списка важных вопросов из всех частей
+
+        Returns:
+            Список важных вопросов
+        """
+        return self._merge([shard.get_important_questions() for shard in self.shards])
+
+    def search(self, query: str, limit: int = 50, offset: int = 0) -> List[Question]:
+        """
+        Полнотекстовый поиск по всем частям (см. Database.search)
+
+        Args:
+            query: Строка поиска
+            limit: Максимальное количество результатов
+            offset: Сколько результатов пропустить
+
+        Returns:
+            Список найденных вопросов
+        """
+        return [question for question, _ in self.search_ranked(query, limit, offset)]
+
+    def search_ranked(self, query: str, limit: int = 50, offset: int = 0) -> List[Tuple[Question, float]]:
+        """
+        Поиск с оценками: из каждой части берутся лучшие результаты и объединяются по оценке
+
+        Args:
+            query: Строка поиска
+            limit: Максимальное количество результатов
+            offset: Сколько результатов пропустить
+
+        Returns:
+            Пары (вопрос, оценка), большая оценка - более релевантный вопрос
+        """
+        ranked = [item for shard in self.shards for item in shard.search_ranked(query, offset + limit)]
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked[offset:offset + limit]
+
+    def _merged_counts(self) -> Dict[Tuple[str, str, bool], int]:
+        """Сумма счетчиков ячеек всех частей"""
+        counts = {}
+        for shard in self.shards:
+            for cell, count in shard.stats_snapshot().counts.items():
+                counts[cell] = counts.get(cell, 0) + count
+        return counts
+
+    @property
+    def stats(self) -> Mapping[str, Any]:
+        """Статистика в формате, который используют обработчики"""
+        return self.get_stats()
+
+    def get_stats(self) -> Mapping[str, Any]:
+        """
+        Получение статистики по снимкам всех частей
+
+        Returns:
+            Статистика использования бота (только для чтения)
+        """
+        return freeze_stats(Database._stats_from_counts(self._merged_counts()))
+
+    def get_rollups(self, period: str = 'day', start: Optional[str] = None, end: Optional[str] = None,
+                    category: Optional[str] = None) -> List[dict]:
+        """
+        Активность по часам или дням, агрегаты частей суммируются (см. Database.get_rollups)
+
+        Args:
+            period: Период агрегатов ('hour' или 'day')
+            start: Начало в ISO формате включительно (None - с первого интервала)
+            end: Конец в ISO формате не включительно (None - до последнего интервала)
+            category: Категория (None - все категории вместе)
+
+        Returns:
+            Интервалы по возрастанию времени с количеством вопросов, ответов и временем ответа
+        """
+        rollups = Rollups()
+        for shard in self.shards:
+            rollups.add(shard.rollup_cells())
+        return rollups.query(period, start, end, category)
+
+    def count_questions(self, status: Optional[str] = None, category: Optional[str] = None,
+                        important: Optional[bool] = None) -> int:
+        """Количество вопросов по фильтру во всех частях (см. Database.count_questions)"""
+        return sum(shard.count_questions(status, category, important) for shard in self.shards)
+
+    def reconcile_stats(self) -> Dict[Tuple[str, str, bool], Tuple[int, int]]:
+        """
+        Сверка счетчиков каждой части
+
+        Returns:
+            Расхождения в виде {ячейка: (значение счетчиков, фактическое значение)}, суммированные по частям
+        """
+        mismatches = {}
+        for shard in self.shards:
+            for cell, (counted, actual) in shard.reconcile_stats().items():
+                total_counted, total_actual = mismatches.get(cell, (0, 0))
+                mismatches[cell] = (total_counted + counted, total_actual + actual)
+        return mismatches
+
+    def take_changed_ids(self) -> List[str]:
+        """ID вопросов, измененных во всех частях после предыдущего вызова"""
+        return [question_id for shard in self.shards for question_id in shard.take_changed_ids()]
+
+    def flush(self) -> None:
+        """Сохранение изменений всех частей"""
+        for shard in self.shards:
+            shard.flush()
+
+    def compact(self) -> None:
+        """Сжатие журнала не требуется: части хранятся в SQLite"""
+        return
+
+    def close(self) -> None:
+        """Закрытие всех частей с сохранением изменений"""
+        for shard in self.shards:
+            shard.close()
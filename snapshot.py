@@ -0,0 +1,44 @@
+import os
+import argparse
+
+from config import logger
+from database import Database, read_binary_snapshot
+
+def export_json(snapshot_file: str, json_file: str) -> int:
+    """
+    Экспорт двоичного снимка в JSON файл базы данных
+
+    Args:
+        snapshot_file: Путь к двоичному снимку
+        json_file: Путь к создаваемому JSON файлу
+
+    Returns:
+        Количество экспортированных вопросов
+    """
+    meta = {}
+    questions, stats, sequence = read_binary_snapshot(snapshot_file, meta)
+    tmp_file = f"{json_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        Database._dump_snapshot(f, questions, stats, sequence, meta.get('rollups'),
+                                meta.get('outbox'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, json_file)
+    logger.info(f"Снимок {snapshot_file} экспортирован в {json_file}, вопросов: {len(questions)}")
+    return len(questions)
+
+def main() -> None:
+    """Командная строка: python snapshot.py export <двоичный снимок> <JSON файл>"""
+    parser = argparse.ArgumentParser(description='Двоичные снимки базы данных бота')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='Экспортировать двоичный снимок в JSON')
+    export_parser.add_argument('snapshot_file', help='Двоичный снимок, например db.json.snap')
+    export_parser.add_argument('json_file', help='Создаваемый JSON файл')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        count = export_json(args.snapshot_file, args.json_file)
+        print(f"✅ Знімок експортовано в {args.json_file}, питань: {count}")
+
+if __name__ == '__main__':
+    main()
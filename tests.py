@@ -1,12 +1,27 @@
 import unittest
 import asyncio
 import os
+import gzip
+import json
+import shutil
+import tempfile
 from unittest.mock import AsyncMock, MagicMock, patch
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # Импортируем модули для тестирования
 from config import CATEGORIES, CHOOSING, TYPING_QUESTION, TYPING_CATEGORY, TYPING_REPLY
-from database import Database
+import threading
+import sqlite3
+
+from database import (Database, AsyncDatabase, DatabaseException, encode_base36, parse_question_seq,
+                      iter_snapshot_questions, QUESTIONS_TABLE_SQL, STATS_TABLE_SQL, SCHEMA_MIGRATIONS)
+from models import Question
+from backups import BackupEngine, restore, open_backup_reader
+from snapshot import export_json
+from search import InvertedIndex, normalize_token, tokenize
+from sharding import ShardedDatabase
+from changefeed import ChangeFeed, read_changes
+from retention import RetentionPolicy, parse_retention_rules
 from utils import is_admin, format_question_for_user, format_datetime, format_stats
 
 class TestConfig(unittest.TestCase):
@@ -47,11 +62,17 @@ class TestDatabase(unittest.TestCase):
     
     def tearDown(self):
         """Очистка после тестов"""
+        self.db_json.close()
+        self.db_sqlite.close()
+        
         # Удаляем тестовые файлы
-        if os.path.exists(self.test_db_file):
-            os.remove(self.test_db_file)
-        if os.path.exists(self.test_sqlite_file):
-            os.remove(self.test_sqlite_file)
+        for path in [self.test_db_file, self.test_sqlite_file,
+                     f"{self.test_sqlite_file}-wal", f"{self.test_sqlite_file}-shm",
+                     f"{self.test_db_file}.journal", f"{self.test_db_file}.journal.compacting",
+                     f"{self.test_db_file}.snap"]:
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(f"{self.test_db_file}.cold", ignore_errors=True)
     
     def test_add_question_json(self):
         """Тест добавления вопроса в JSON базу"""
@@ -163,6 +184,1565 @@ class TestDatabase(unittest.TestCase):
         self.assertEqual(len(answered_questions), 1)
         self.assertEqual(answered_questions[0]['id'], 'test2')
 
+    def test_journal_replay(self):
+        """Тест восстановления JSON базы из снимка и журнала"""
+        db = Database(db_type='json', filename=self.test_db_file, journal=True)
+        db.add_question('test1', {
+            'id': 'test1',
+            'category': 'general',
+            'text': 'Test question',
+            'status': 'pending',
+            'time': datetime.now().isoformat(),
+            'important': False,
+            'user_id': 123456789
+        })
+        db.update_question('test1', {'status': 'answered', 'answer': 'Test answer'})
+        
+        # Изменения записаны в журнал, снимок не перезаписывался
+        with open(f"{self.test_db_file}.journal", 'r', encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 2)
+        
+        # Новый экземпляр восстанавливает состояние из журнала
+        restored = Database(db_type='json', filename=self.test_db_file, journal=True)
+        self.assertEqual(restored.questions['test1']['answer'], 'Test answer')
+        self.assertEqual(restored.stats['total_questions'], 1)
+        self.assertEqual(restored.stats['answered_questions'], 1)
+    
+    def test_journal_compact(self):
+        """Тест сжатия журнала в снимок"""
+        db = Database(db_type='json', filename=self.test_db_file, journal=True, compact_threshold=100)
+        for i in range(3):
+            db.add_question(f'test{i}', {
+                'id': f'test{i}',
+                'category': 'spiritual',
+                'text': f'Test question {i}',
+                'status': 'pending',
+                'time': datetime.now().isoformat(),
+                'important': False,
+                'user_id': 123456789
+            })
+        db.close()
+        
+        # После сжатия журнал пуст, а все данные в снимке
+        self.assertEqual(os.path.getsize(f"{self.test_db_file}.journal"), 0)
+        restored = Database(db_type='json', filename=self.test_db_file)
+        self.assertEqual(len(restored.questions), 3)
+        self.assertEqual(restored.stats['categories']['spiritual'], 3)
+
+    def test_sqlite_row_level_update(self):
+        """Тест построчной записи изменений в SQLite"""
+        for i in range(2):
+            self.db_sqlite.add_question(f'test{i}', {
+                'id': f'test{i}',
+                'category': 'general',
+                'text': f'Test question {i}',
+                'status': 'pending',
+                'time': datetime.now().isoformat(),
+                'important': False,
+                'user_id': 123456789
+            })
+        self.db_sqlite.update_question('test0', {'status': 'rejected'})
+        self.db_sqlite.update_question('test0', {'status': 'pending', 'important': True})
+        self.db_sqlite.update_question('test1', {'status': 'answered', 'answer': 'Test answer'})
+        
+        # Новый экземпляр читает те же данные из файла
+        restored = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file)
+        self.assertEqual(restored.questions['test0']['status'], 'pending')
+        self.assertTrue(restored.questions['test0']['important'])
+        self.assertEqual(restored.questions['test1']['answer'], 'Test answer')
+        self.assertEqual(restored.stats['total_questions'], 2)
+        self.assertEqual(restored.stats['answered_questions'], 1)
+        self.assertEqual(restored.stats['categories']['general'], 2)
+
+    def test_sqlite_persistent_connection(self):
+        """Тест постоянного соединения с SQLite в режиме WAL"""
+        conn = self.db_sqlite._conn
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+        
+        self.db_sqlite.add_question('test1', {
+            'id': 'test1',
+            'category': 'general',
+            'text': 'Test question',
+            'status': 'pending',
+            'time': datetime.now().isoformat(),
+            'important': False,
+            'user_id': 123456789
+        })
+        
+        # Запись идет через то же соединение
+        self.assertIs(self.db_sqlite._conn, conn)
+        self.db_sqlite.close()
+        self.assertIsNone(self.db_sqlite._conn)
+
+    def test_secondary_indexes(self):
+        """Тест вторичных индексов по статусу, пользователю и важности"""
+        for i, user_id in enumerate([111, 111, 222]):
+            self.db_json.add_question(f'test{i}', {
+                'id': f'test{i}',
+                'category': 'general',
+                'text': f'Test question {i}',
+                'status': 'pending',
+                'time': datetime.now().isoformat(),
+                'important': False,
+                'user_id': user_id
+            })
+        self.db_json.update_question('test0', {'status': 'answered', 'answer': 'Test answer'})
+        self.db_json.update_question('test2', {'important': True})
+        
+        self.assertEqual([q['id'] for q in self.db_json.get_questions_by_status('pending')], ['test1', 'test2'])
+        self.assertEqual([q['id'] for q in self.db_json.get_questions_by_status('answered')], ['test0'])
+        self.assertEqual([q['id'] for q in self.db_json.get_questions_by_user(111)], ['test0', 'test1'])
+        self.assertEqual([q['id'] for q in self.db_json.get_questions_by_user(111, status='answered')], ['test0'])
+        self.assertEqual([q['id'] for q in self.db_json.get_important_questions()], ['test2'])
+        
+        # Снятие отметки удаляет вопрос из индекса важных
+        self.db_json.update_question('test2', {'important': False})
+        self.assertEqual(self.db_json.get_important_questions(), [])
+
+    def test_live_counters(self):
+        """Тест счетчиков по статусу, категории и важности"""
+        for db in (self.db_json, self.db_sqlite):
+            db.add_question('test1', {
+                'id': 'test1',
+                'category': 'urgent',
+                'text': 'Test question',
+                'status': 'pending',
+                'time': datetime.now().isoformat(),
+                'important': False,
+                'user_id': 123456789
+            })
+            db.update_question('test1', {'status': 'answered', 'answer': 'Test answer'})
+            # Изменение ответа не увеличивает счетчик отвеченных
+            db.update_question('test1', {'status': 'answered', 'answer': 'New answer', 'important': True})
+            
+            stats = db.get_stats()
+            self.assertEqual(stats['total_questions'], 1)
+            self.assertEqual(stats['answered_questions'], 1)
+            self.assertEqual(stats['statuses']['pending'], 0)
+            self.assertEqual(stats['categories']['urgent'], 1)
+            self.assertEqual(stats['important_questions'], 1)
+            self.assertEqual(db.count_questions(status='answered', category='urgent', important=True), 1)
+            self.assertEqual(db.reconcile_stats(), {})
+        
+        # Счетчики SQLite сохраняются между запусками
+        restored = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file)
+        self.assertEqual(restored.get_stats(), self.db_sqlite.get_stats())
+    
+    def test_reconcile_stats(self):
+        """Тест исправления расхождений счетчиков"""
+        self.db_json.add_question('test1', {
+            'id': 'test1',
+            'category': 'general',
+            'text': 'Test question',
+            'status': 'pending',
+            'time': datetime.now().isoformat(),
+            'important': False,
+            'user_id': 123456789
+        })
+        self.db_json._counts[('answered', 'general', False)] = 5
+        
+        mismatches = self.db_json.reconcile_stats()
+        self.assertEqual(mismatches, {('answered', 'general', False): (5, 0)})
+        self.assertEqual(self.db_json.get_stats()['answered_questions'], 0)
+
+    def test_question_id_allocator(self):
+        """Тест выдачи монотонных ID вопросов"""
+        self.assertEqual(encode_base36(0), '0')
+        self.assertEqual(encode_base36(36), '10')
+        self.assertEqual(parse_question_seq('q10'), 36)
+        self.assertIsNone(parse_question_seq('test1'))
+        
+        # Существующий ID из прежней схемы не будет выдан повторно
+        self.db_json.add_question('q2', {
+            'id': 'q2',
+            'category': 'general',
+            'text': 'Test question',
+            'status': 'pending',
+            'time': datetime.now().isoformat(),
+            'important': False,
+            'user_id': 123456789
+        })
+        first = self.db_json.next_question_id()
+        second = self.db_json.next_question_id()
+        self.assertEqual((first, second), ('q3', 'q4'))
+        
+        # Последовательность продолжается после перезапуска
+        self.db_json.add_question(second, {
+            'id': second,
+            'category': 'general',
+            'text': 'Test question',
+            'status': 'pending',
+            'time': datetime.now().isoformat(),
+            'important': False,
+            'user_id': 123456789
+        })
+        restored = Database(db_type='json', filename=self.test_db_file)
+        self.assertEqual(restored.next_question_id(), 'q5')
+    
+    def test_group_commit(self):
+        """Тест группового сохранения изменений"""
+        self.db_sqlite.close()
+        db = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file,
+                      flush_interval_ms=60000, flush_max_batch=1000)
+        for i in range(3):
+            question_id = db.next_question_id()
+            db.add_question(question_id, {
+                'id': question_id,
+                'category': 'general',
+                'text': f'Test question {i}',
+                'status': 'pending',
+                'time': datetime.now().isoformat(),
+                'important': False,
+                'user_id': 123456789
+            })
+        db.update_question(question_id, {'status': 'answered'})
+        
+        # Изменения сразу видны в памяти, но еще не записаны
+        self.assertEqual(db.get_question(question_id)['status'], 'answered')
+        reader = sqlite3.connect(self.test_sqlite_file)
+        self.assertEqual(reader.execute("SELECT COUNT(*) FROM questions").fetchone()[0], 0)
+        
+        db.flush()
+        self.assertEqual(reader.execute("SELECT COUNT(*) FROM questions").fetchone()[0], 3)
+        
+        # Закрытие сохраняет оставшиеся изменения
+        db.update_question(question_id, {'status': 'rejected'})
+        db.close()
+        self.assertEqual(
+            reader.execute("SELECT status FROM questions WHERE id = ?", (question_id,)).fetchone()[0],
+            'rejected'
+        )
+        reader.close()
+        
+        restored = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file)
+        self.assertEqual(restored.reconcile_stats(), {})
+        self.assertEqual(restored.count_questions(status='rejected'), 1)
+        restored.close()
+
+        # Полное сохранение записывает и удаления из очереди
+        db = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file,
+                      flush_interval_ms=60000, flush_max_batch=1000)
+        db.delete_question(question_id)
+        db.save()
+        db.close()
+        restored = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file)
+        self.assertFalse(restored.has_question(question_id))
+        self.assertEqual(restored.reconcile_stats(), {})
+        self.db_sqlite = restored
+    
+    def test_reads_during_flush(self):
+        """Тест чтения, пока изменение записывается на диск"""
+        question_id = self.db_json.next_question_id()
+        self.db_json.add_question(question_id, {
+            'id': question_id,
+            'category': 'general',
+            'text': 'Test question',
+            'status': 'pending',
+            'time': datetime.now().isoformat(),
+            'important': False,
+            'user_id': 123456789
+        })
+
+        # Запись снимка останавливается до команды теста
+        writing = threading.Event()
+        release = threading.Event()
+        original_write = self.db_json._write_snapshot
+
+        def write_snapshot(*args):
+            writing.set()
+            release.wait(10)
+            original_write(*args)
+
+        self.db_json._write_snapshot = write_snapshot
+        writer = threading.Thread(target=self.db_json.update_question, args=(question_id, {'status': 'answered'}))
+        writer.start()
+        self.assertTrue(writing.wait(10))
+
+        results = {}
+
+        def read():
+            results['question'] = self.db_json.get_question(question_id)
+            results['answered'] = self.db_json.get_questions_by_status('answered')
+            results['stats'] = self.db_json.get_stats()
+            results['pending'] = self.db_json.count_questions(status='pending')
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        reader.join(5)
+        blocked = reader.is_alive()
+        release.set()
+        writer.join()
+        reader.join()
+
+        # Чтение не ждет записи и уже видит изменение, примененное в памяти
+        self.assertFalse(blocked)
+        self.assertEqual(results['question']['status'], 'answered')
+        self.assertEqual([q['id'] for q in results['answered']], [question_id])
+        self.assertEqual(results['stats']['answered_questions'], 1)
+        self.assertEqual(results['pending'], 0)
+
+    def test_concurrent_updates(self):
+        """Тест параллельных изменений вопросов из нескольких потоков"""
+        question_ids = []
+        for i in range(20):
+            question_id = self.db_sqlite.next_question_id()
+            self.db_sqlite.add_question(question_id, {
+                'id': question_id,
+                'category': 'general',
+                'text': f'Test question {i}',
+                'status': 'pending',
+                'time': datetime.now().isoformat(),
+                'important': False,
+                'user_id': 123456789
+            })
+            question_ids.append(question_id)
+
+        def worker(worker_index):
+            for round_index in range(10):
+                for question_id in question_ids:
+                    status = ('answered', 'rejected', 'pending')[(worker_index + round_index) % 3]
+                    self.db_sqlite.update_question(question_id, {'status': status, 'important': round_index % 2 == 0})
+                    self.db_sqlite.get_questions_by_status(status)
+                    self.db_sqlite.get_stats()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Счетчики совпадают с данными в памяти и в SQLite
+        self.assertEqual(self.db_sqlite.count_questions(), 20)
+        self.assertEqual(sum(len(self.db_sqlite.get_questions_by_status(status))
+                             for status in ('pending', 'answered', 'rejected')), 20)
+        self.assertEqual(self.db_sqlite.reconcile_stats(), {})
+
+    def test_stats_snapshot(self):
+        """Тест неизменяемых снимков статистики и вопросов"""
+        self.db_json.add_question('test1', {
+            'id': 'test1',
+            'category': 'general',
+            'text': 'Test question',
+            'status': 'pending',
+            'time': datetime.now().isoformat(),
+            'important': False,
+            'user_id': 123456789
+        })
+        snapshot = self.db_json.stats_snapshot()
+        stats = self.db_json.get_stats()
+        question = self.db_json.get_question('test1')
+
+        # Читатель не может изменить состояние базы
+        with self.assertRaises(TypeError):
+            stats['categories']['general'] = 5
+        with self.assertRaises(TypeError):
+            snapshot.counts[('pending', 'general', False)] = 5
+        with self.assertRaises(AttributeError):
+            question.status = 'answered'
+
+        # Изменение публикует новый снимок, ранее полученные не меняются
+        self.db_json.update_question('test1', {'status': 'answered'})
+        self.assertGreater(self.db_json.stats_snapshot().version, snapshot.version)
+        self.assertEqual(self.db_json.get_stats()['answered_questions'], 1)
+        self.assertEqual(stats['answered_questions'], 0)
+        self.assertEqual(snapshot.stats['statuses']['pending'], 1)
+        self.assertEqual(question.status, 'pending')
+        self.assertEqual(self.db_json.get_question('test1').status, 'answered')
+
+    def test_schema_migrations(self):
+        """Тест миграций схемы SQLite базы прежней версии"""
+        self.db_sqlite.close()
+        for path in [self.test_sqlite_file, f"{self.test_sqlite_file}-wal", f"{self.test_sqlite_file}-shm"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+        # База, созданная до появления миграций
+        conn = sqlite3.connect(self.test_sqlite_file)
+        conn.execute(QUESTIONS_TABLE_SQL)
+        conn.execute(STATS_TABLE_SQL)
+        conn.execute("CREATE INDEX idx_questions_status ON questions (status)")
+        conn.execute("INSERT INTO questions (id, category, text, status, time, important, user_id) "
+                     "VALUES ('q1', 'general', 'Test question', 'pending', '2025-05-27T10:00:00', 0, 123456789)")
+        conn.commit()
+        conn.close()
+
+        self.db_sqlite = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file, sqlite_lazy=True)
+        conn = self.db_sqlite._conn
+        latest = SCHEMA_MIGRATIONS[-1][0]
+        self.assertEqual(Database.schema_version(conn), latest)
+        self.assertEqual(self.db_sqlite.get_question('q1')['text'], 'Test question')
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertTrue({'idx_questions_status_time', 'idx_questions_user', 'idx_questions_important',
+                         'idx_questions_category'} <= indexes)
+        self.assertNotIn('idx_questions_status', indexes)
+        # Агрегаты активности построены по вопросам, которые уже были в базе
+        self.assertEqual([(day['bucket'], day['asked']) for day in self.db_sqlite.get_rollups('day')],
+                         [('2025-05-27T00:00:00', 1)])
+
+        # Списки ленивого режима читаются по индексам
+        for where, index in [("status = 'answered'", 'idx_questions_status_time'),
+                             ("user_id = 1 AND status = 'answered'", 'idx_questions_user'),
+                             ("important = 1", 'idx_questions_important')]:
+            plan = ' '.join(row[-1] for row in conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT * FROM questions WHERE {where} ORDER BY rowid"))
+            self.assertIn(f"USING INDEX {index}", plan)
+
+        # Неудачная миграция откатывается целиком и не записывается в schema_version
+        failing = SCHEMA_MIGRATIONS + ((latest + 1, 'Ошибка', (
+            "CREATE INDEX idx_questions_text ON questions (text)",
+            "CREATE INDEX idx_broken ON missing_table (id)",
+        )),)
+        self.db_sqlite.close()
+        with patch('database.SCHEMA_MIGRATIONS', failing):
+            with self.assertRaises(DatabaseException):
+                Database(db_type='sqlite', sqlite_file=self.test_sqlite_file)
+        self.db_sqlite = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file)
+        conn = self.db_sqlite._conn
+        self.assertEqual(Database.schema_version(conn), latest)
+        self.assertIsNone(conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'idx_questions_text'").fetchone())
+
+        # База более новой версии не открывается
+        with conn:
+            conn.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                         (latest + 1, 'Новая версия', datetime.now().isoformat()))
+        self.db_sqlite.close()
+        with self.assertRaises(DatabaseException):
+            Database(db_type='sqlite', sqlite_file=self.test_sqlite_file)
+        self.db_sqlite = Database(db_type='json', filename=self.test_db_file)
+
+    def test_rollups(self):
+        """Тест агрегатов активности по часам и дням"""
+        day = datetime.now().replace(hour=10, minute=0, second=0, microsecond=0)
+        if day > datetime.now():
+            day -= timedelta(days=1)
+        for db in (self.db_json, self.db_sqlite):
+            for i in range(3):
+                db.add_question(f'q{i + 1}', {
+                    'id': f'q{i + 1}',
+                    'category': 'urgent' if i == 2 else 'general',
+                    'text': f'Test question {i}',
+                    'status': 'pending',
+                    'time': (day + timedelta(minutes=i)).isoformat(),
+                    'important': False,
+                    'user_id': 123456789
+                })
+            db.update_question('q1', {'status': 'answered', 'answer': 'Test answer',
+                                      'answer_time': (day + timedelta(hours=2)).isoformat()})
+            db.update_question('q2', {'status': 'rejected'})
+            # Повторное изменение ответа не удваивает агрегаты
+            db.update_question('q1', {'answer': 'Edited answer'})
+
+        for db in (self.db_json, self.db_sqlite):
+            activity = db.get_rollups('day')
+            self.assertEqual(len(activity), 1)
+            self.assertEqual(activity[0]['bucket'], day.replace(hour=0).isoformat())
+            self.assertEqual(activity[0]['asked'], 3)
+            self.assertEqual(activity[0]['statuses'], {'pending': 1, 'answered': 1, 'rejected': 1})
+            self.assertEqual(activity[0]['answered'], 1)
+            self.assertEqual(activity[0]['latency'], [0, 1, 0, 0, 0, 0])
+            self.assertEqual(activity[0]['avg_latency'], 7200)
+            hours = db.get_rollups('hour', category='general')
+            self.assertEqual([(h['bucket'], h['asked'], h['answered']) for h in hours],
+                             [(day.isoformat(), 2, 0), ((day + timedelta(hours=2)).isoformat(), 0, 1)])
+            self.assertEqual(db.get_rollups('day', end=day.replace(hour=0).isoformat()), [])
+
+        # Агрегаты сохраняются и загружаются без пересчета по вопросам
+        expected = self.db_json.get_rollups('hour')
+        self.db_json.close()
+        self.db_sqlite.close()
+        with patch('rollups.Rollups.rebuild') as rebuild:
+            self.db_json = Database(db_type='json', filename=self.test_db_file)
+            self.db_sqlite = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file)
+        rebuild.assert_not_called()
+        self.assertEqual(self.db_json.get_rollups('hour'), expected)
+        self.assertEqual(self.db_sqlite.get_rollups('hour'), expected)
+
+        # Снимок без агрегатов (прежней версии) - агрегаты строятся по вопросам
+        self.db_json.close()
+        with open(self.test_db_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        del data['rollups']
+        with open(self.test_db_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        self.db_json = Database(db_type='json', filename=self.test_db_file)
+        self.assertEqual(self.db_json.get_rollups('hour'), expected)
+
+    def test_sqlite_lazy_loading(self):
+        """Тест ленивой загрузки вопросов из SQLite"""
+        for i in range(5):
+            question_id = f'q{i + 1}'
+            self.db_sqlite.add_question(question_id, {
+                'id': question_id,
+                'category': 'general',
+                'text': f'Test question {i}',
+                'status': 'pending',
+                'time': datetime.now().isoformat(),
+                'important': i == 0,
+                'user_id': 123456789
+            })
+        for question_id in ('q1', 'q2', 'q3', 'q4'):
+            self.db_sqlite.update_question(question_id, {'status': 'answered'})
+        self.db_sqlite.close()
+        
+        self.db_sqlite = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file,
+                                  sqlite_lazy=True, sqlite_cache_rows=1)
+        db = self.db_sqlite
+        
+        # При запуске в памяти только ожидающие и важные вопросы
+        self.assertEqual(set(db.questions), {'q1', 'q5'})
+        self.assertEqual(db.count_questions(status='answered'), 4)
+        
+        # Остальные читаются по запросу, LRU ограничен
+        self.assertEqual(db.get_question('q2')['status'], 'answered')
+        self.assertEqual(db.get_question('q3')['status'], 'answered')
+        self.assertEqual(set(db.questions), {'q1', 'q3', 'q5'})
+        self.assertEqual(db.get_question('missing'), {})
+        
+        self.assertEqual([q['id'] for q in db.get_questions_by_status('answered')], ['q1', 'q2', 'q3', 'q4'])
+        self.assertEqual(len(db.get_questions_by_user(123456789)), 5)
+        
+        # Изменение вытесненного вопроса
+        db.update_question('q2', {'status': 'rejected'})
+        self.assertEqual(db.get_questions_by_user(123456789, 'rejected')[0]['id'], 'q2')
+        self.assertEqual(db.count_questions(status='rejected'), 1)
+        self.assertEqual(db.reconcile_stats(), {})
+
+    def test_lazy_reads_without_flush(self):
+        """Тест чтения из SQLite в ленивом режиме без сохранения очереди"""
+        for i in range(4):
+            question_id = f'q{i + 1}'
+            self.db_sqlite.add_question(question_id, {
+                'id': question_id,
+                'category': 'general',
+                'text': f'Test question {i}',
+                'status': 'answered',
+                'time': datetime.now().isoformat(),
+                'important': False,
+                'user_id': 123456789
+            })
+        self.db_sqlite.close()
+
+        self.db_sqlite = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file, sqlite_lazy=True,
+                                  sqlite_cache_rows=1, flush_interval_ms=60000, flush_max_batch=1000)
+        db = self.db_sqlite
+        db.update_question('q1', {'status': 'rejected'})
+        db.update_question('q2', {'answer': 'Updated'})
+        db.delete_question('q3')
+        db.add_question('q5', {
+            'id': 'q5',
+            'category': 'general',
+            'text': 'New question',
+            'status': 'answered',
+            'time': datetime.now().isoformat(),
+            'important': False,
+            'user_id': 123456789
+        })
+
+        # Несохраненные вопросы не вытесняются, запросы накладывают их на данные SQLite
+        self.assertEqual(len(db._pending), 4)
+        self.assertTrue({'q1', 'q2', 'q5'} <= set(db.questions))
+        answered = db.get_questions_by_status('answered')
+        self.assertEqual([q['id'] for q in answered], ['q2', 'q4', 'q5'])
+        self.assertEqual(answered[0]['answer'], 'Updated')
+        self.assertEqual([q['id'] for q in db.get_questions_by_user(123456789, 'rejected')], ['q1'])
+        self.assertEqual(db.get_question('q3'), {})
+        self.assertEqual(len(db._pending), 4)
+
+        # После сохранения вопросы снова вытесняются
+        db.flush()
+        db.get_question('q4')
+        self.assertEqual(set(db.questions), {'q4'})
+        self.assertEqual([q['id'] for q in db.get_questions_by_status('answered')], ['q2', 'q4', 'q5'])
+
+    def test_cold_archive(self):
+        """Тест переноса давно закрытых вопросов в холодный архив"""
+        self.db_json.close()
+        db = Database(db_type='json', filename=self.test_db_file, journal=True, archive_after_days=30)
+        for i in range(4):
+            db.add_question(f'q{i + 1}', {
+                'id': f'q{i + 1}',
+                'category': 'general',
+                'text': f'Test question {i}',
+                'status': 'pending',
+                'time': '2020-01-01T10:00:00',
+                'important': False,
+                'user_id': 123456789
+            })
+        db.update_question('q1', {'status': 'answered', 'answer': 'Old answer',
+                                  'answer_time': '2020-01-02T10:00:00'})
+        db.update_question('q2', {'status': 'rejected'})
+        db.update_question('q3', {'status': 'answered', 'answer': 'Recent answer',
+                                  'answer_time': datetime.now().isoformat()})
+        db.compact()
+        
+        # Давно закрытые вопросы вне рабочего набора, но доступны через API
+        self.assertEqual(set(db.questions), {'q3', 'q4'})
+        self.assertEqual(db.get_question('q1')['answer'], 'Old answer')
+        self.assertEqual([q.id for q in db.get_questions_by_status('answered')], ['q1', 'q3'])
+        self.assertEqual(len(db.get_questions_by_user(123456789)), 4)
+        self.assertEqual(db.get_stats()['answered_questions'], 2)
+        
+        # Сегменты читаются только для вопросов архива на странице и не под блокировкой
+        reads = []
+        original_read = db._read_segment
+        
+        def read_segment(*args):
+            reads.append(db.lock.locked())
+            return original_read(*args)
+        
+        db._read_segment = read_segment
+        self.assertEqual([q.id for q in db.get_questions_by_status('answered', limit=1, offset=1)], ['q3'])
+        self.assertEqual([q.id for q in db.get_questions_by_user(123456789, 'pending', limit=5)], ['q4'])
+        self.assertEqual(reads, [])
+        self.assertEqual([q.id for q in db.get_questions_by_user(123456789, limit=2, offset=1)], ['q2', 'q3'])
+        self.assertEqual(reads, [False])
+        db.close()
+        
+        self.db_json = Database(db_type='json', filename=self.test_db_file, journal=True, archive_after_days=30)
+        db = self.db_json
+        self.assertEqual(set(db.questions), {'q3', 'q4'})
+        self.assertEqual(db.get_stats()['total_questions'], 4)
+        self.assertEqual(db.next_question_id(), 'q5')
+        
+        # Изменение архивного вопроса возвращает его в рабочий набор
+        reads = []
+        original_read = db._read_segment
+        
+        def read_segment(*args):
+            reads.append(db.lock.locked())
+            return original_read(*args)
+        
+        db._read_segment = read_segment
+        db.update_question('q2', {'status': 'pending'})
+        self.assertEqual(reads, [False])
+        self.assertEqual(db.get_question('q2')['status'], 'pending')
+        self.assertIn('q2', db.questions)
+        self.assertEqual(db.reconcile_stats(), {})
+        self.assertEqual([q.id for q in db.get_questions_by_status('rejected')], [])
+
+    def test_submit_question(self):
+        """Тест поиска повторных отправок вопроса"""
+        def data(question_id, text, user_id=123456789, time=None, category='general'):
+            return {
+                'id': question_id,
+                'category': category,
+                'text': text,
+                'status': 'pending',
+                'time': time or datetime.now().isoformat(),
+                'important': False,
+                'user_id': user_id
+            }
+
+        for db in (self.db_json, self.db_sqlite):
+            self.assertEqual(db.submit_question('q1', data('q1', 'Як молитися вранці?')), 'q1')
+            # Та же отправка с другим регистром и пунктуацией
+            self.assertEqual(db.submit_question('q2', data('q2', 'як молитися  вранці')), 'q1')
+            self.assertEqual(db.submit_question('q3', data('q3', 'Як молитися вранці?', user_id=1)), 'q3')
+            self.assertEqual(db.submit_question('q4', data('q4', 'Інше питання')), 'q4')
+            # Вне окна и после ответа вопрос добавляется заново
+            later = (datetime.now() + timedelta(seconds=db.dedup_window + 1)).isoformat()
+            self.assertEqual(db.submit_question('q5', data('q5', 'Інше питання', time=later)), 'q5')
+            db.update_question('q1', {'status': 'answered', 'answer': 'Test answer'})
+            self.assertEqual(db.submit_question('q6', data('q6', 'Як молитися вранці?')), 'q6')
+            self.assertEqual(db.get_question('q2'), {})
+            self.assertEqual(db.get_stats()['total_questions'], 5)
+            # Текст без слов не сравнивается, разные формы слов и другая категория - разные вопросы
+            self.assertEqual(db.submit_question('e1', data('e1', '🙏🙏')), 'e1')
+            self.assertEqual(db.submit_question('e2', data('e2', '???')), 'e2')
+            self.assertEqual(db.submit_question('e3', data('e3', '🙏🙏')), 'e3')
+            self.assertEqual(db.submit_question('s1', data('s1', 'Що таке гріх?')), 's1')
+            self.assertEqual(db.submit_question('s2', data('s2', 'Що такі гріхи?')), 's2')
+            self.assertEqual(db.submit_question('s3', data('s3', 'Що таке гріх?', category='spiritual')), 's3')
+            self.assertEqual(db.submit_question('s4', data('s4', 'що  ТАКЕ гріх...', category='spiritual')), 's3')
+            for question_id in ('e1', 'e2', 'e3', 's1', 's2', 's3'):
+                db.update_question(question_id, {'status': 'rejected'})
+
+        # Одновременные отправки одного вопроса добавляют его один раз
+        results = []
+        threads = [threading.Thread(target=lambda i=i: results.append(
+            self.db_sqlite.submit_question(f'c{i}', data(f'c{i}', 'Одночасне питання'))))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(len(self.db_sqlite.get_questions_by_status('pending')), 5)
+
+        # Индекс восстанавливается после перезапуска
+        self.db_sqlite.close()
+        self.db_sqlite = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file, sqlite_lazy=True)
+        self.assertEqual(self.db_sqlite.submit_question('q7', data('q7', 'Як молитися вранці?')), 'q6')
+
+    def test_purge(self):
+        """Тест политики хранения: удаление и обезличивание давно закрытых вопросов"""
+        def fill(db):
+            for i, (status, important) in enumerate([('answered', False), ('rejected', False), ('answered', False),
+                                                     ('pending', False), ('rejected', True)]):
+                db.add_question(f'q{i + 1}', {
+                    'id': f'q{i + 1}',
+                    'category': 'general',
+                    'text': f'Test question {i}',
+                    'status': 'pending',
+                    'time': '2020-01-01T10:00:00',
+                    'important': important,
+                    'user_id': 123456789
+                })
+                if status != 'pending':
+                    db.update_question(f'q{i + 1}', {
+                        'status': status,
+                        'answer_time': datetime.now().isoformat() if i == 2 else '2020-01-02T10:00:00'
+                    })
+
+        def check(db):
+            self.assertEqual(db.get_question('q2'), {})
+            self.assertEqual(db.get_question('q1')['user_id'], 0)
+            self.assertEqual(db.get_question('q3')['user_id'], 123456789)
+            self.assertEqual(db.get_question('q5')['status'], 'rejected')
+            self.assertEqual(db.get_stats()['total_questions'], 4)
+            self.assertEqual(db.get_stats()['statuses']['rejected'], 1)
+            self.assertEqual([q.id for q in db.get_questions_by_user(123456789)], ['q3', 'q4', 'q5'])
+            self.assertEqual(db.search('Test question 1'), [])
+            self.assertEqual(sum(day['asked'] for day in db.get_rollups('day')), 4)
+            self.assertEqual(db.reconcile_stats(), {})
+
+        self.db_json.close()
+        self.db_json = Database(db_type='json', filename=self.test_db_file, journal=True, archive_after_days=30)
+        self.db_sqlite.close()
+        self.db_sqlite = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file, sqlite_lazy=True,
+                                  sqlite_cache_rows=1)
+        for db in (self.db_json, self.db_sqlite):
+            fill(db)
+            db.search('Test')
+        # Вопросы q1 и q2 в холодном архиве; у q1 после изменения остается устаревшая копия в сегменте
+        self.db_json.compact()
+        self.db_json.update_question('q1', {'answer': 'Edited answer'})
+        self.assertEqual(set(self.db_json.questions), {'q1', 'q3', 'q4', 'q5'})
+
+        policy = RetentionPolicy(self.db_json, parse_retention_rules('rejected:90:delete, answered:365:anonymize'),
+                                 batch_size=1)
+        self.assertEqual(sorted(policy.run()), ['q1', 'q2'])
+        self.assertEqual(sorted(self.db_sqlite.purge('rejected', 90, 'delete', batch_size=1)
+                                + self.db_sqlite.purge('answered', 365, 'anonymize')), ['q1', 'q2'])
+        for db in (self.db_json, self.db_sqlite):
+            check(db)
+            # Повторное применение ничего не меняет
+            self.assertEqual(db.purge('rejected', 90), [])
+            self.assertEqual(db.purge('answered', 365, 'anonymize'), [])
+
+        # Удаленный вопрос не возвращается из архива после перезапуска
+        self.db_json.delete_question('q1')
+        self.db_json.close()
+        self.db_sqlite.close()
+        self.db_json = Database(db_type='json', filename=self.test_db_file, journal=True, archive_after_days=30)
+        self.db_sqlite = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file)
+        self.assertEqual(self.db_json.get_question('q1'), {})
+        self.assertEqual(self.db_json.get_stats()['total_questions'], 3)
+        self.assertEqual(self.db_json.reconcile_stats(), {})
+        check(self.db_sqlite)
+
+        with self.assertRaises(DatabaseException):
+            parse_retention_rules('rejected:90:archive')
+
+    def test_streaming_migration(self):
+        """Тест потоковой миграции из JSON в SQLite с продолжением после прерывания"""
+        for i in range(7):
+            self.db_json.add_question(f'q{i + 1}', {
+                'id': f'q{i + 1}',
+                'category': 'general' if i % 2 else 'urgent',
+                'text': f'Питання {i} "з лапками"',
+                'status': 'pending',
+                'time': '2025-05-27T10:00:00',
+                'important': i == 3,
+                'user_id': 123456789
+            })
+        self.db_json.update_question('q2', {'status': 'answered', 'answer': 'Відповідь'})
+        self.db_json.save_json()
+        
+        # Разбор малыми частями дает те же данные, что и json.load
+        meta = {}
+        parsed = dict(iter_snapshot_questions(self.test_db_file, meta, chunk_size=7))
+        with open(self.test_db_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.assertEqual(parsed, data['questions'])
+        self.assertEqual(meta['sequence'], data['sequence'])
+        
+        # Прерывание после первого пакета
+        target = 'test_migrated.sqlite'
+        self.addCleanup(lambda: [os.remove(f) for f in (target, f"{target}-wal", f"{target}-shm") if os.path.exists(f)])
+        def interrupt(processed, rate):
+            raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            self.db_json.migrate_json_to_sqlite(self.test_db_file, target, batch_size=3, progress=interrupt)
+        
+        seen = []
+        migrated = self.db_json.migrate_json_to_sqlite(
+            self.test_db_file, target, batch_size=3, progress=lambda processed, rate: seen.append(processed))
+        self.assertEqual(migrated, 7)
+        self.assertEqual(seen, [6, 7])
+        
+        db = Database(db_type='sqlite', sqlite_file=target)
+        try:
+            self.assertEqual(db.get_question('q2')['answer'], 'Відповідь')
+            self.assertEqual(db.get_stats(), self.db_json.get_stats())
+            self.assertEqual(db.reconcile_stats(), {})
+            self.assertEqual(db.next_question_id(), 'q8')
+        finally:
+            db.close()
+
+    def test_binary_snapshot(self):
+        """Тест двоичного снимка: загрузка, смена формата, проверка целостности и экспорт"""
+        self.db_json.close()
+        db = Database(db_type='json', filename=self.test_db_file, journal=True, snapshot_format='binary')
+        for i in range(3):
+            db.add_question(f'q{i + 1}', {
+                'id': f'q{i + 1}',
+                'category': 'general',
+                'text': f'Питання {i}',
+                'status': 'pending',
+                'time': '2025-05-27T10:00:00',
+                'important': i == 1,
+                'user_id': 123456789
+            })
+        db.update_question('q1', {'status': 'answered', 'answer': 'Відповідь',
+                                  'answer_time': '2025-05-27T11:00:00'})
+        db.compact()
+        db.add_question('q4', {'id': 'q4', 'category': 'urgent', 'text': 'Після знімка', 'status': 'pending',
+                               'time': '2025-05-27T12:00:00', 'important': False, 'user_id': 1})
+        expected = {question_id: db.get_question(question_id).to_dict() for question_id in db.questions}
+        stats = db.get_stats()
+        db.close()
+        self.assertTrue(os.path.exists(f"{self.test_db_file}.snap"))
+        
+        # Снимок и журнал восстанавливают то же состояние
+        db = Database(db_type='json', filename=self.test_db_file, journal=True, snapshot_format='binary')
+        self.assertEqual({question_id: db.get_question(question_id).to_dict() for question_id in db.questions},
+                         expected)
+        self.assertEqual(db.get_stats(), stats)
+        self.assertEqual(db.next_question_id(), 'q5')
+        db.close()
+        
+        # Экспорт в JSON читается базой в формате JSON
+        exported = 'test_exported.json'
+        self.addCleanup(lambda: os.path.exists(exported) and os.remove(exported))
+        self.assertEqual(export_json(f"{self.test_db_file}.snap", exported), 4)
+        db = Database(db_type='json', filename=exported)
+        self.assertEqual(db.get_question('q1')['answer_time'], '2025-05-27T11:00:00')
+        self.assertEqual(db.get_stats(), stats)
+        db.close()
+        
+        # После смены формата загружается снимок прежнего формата, запись нового удаляет его
+        db = Database(db_type='json', filename=self.test_db_file, journal=True)
+        self.assertEqual(db.get_stats(), stats)
+        db.update_question('q4', {'status': 'rejected'})
+        db.close()
+        snapshot_file = f"{self.test_db_file}.snap"
+        self.assertFalse(os.path.exists(snapshot_file))
+        self.db_json = Database(db_type='json', filename=self.test_db_file, snapshot_format='binary')
+        self.assertEqual(self.db_json.get_question('q4')['status'], 'rejected')
+        self.db_json.save_json()
+        self.assertFalse(os.path.exists(self.test_db_file))
+        
+        # Скопированный более новый файл другого формата не заменяет снимок настроенного формата
+        with open(self.test_db_file, 'w', encoding='utf-8') as f:
+            json.dump({'questions': {}, 'stats': {}, 'sequence': 1}, f)
+        db = Database(db_type='json', filename=self.test_db_file, snapshot_format='binary')
+        self.assertEqual(db.get_question('q4')['status'], 'rejected')
+        db.close()
+        os.remove(self.test_db_file)
+        
+        # Поврежденный снимок не загружается
+        with open(snapshot_file, 'r+b') as f:
+            f.seek(-5, os.SEEK_END)
+            f.write(b'\x00')
+        with self.assertRaises(DatabaseException):
+            Database(db_type='json', filename=self.test_db_file, snapshot_format='binary')
+        with self.assertRaises(DatabaseException):
+            Database(db_type='json', filename=self.test_db_file, snapshot_format='xml')
+
+    def test_search(self):
+        """Тест полнотекстового поиска по тексту вопроса и ответа"""
+        texts = ['Як молитися вранці?', 'Чи можна молитися своїми словами?', 'Коли починається служба?']
+        for db in (self.db_json, self.db_sqlite):
+            for i, text in enumerate(texts):
+                db.add_question(f'q{i + 1}', {
+                    'id': f'q{i + 1}',
+                    'category': 'spiritual',
+                    'text': text,
+                    'status': 'pending',
+                    'time': '2025-05-27T10:00:00',
+                    'important': False,
+                    'user_id': 123456789
+                })
+            db.update_question('q3', {'status': 'answered', 'answer': 'Служба починається о 9 ранку, приходьте молитися'})
+            
+            # Поиск по началу слова и без учета регистра, все слова запроса обязательны
+            self.assertEqual({q.id for q in db.search('МОЛИТ')}, {'q1', 'q2', 'q3'})
+            self.assertEqual([q.id for q in db.search('молитися словами')], ['q2'])
+            self.assertEqual([q.id for q in db.search('ранку')], ['q3'])
+            # Совпадение в тексте вопроса важнее совпадения в ответе
+            self.assertEqual(db.search('служба')[0].id, 'q3')
+            self.assertEqual(db.search('молитися')[-1].id, 'q3')
+            self.assertEqual(len(db.search('молитися', limit=2)), 2)
+            self.assertEqual(len(db.search('молитися', limit=2, offset=2)), 1)
+            self.assertEqual(db.search('"*:()'), [])
+            
+            # Повторное добавление заменяет вопрос и в поисковом индексе
+            db.add_question('q1', {**db.get_question('q1').to_dict(), 'text': 'Як сповідатися?'})
+            self.assertEqual([q.id for q in db.search('сповідатися')], ['q1'])
+            self.assertNotIn('q1', [q.id for q in db.search('вранці')])
+        
+        self.assertTrue(self.db_sqlite.fts)
+        # Проверка согласованности индекса с таблицей: при расхождении будет исключение
+        with self.db_sqlite._conn as conn:
+            conn.execute("INSERT INTO questions_fts (questions_fts, rank) VALUES ('integrity-check', 1)")
+        
+        # Индекс строится миграцией схемы для базы, созданной до появления поиска
+        self.db_sqlite.close()
+        conn = sqlite3.connect(self.test_sqlite_file)
+        conn.executescript("DROP TABLE questions_fts; DROP TRIGGER questions_fts_insert;"
+                           "DROP TRIGGER questions_fts_delete; DROP TRIGGER questions_fts_update;"
+                           "DELETE FROM schema_version WHERE version = 6;")
+        conn.close()
+        self.db_sqlite = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file)
+        self.assertTrue(self.db_sqlite.fts)
+        self.assertEqual([q.id for q in self.db_sqlite.search('служба')], ['q3'])
+        
+        # Без FTS5 миграция применяется без индекса, поиск идет по индексу в памяти
+        self.db_sqlite.close()
+        conn = sqlite3.connect(self.test_sqlite_file)
+        conn.executescript("DROP TABLE questions_fts; DROP TRIGGER questions_fts_insert;"
+                           "DROP TRIGGER questions_fts_delete; DROP TRIGGER questions_fts_update;"
+                           "DELETE FROM schema_version WHERE version = 6;")
+        conn.close()
+        with patch('database.QUESTIONS_FTS_SQL', "CREATE VIRTUAL TABLE questions_fts USING no_such_module(text)"):
+            self.db_sqlite = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file)
+        self.assertFalse(self.db_sqlite.fts)
+        self.assertEqual(Database.schema_version(self.db_sqlite._conn), SCHEMA_MIGRATIONS[-1][0])
+        self.assertEqual([q.id for q in self.db_sqlite.search('служба')], ['q3'])
+
+    def test_search_unsaved(self):
+        """Тест поиска по FTS5 без сохранения очереди"""
+        self.db_sqlite.close()
+        db = Database(db_type='sqlite', sqlite_file=self.test_sqlite_file,
+                      flush_interval_ms=60000, flush_max_batch=1000)
+        self.db_sqlite = db
+        for i, text in enumerate(['Як молитися вранці?', 'Коли починається служба?']):
+            db.add_question(f'q{i + 1}', {
+                'id': f'q{i + 1}',
+                'category': 'spiritual',
+                'text': text,
+                'status': 'pending',
+                'time': '2025-05-27T10:00:00',
+                'important': False,
+                'user_id': 123456789
+            })
+        db.flush()
+        db.update_question('q1', {'text': 'Як сповідатися?'})
+        db.update_question('q2', {'answer': 'Служба о 9 ранку, приходьте молитися'})
+        db.add_question('q3', {
+            'id': 'q3',
+            'category': 'spiritual',
+            'text': 'Чи можна молитися своїми словами?',
+            'status': 'pending',
+            'time': '2025-05-27T10:00:00',
+            'important': False,
+            'user_id': 123456789
+        })
+
+        # Изменения видны поиску до записи в индекс
+        self.assertEqual([q.id for q in db.search('молитися')], ['q2', 'q3'])
+        self.assertEqual([q.id for q in db.search('сповідатися')], ['q1'])
+        self.assertEqual(db.search('вранці'), [])
+        self.assertEqual([q.id for q in db.search('молитися', limit=1, offset=1)], ['q3'])
+        self.assertEqual(len(db._pending), 3)
+
+        db.flush()
+        self.assertEqual({q.id for q in db.search('молитися')}, {'q2', 'q3'})
+
+    def test_search_index_json(self):
+        """Тест поискового индекса JSON базы: холодный архив и изменения после построения"""
+        self.db_json.close()
+        db = Database(db_type='json', filename=self.test_db_file, journal=True, archive_after_days=30)
+        self.db_json = db
+        for i, text in enumerate(['Стара молитва', 'Нова молитва']):
+            db.add_question(f'q{i + 1}', {
+                'id': f'q{i + 1}',
+                'category': 'spiritual',
+                'text': text,
+                'status': 'pending',
+                'time': '2020-01-01T10:00:00',
+                'important': False,
+                'user_id': 123456789
+            })
+        db.update_question('q1', {'status': 'answered', 'answer': 'Архівна відповідь',
+                                  'answer_time': '2020-01-02T10:00:00'})
+        db.compact()
+        self.assertNotIn('q1', db.questions)
+        
+        self.assertEqual([q.id for q in db.search('молитва')], ['q2', 'q1'])
+        self.assertEqual([q.id for q in db.search('архівн')], ['q1'])
+        
+        # Изменения после построения индекса попадают в него без перестроения
+        db.update_question('q2', {'status': 'answered', 'answer': 'Свіжа відповідь'})
+        db.add_question('q3', {'id': 'q3', 'category': 'general', 'text': 'Третє питання', 'status': 'pending',
+                               'time': '2025-05-27T10:00:00', 'important': False, 'user_id': 1})
+        self.assertEqual([q.id for q in db.search('свіж')], ['q2'])
+        self.assertEqual([q.id for q in db.search('третє')], ['q3'])
+        self.assertEqual(len(db._search_index), 3)
+
+        # Изменения во время построения (архив читается без блокировки) применяются в конце
+        db._search_index, db._search_index_ready = None, False
+        original_read = db._read_segment
+
+        def read_segment(*args):
+            db.update_question('q3', {'text': 'Змінене питання'})
+            db.delete_question('q2')
+            return original_read(*args)
+
+        db._read_segment = read_segment
+        self.assertEqual([q.id for q in db.search('молитва')], ['q1'])
+        self.assertEqual([q.id for q in db.search('змінене')], ['q3'])
+        self.assertEqual(db.search('третє'), [])
+        self.assertEqual(len(db._search_index), 2)
+        self.assertEqual(db._search_index_changes, {})
+        
+        # Оценка запроса идет без блокировки данных: запись не ждет поиска
+        original_search = db._search_index.search
+        
+        def search(*args, **kwargs):
+            self.assertFalse(db.lock.locked())
+            return original_search(*args, **kwargs)
+        
+        with patch.object(db._search_index, 'search', side_effect=search) as index_search:
+            self.assertEqual([q.id for q in db.search('змінене')], ['q3'])
+        self.assertEqual(index_search.call_count, 1)
+
+    def test_online_backup(self):
+        """Тест резервного копирования со сжатием"""
+        for db in (self.db_json, self.db_sqlite):
+            for i in range(3):
+                db.add_question(f'q{i + 1}', {
+                    'id': f'q{i + 1}',
+                    'category': 'general',
+                    'text': f'Test question {i}',
+                    'status': 'pending',
+                    'time': datetime.now().isoformat(),
+                    'important': False,
+                    'user_id': 123456789
+                })
+            db.update_question('q1', {'status': 'answered', 'answer': 'Test answer'})
+        
+        backup_dir = tempfile.mkdtemp()
+        try:
+            # Изменения вопроса после снимка не попадают в копию
+            snapshot = self.db_json.get_question('q1')
+            backup_file = self.db_json.backup(backup_dir, compression='gzip')
+            self.db_json.update_question('q1', {'answer': 'New answer'})
+            self.assertEqual(snapshot['answer'], 'Test answer')
+            self.assertTrue(backup_file.endswith('.json.gz'))
+            with gzip.open(backup_file, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+            self.assertEqual(len(data['questions']), 3)
+            self.assertEqual(data['questions']['q1']['answer'], 'Test answer')
+            self.assertEqual(data['stats']['answered_questions'], 1)
+            
+            backup_file = self.db_sqlite.backup(backup_dir, compression='gzip')
+            restored_file = os.path.join(backup_dir, 'restored.db')
+            with gzip.open(backup_file, 'rb') as src, open(restored_file, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            conn = sqlite3.connect(restored_file)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0], 3)
+            conn.close()
+            
+            with self.assertRaises(DatabaseException):
+                self.db_json.backup(backup_dir, compression='lz4')
+        finally:
+            shutil.rmtree(backup_dir)
+
+class TestBackupEngine(unittest.TestCase):
+    """Тесты для резервного копирования по расписанию"""
+    
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.work_dir = tempfile.mkdtemp()
+        self.backup_dir = os.path.join(self.work_dir, 'backups')
+        self.db = Database(db_type='json', filename=os.path.join(self.work_dir, 'db.json'), journal=True)
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        self.db.close()
+        shutil.rmtree(self.work_dir)
+    
+    def add_question(self, question_id: str):
+        """Добавление тестового вопроса"""
+        self.db.add_question(question_id, {
+            'id': question_id,
+            'category': 'general',
+            'text': 'Test question',
+            'status': 'pending',
+            'time': datetime.now().isoformat(),
+            'important': False,
+            'user_id': 123456789
+        })
+    
+    def test_full_and_incremental_restore(self):
+        """Тест восстановления из полной и инкрементных копий"""
+        self.engine = BackupEngine(self.db, self.backup_dir, full_every=3)
+        self.add_question('q1')
+        self.assertEqual(self.engine.run()['kind'], 'full')
+        
+        self.add_question('q2')
+        self.db.update_question('q1', {'status': 'answered', 'answer': 'Test answer'})
+        diff = self.engine.run()
+        self.assertEqual(diff['kind'], 'diff')
+        self.add_question('q3')
+        self.assertEqual(self.engine.run()['kind'], 'diff')
+        
+        target = os.path.join(self.work_dir, 'restored.json')
+        # Изменения применяются через журнал, снимок записывается один раз
+        with patch.object(Database, '_write_snapshot', autospec=True,
+                          side_effect=Database._write_snapshot) as write_snapshot:
+            self.assertEqual(restore(self.backup_dir, target, at=diff['time']), 1)
+        self.assertEqual(write_snapshot.call_count, 1)
+        self.assertFalse(os.path.exists(f"{target}.journal"))
+        restored = Database(db_type='json', filename=target)
+        self.assertEqual(set(restored.questions), {'q1', 'q2'})
+        self.assertEqual(restored.get_question('q1')['answer'], 'Test answer')
+        self.assertEqual(restored.get_stats()['answered_questions'], 1)
+        restored.close()
+        
+        # Каждая третья копия полная
+        self.assertEqual(self.engine.run()['kind'], 'full')
+        
+        # Удаление вопроса попадает в инкрементную копию
+        self.db.delete_question('q2')
+        self.engine.run()
+        target = os.path.join(self.work_dir, 'restored_latest.json')
+        restore(self.backup_dir, target)
+        restored = Database(db_type='json', filename=target)
+        self.assertEqual(set(restored.questions), {'q1', 'q3'})
+        self.assertEqual(restored.get_stats()['total_questions'], 2)
+        restored.close()
+
+    def test_diff_from_change_feed(self):
+        """Тест инкрементных копий по ленте изменений после перезапуска"""
+        self.db.close()
+        feed = ChangeFeed(os.path.join(self.work_dir, 'changes.jsonl'))
+        self.db = Database(db_type='json', filename=os.path.join(self.work_dir, 'db.json'), journal=True,
+                           change_feed=feed)
+        self.add_question('q1')
+        self.assertEqual(BackupEngine(self.db, self.backup_dir).run()['feed_seq'], 1)
+
+        # Новый экземпляр (перезапуск) продолжает цепочку с номера события в списке копий
+        self.add_question('q2')
+        self.db.update_question('q1', {'status': 'answered', 'answer': 'Test answer'})
+        engine = BackupEngine(self.db, self.backup_dir)
+        diff = engine.run()
+        self.assertEqual((diff['kind'], diff['feed_seq']), ('diff', 3))
+        with open_backup_reader(os.path.join(self.backup_dir, diff['file'])) as f:
+            data = json.loads(f.read().decode('utf-8'))
+        self.assertEqual(list(data['questions']), ['q2', 'q1'])
+
+        # Без новых событий копия пустая
+        diff = engine.run()
+        with open_backup_reader(os.path.join(self.backup_dir, diff['file'])) as f:
+            self.assertEqual(json.loads(f.read().decode('utf-8'))['questions'], {})
+
+        target = os.path.join(self.work_dir, 'restored.json')
+        restore(self.backup_dir, target)
+        restored = Database(db_type='json', filename=target)
+        self.assertEqual(restored.get_question('q1')['answer'], 'Test answer')
+        self.assertEqual(set(restored.questions), {'q1', 'q2'})
+        restored.close()
+        self.db.close()
+        feed.close()
+
+    def test_retention(self):
+        """Тест удаления старых цепочек копий"""
+        self.engine = BackupEngine(self.db, self.backup_dir, keep_hourly=1, keep_daily=1, keep_weekly=0)
+        old_file = os.path.join(self.backup_dir, 'backup_old_db.json.gz')
+        os.makedirs(self.backup_dir)
+        open(old_file, 'w').close()
+        with open(os.path.join(self.backup_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump([{'file': 'backup_old_db.json.gz', 'kind': 'full', 'base': 'backup_old_db.json.gz',
+                        'db_type': 'json', 'time': '2020-01-01T10:00:00'}], f)
+        
+        self.add_question('q1')
+        self.engine.run()
+        self.engine.run()
+        
+        # Старше хранимых дней - удалена, последняя цепочка сохранена
+        manifest = BackupEngine.load_manifest(self.backup_dir)
+        self.assertFalse(os.path.exists(old_file))
+        self.assertEqual([entry['kind'] for entry in manifest], ['full', 'diff'])
+
+class TestQuestion(unittest.TestCase):
+    """Тесты для компактной записи вопроса"""
+    
+    def test_question_record(self):
+        """Тест хранения и преобразования вопроса"""
+        data = {
+            'id': 'q1',
+            'category': 'general',
+            'text': 'Test question',
+            'status': 'pending',
+            'time': '2025-05-27T00:03:29',
+            'important': 1,
+            'user_id': 123456789
+        }
+        question = Question.from_dict(data)
+        
+        # Время хранится в микросекундах, при чтении возвращается в ISO формате без изменений
+        self.assertIsInstance(question.time, int)
+        self.assertEqual(question['time'], '2025-05-27T00:03:29')
+        precise = Question.from_dict(dict(data, time='2025-05-27T00:03:29.281284'))
+        self.assertEqual(precise.time - question.time, 281284)
+        self.assertEqual(precise['time'], '2025-05-27T00:03:29.281284')
+        # Время с часовым поясом хранится строкой, чтобы не потерять смещение
+        self.assertEqual(Question.from_dict(dict(data, time='2025-05-27T00:03:29+02:00'))['time'],
+                         '2025-05-27T00:03:29+02:00')
+        self.assertIs(question['important'], True)
+        self.assertIsNone(question.answer_time)
+        self.assertEqual(question.get('answer', ''), '')
+        self.assertFalse(hasattr(question, '__dict__'))
+        
+        # Статус и категория - общие объекты строк
+        other = Question.from_dict(dict(data, id='q2', status=''.join(['pend', 'ing'])))
+        self.assertIs(question.status, other.status)
+        
+        # Вопрос неизменяем, изменение возвращает новую запись
+        answered = question.replace({'status': 'answered', 'answer': 'Test answer',
+                                     'answer_time': '2025-05-27T00:03:48'})
+        self.assertEqual(question.status, 'pending')
+        with self.assertRaises(AttributeError):
+            question.status = 'answered'
+        self.assertEqual(Question.from_dict(answered.to_dict()), answered)
+        self.assertEqual(answered.to_dict()['answer_time'], '2025-05-27T00:03:48')
+
+class TestInvertedIndex(unittest.TestCase):
+    """Тесты для инвертированного индекса поиска"""
+    
+    def test_normalization(self):
+        """Тест нормализации украинских слов"""
+        self.assertEqual(tokenize("З’явиться п'ять ҐАНКІВ"), tokenize("з'явиться пять ганки"))
+        self.assertEqual(normalize_token('моли\u0301тва'), normalize_token('молитва'))
+        self.assertEqual(normalize_token('молитви'), normalize_token('молитвою'))
+        self.assertEqual(normalize_token('як'), 'як')
+    
+    def test_search(self):
+        """Тест поиска по началу слов, пересечения и ранжирования"""
+        index = InvertedIndex(text_weight=2.0, answer_weight=1.0)
+        index.add('q1', 'Як молитися вранці?')
+        index.add('q2', 'Коли служба?', 'Служба щонеділі, приходьте молитися')
+        index.add('q3', 'Про піст і молитву')
+        
+        self.assertEqual({doc_id for doc_id, _ in index.search('мол')}, {'q1', 'q2', 'q3'})
+        self.assertEqual([doc_id for doc_id, _ in index.search('молитися служба')], ['q2'])
+        self.assertEqual(index.search('молитися неіснуюче'), [])
+        self.assertEqual(len(index.search('мол', limit=2)), 2)
+        # Слово в тексте вопроса весит больше, чем в ответе
+        self.assertEqual(index.search('молитися')[-1][0], 'q2')
+        
+        # Замена и удаление обновляют только записи вопроса
+        index.add('q1', 'Як сповідатися?')
+        self.assertEqual([doc_id for doc_id, _ in index.search('вранці')], [])
+        self.assertEqual([doc_id for doc_id, _ in index.search('сповід')], ['q1'])
+        index.remove('q3')
+        self.assertEqual(index.search('піст'), [])
+        self.assertNotIn('піст', index._vocabulary)
+        self.assertEqual(len(index), 2)
+
+class TestShardedDatabase(unittest.IsolatedAsyncioTestCase):
+    """Тесты для хранилища, разделенного по пользователям"""
+    
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.sqlite_file = os.path.join(self.tmp_dir, 'bot.db')
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    async def test_sharded_storage(self):
+        """Тест распределения вопросов по частям и объединения результатов"""
+        db = AsyncDatabase(ShardedDatabase(shard_count=3, sqlite_file=self.sqlite_file))
+        threads = {}
+        for shard in db.db.shards:
+            original_add = shard.add_question
+            def add(question_id, data, shard=shard, original_add=original_add):
+                threads[question_id] = threading.current_thread().name
+                original_add(question_id, data)
+            shard.add_question = add
+        
+        users = list(range(1, 13))
+        question_ids = []
+        for user_id in users:
+            question_id = db.next_question_id()
+            question_ids.append(question_id)
+            await db.add_question(question_id, {
+                'id': question_id,
+                'category': 'general',
+                'text': f'Питання користувача {user_id}',
+                'status': 'pending',
+                'time': '2025-05-27T10:00:00',
+                'important': user_id % 4 == 0,
+                'user_id': user_id
+            })
+        await db.update_question(question_ids[0], {'status': 'answered', 'answer': 'Відповідь'})
+        
+        # Вопрос лежит в части своего пользователя, изменения идут в потоке этой части
+        for question_id, user_id in zip(question_ids, users):
+            index = db.db.user_shard(user_id)
+            self.assertIn(question_id, db.db.shards[index].questions)
+            self.assertEqual(threads[question_id], f'db-writer-{index}_0')
+        self.assertGreater(len({db.db.user_shard(user_id) for user_id in users}), 1)
+        
+        # Глобальные списки и статистика собираются из всех частей
+        self.assertEqual([q.id for q in await db.get_questions_by_status('pending')], question_ids[1:])
+        self.assertEqual(len(db.get_important_questions()), 3)
+        self.assertEqual(db.get_stats()['total_questions'], 12)
+        self.assertEqual(db.get_stats()['answered_questions'], 1)
+        self.assertEqual((await db.get_question(question_ids[0]))['answer'], 'Відповідь')
+        self.assertEqual([q.id for q in await db.get_questions_by_user(5)], [question_ids[4]])
+        self.assertEqual([q.id for q in await db.search('користувача 7')], [question_ids[6]])
+        self.assertEqual(await db.reconcile_stats(), {})
+        activity = db.get_rollups('day')
+        self.assertEqual([(day['bucket'], day['asked'], day['answered']) for day in activity],
+                         [('2025-05-27T00:00:00', 12, 0)])
+        self.assertEqual(activity[0]['statuses'], {'pending': 11, 'answered': 1})
+        await db.close()
+        
+        # После перезапуска ID восстанавливаются из частей, а маршруты находятся по первичному ключу
+        db = ShardedDatabase(shard_count=3, sqlite_file=self.sqlite_file, sqlite_lazy=True)
+        self.assertEqual(len([f for f in os.listdir(self.tmp_dir) if f.endswith('.db')]), 3)
+        self.assertEqual(len(db._routes), 0)
+        self.assertEqual(db.get_question(question_ids[-1])['user_id'], 12)
+        self.assertEqual(dict(db._routes), {question_ids[-1]: db.user_shard(12)})
+        with patch('sharding.ROUTE_CACHE_SIZE', 2):
+            for question_id in question_ids[:3]:
+                self.assertTrue(db.get_question(question_id))
+            self.assertEqual(list(db._routes), question_ids[1:3])
+        self.assertEqual(db.get_question('q-missing'), {})
+        self.assertEqual(db.next_question_id(), f'q{encode_base36(13)}')
+        db.update_question(question_ids[1], {'status': 'rejected'})
+        self.assertEqual(db.get_stats()['statuses']['rejected'], 1)
+        
+        # Повторная отправка ищется в части пользователя
+        question_id = db.next_question_id()
+        self.assertEqual(db.submit_question(question_id, {
+            'id': question_id,
+            'category': 'general',
+            'text': 'Питання користувача 3',
+            'status': 'pending',
+            'time': '2025-05-27T10:01:00',
+            'important': False,
+            'user_id': 3
+        }), question_ids[2])
+        self.assertEqual(db.get_question(question_id), {})
+        
+        # Политика хранения применяется в каждой части, маршрут удаленного вопроса удаляется
+        self.assertEqual(db.purge('rejected', 0), [question_ids[1]])
+        self.assertEqual(db.get_question(question_ids[1]), {})
+        self.assertEqual(db.get_stats()['total_questions'], 11)
+        self.assertEqual(db.reconcile_stats(), {})
+        db.close()
+
+class TestChangeFeed(unittest.IsolatedAsyncioTestCase):
+    """Тесты для ленты изменений вопросов"""
+    
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.changes_file = os.path.join(self.tmp_dir, 'changes.jsonl')
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def add_question(self, db, question_id: str):
+        db.add_question(question_id, {
+            'id': question_id,
+            'category': 'general',
+            'text': 'Test question',
+            'status': 'pending',
+            'time': '2025-05-27T10:00:00',
+            'important': False,
+            'user_id': 123456789
+        })
+    
+    async def test_feed_from_database(self):
+        """Тест событий базы данных, продолжения с номера и подписки"""
+        feed = ChangeFeed(self.changes_file)
+        db = Database(db_type='sqlite', sqlite_file=os.path.join(self.tmp_dir, 'bot.db'), change_feed=feed)
+        self.add_question(db, 'q1')
+        db.update_question('q1', {'status': 'answered', 'answer': 'Відповідь'})
+        db.update_question('q1', {'status': 'pending'})
+        db.update_question('q1', {'status': 'rejected'})
+        db.update_question('q1', {'important': True})
+        
+        events = feed.read(0)
+        self.assertEqual([event['seq'] for event in events], [1, 2, 3, 4, 5])
+        self.assertEqual([event['type'] for event in events],
+                         ['added', 'answered', 'restored', 'rejected', 'updated'])
+        self.assertEqual(events[1]['question']['answer'], 'Відповідь')
+        self.assertTrue(events[4]['question']['important'])
+        
+        # Подписчик продолжает с номера: сначала пропущенные события, затем новые
+        received = []
+        
+        async def consume():
+            async for event in feed.subscribe(offset=3):
+                received.append(event['seq'])
+        
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        await asyncio.get_running_loop().run_in_executor(None, self.add_question, db, 'q2')
+        await asyncio.sleep(0.05)
+        db.close()
+        feed.close()
+        await asyncio.wait_for(consumer, 5)
+        self.assertEqual(received, [4, 5, 6])
+        
+        # После перезапуска нумерация продолжается, старые события читаются из файла
+        feed = ChangeFeed(self.changes_file, buffer_size=2)
+        self.assertEqual(feed.last_seq, 6)
+        self.assertEqual([event['seq'] for event in feed.read(1, limit=3)], [2, 3, 4])
+        self.assertEqual(feed.append([{'type': 'updated', 'id': 'q2', 'data': {}, 'question': {}}])[0]['seq'], 7)
+        feed.close()
+    
+    def test_truncated_event(self):
+        """Тест отбрасывания недописанного события"""
+        feed = ChangeFeed(self.changes_file)
+        feed.append([{'type': 'added', 'id': 'q1', 'data': {}, 'question': {}}])
+        feed.close()
+        with open(self.changes_file, 'ab') as f:
+            f.write(b'{"seq": 2, "ty')
+        
+        # Внешний читатель не видит событие, которое еще записывается
+        self.assertEqual([event['seq'] for event in read_changes(self.changes_file)], [1])
+        
+        feed = ChangeFeed(self.changes_file)
+        self.assertEqual(feed.last_seq, 1)
+        feed.append([{'type': 'added', 'id': 'q2', 'data': {}, 'question': {}}])
+        feed.close()
+        self.assertEqual([event['id'] for event in read_changes(self.changes_file, offset=1)], ['q2'])
+
+    def test_recover_after_crash(self):
+        """Тест записи в ленту сохраненных событий после сбоя между сохранением и лентой"""
+        stores = {
+            'sqlite': {'db_type': 'sqlite', 'sqlite_file': os.path.join(self.tmp_dir, 'bot.db')},
+            'journal': {'db_type': 'json', 'filename': os.path.join(self.tmp_dir, 'journal.json'), 'journal': True},
+            'json': {'db_type': 'json', 'filename': os.path.join(self.tmp_dir, 'db.json')},
+        }
+        for name, options in stores.items():
+            with self.subTest(store=name):
+                if os.path.exists(self.changes_file):
+                    os.remove(self.changes_file)
+                feed = ChangeFeed(self.changes_file)
+                db = Database(change_feed=feed, **options)
+                self.add_question(db, 'q1')
+                with patch.object(feed, 'append', side_effect=OSError('disk full')):
+                    with self.assertRaises(DatabaseException):
+                        db.update_question('q1', {'status': 'answered', 'answer': 'Відповідь'})
+                    self.assertEqual(db.get_question('q1')['status'], 'answered')
+                    db.close()
+                feed.close()
+                self.assertEqual([event['type'] for event in read_changes(self.changes_file)], ['added'])
+
+                # При запуске база дописывает событие, которое сохранила, но не записала в ленту
+                feed = ChangeFeed(self.changes_file)
+                db = Database(change_feed=feed, **options)
+                db.update_question('q1', {'important': True})
+                db.close()
+                db = Database(change_feed=feed, **options)
+                db.close()
+                feed.close()
+                events = read_changes(self.changes_file)
+                self.assertEqual([event['seq'] for event in events], [1, 2, 3])
+                self.assertEqual([event['type'] for event in events], ['added', 'answered', 'updated'])
+                self.assertEqual([event['source_seq'] for event in events], [1, 2, 3])
+                self.assertEqual(events[1]['question']['answer'], 'Відповідь')
+
+    def test_redact_on_purge(self):
+        """Тест удаления данных вопросов из ленты политикой хранения"""
+        feed = ChangeFeed(self.changes_file)
+        db = Database(db_type='sqlite', sqlite_file=os.path.join(self.tmp_dir, 'bot.db'), change_feed=feed)
+        for question_id, status in (('q1', 'rejected'), ('q2', 'answered'), ('q3', 'answered')):
+            self.add_question(db, question_id)
+            db.update_question(question_id, {'status': status, 'answer': f'Відповідь {question_id}',
+                                             'answer_time': '2020-01-02T10:00:00'})
+        # ID пользователя не попадает в события
+        self.assertFalse(any('user_id' in event['data'] or 'user_id' in event['question']
+                             for event in feed.read(0)))
+        # Событие прежней версии с ID пользователя
+        feed.append([{'type': 'updated', 'id': 'q2', 'data': {'user_id': 123456789}, 'question': {'user_id': 123456789}}])
+
+        self.assertEqual(db.purge('rejected', 90), ['q1'])
+        self.assertEqual(sorted(db.purge('answered', 365, 'anonymize')), ['q2', 'q3'])
+        db.close()
+        feed.close()
+
+        events = read_changes(self.changes_file)
+        self.assertEqual([event['seq'] for event in events], list(range(1, len(events) + 1)))
+        self.assertTrue(all(event['question'] is None and event['data'] == {}
+                            for event in events if event['id'] == 'q1'))
+        self.assertFalse(any('Відповідь q1' in json.dumps(event, ensure_ascii=False) for event in events))
+        self.assertFalse(any('user_id' in (event['question'] or {}) or 'user_id' in event['data']
+                             for event in events))
+        self.assertEqual([(event['type'], event['id']) for event in events if event['type'] == 'redacted'],
+                         [('redacted', 'q1'), ('redacted', 'q2'), ('redacted', 'q3')])
+
+        # Переписанный файл читается с прежними номерами
+        feed = ChangeFeed(self.changes_file)
+        self.assertEqual(feed.last_seq, len(events))
+        self.assertEqual(feed.read(len(events) - 1), events[-1:])
+        feed.close()
+
+class TestAsyncDatabase(unittest.IsolatedAsyncioTestCase):
+    """Тесты для неблокирующего интерфейса базы данных"""
+    
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.test_db_file = 'test_async_db.json'
+        if os.path.exists(self.test_db_file):
+            os.remove(self.test_db_file)
+        self.db = AsyncDatabase(Database(db_type='json', filename=self.test_db_file))
+    
+    def tearDown(self):
+        """Очистка после тестов"""
+        if os.path.exists(self.test_db_file):
+            os.remove(self.test_db_file)
+    
+    async def test_writes_run_off_event_loop(self):
+        """Тест выполнения записи в отдельном потоке"""
+        threads = []
+        original_save = self.db.db.save
+        
+        def save():
+            threads.append(threading.current_thread().name)
+            original_save()
+        
+        self.db.db.save = save
+        question_id = self.db.next_question_id()
+        await self.db.add_question(question_id, {
+            'id': question_id,
+            'category': 'general',
+            'text': 'Test question',
+            'status': 'pending',
+            'time': datetime.now().isoformat(),
+            'important': False,
+            'user_id': 123456789
+        })
+        await self.db.update_question(question_id, {'status': 'rejected'})
+        
+        self.assertEqual((await self.db.get_question(question_id))['status'], 'rejected')
+        self.assertEqual(len(threads), 2)
+        self.assertTrue(all(name.startswith('db-writer') for name in threads))
+        await self.db.close()
+
 class TestUtils(unittest.TestCase):
     """Тесты для модуля утилит"""
     
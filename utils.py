@@ -1,11 +1,12 @@
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 
 from config import logger, ADMIN_IDS, ADMIN_GROUP_ID, CHANNEL_ID, CATEGORIES
-from database import Database
+from database import AsyncDatabase
+from models import Question, decode_time
 
-async def handle_admin_question(context, question_id: str, db: Database) -> bool:
+async def handle_admin_question(context, question_id: str, db: AsyncDatabase) -> bool:
     """
     Отправка вопроса администраторам
     
@@ -18,7 +19,7 @@ async def handle_admin_question(context, question_id: str, db: Database) -> bool
         bool: True если успешно, False в случае ошибки
     """
     try:
-        question = db.get_question(question_id)
+        question = await db.get_question(question_id)
         if not question:
             logger.error(f"Вопрос {question_id} не найден в базе данных")
             return False
@@ -85,12 +86,12 @@ def format_question_for_user(question: dict) -> str:
     
     return text
 
-def format_question_for_admin(question: dict) -> str:
+def format_question_for_admin(question: Question) -> str:
     """
     Форматирование вопроса для отображения администратору
     
     Args:
-        question: Данные вопроса
+        question: Вопрос
         
     Returns:
         str: Отформатированный текст вопроса
@@ -99,37 +100,37 @@ def format_question_for_admin(question: dict) -> str:
         'pending': '⏳',
         'answered': '✅',
         'rejected': '❌'
-    }.get(question['status'], '⏳')
+    }.get(question.status, '⏳')
     
-    important_emoji = "⭐️" if question.get('important', False) else ""
+    important_emoji = "⭐️" if question.important else ""
     
     text = (
         f"📨 Питання {status_emoji} {important_emoji}\n\n"
-        f"ID: {question['id']}\n"
-        f"Категорія: {CATEGORIES[question['category']]}\n"
-        f"Питання: {question['text']}\n"
-        f"Час: {format_datetime(question['time'])}"
+        f"ID: {question.id}\n"
+        f"Категорія: {CATEGORIES[question.category]}\n"
+        f"Питання: {question.text}\n"
+        f"Час: {format_datetime(question.time)}"
     )
     
-    if question.get('answer'):
-        text += f"\n\n✍️ Відповідь:\n{question['answer']}"
-        if question.get('answer_time'):
-            text += f"\n\nЧас відповіді: {format_datetime(question['answer_time'])}"
+    if question.answer:
+        text += f"\n\n✍️ Відповідь:\n{question.answer}"
+        if question.answer_time is not None:
+            text += f"\n\nЧас відповіді: {format_datetime(question.answer_time)}"
     
     return text
 
-def format_datetime(iso_date: str) -> str:
+def format_datetime(iso_date: Union[str, int]) -> str:
     """
     Форматирование даты и времени из ISO формата в читаемый вид
     
     Args:
-        iso_date: Дата в ISO формате
+        iso_date: Дата в ISO формате или в микросекундах (как хранится в Question)
         
     Returns:
         str: Отформатированная дата и время
     """
     try:
-        dt = datetime.fromisoformat(iso_date)
+        dt = datetime.fromisoformat(decode_time(iso_date))
         return dt.strftime("%d.%m.%Y %H:%M:%S")
     except Exception as e:
         logger.error(f"Ошибка при форматировании даты {iso_date}: {e}")
@@ -147,7 +148,9 @@ def format_stats(stats: dict) -> str:
     """
     total = stats['total_questions']
     answered = stats['answered_questions']
-    pending = total - answered
+    # Отклоненные вопросы не считаются ожидающими, если известны счетчики по статусам
+    statuses = stats.get('statuses')
+    pending = statuses.get('pending', 0) if statuses is not None else total - answered
     
     text = (
         "📊 Статистика бота:\n\n"